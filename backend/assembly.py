@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from pathlib import Path
+
+import cv2
+
+from blobstore import blob_store, PUBLIC_URL
+
+# Scene assembly: the ordered shot videos of a scene joined into one mp4.
+#
+# The output is cached at generated/scenes/<k[0:2]>/<key>.mp4, where the key
+# hashes the ordered list of take hashes, so a scene is only rebuilt when a
+# shot's selected take or the shot order changes.
+#
+# With ffmpeg on PATH and matching streams (every Wan render from the same
+# workflow) the clips are joined with the concat demuxer and `-c copy`: no
+# re-encode, roughly disk speed. Mismatched clips are re-encoded to the first
+# clip's size and frame rate (concat filter); without ffmpeg, cv2 re-encodes
+# frame by frame as a fallback.
+
+SCENE_DIR = blob_store.root / "scenes"
+# Stream properties that must match for a stream-copy concat
+COPY_COMPATIBLE = ("codec_name", "profile", "width", "height", "pix_fmt", "r_frame_rate", "time_base")
+
+
+class AssemblyError(Exception):
+    pass
+
+
+def scene_key(take_hashes: list[str]) -> str:
+    return hashlib.sha256("\n".join(take_hashes).encode()).hexdigest()
+
+
+def output_path(key: str) -> Path:
+    return SCENE_DIR / key[:2] / f"{key}.mp4"
+
+
+def output_url(key: str) -> str:
+    return f"{PUBLIC_URL}{blob_store.web_prefix}/scenes/{key[:2]}/{key}.mp4"
+
+
+def _probe(path: Path) -> dict:
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries",
+         "stream=" + ",".join(COPY_COMPATIBLE) + ":format=duration", "-of", "json", str(path)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    info = json.loads(out)
+    stream = info["streams"][0] if info.get("streams") else {}
+    return {"stream": {k: stream.get(k) for k in COPY_COMPATIBLE}, "duration": float(info["format"].get("duration") or 0)}
+
+
+def _run_ffmpeg(args: list[str], total_seconds: float, on_progress):
+    """Runs ffmpeg with -progress on stdout, reporting out_time / total as it goes."""
+    proc = subprocess.Popen(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-progress", "pipe:1", "-nostats", *args],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    for line in proc.stdout:
+        key, _, value = line.strip().partition("=")
+        if key == "out_time_us" and value.isdigit() and total_seconds > 0:
+            on_progress(int(value) / 1e6 / total_seconds)
+    stderr = proc.stderr.read()
+    if proc.wait() != 0:
+        raise AssemblyError(f"ffmpeg failed: {stderr.strip()[-300:]}")
+
+
+def _concat_ffmpeg(inputs: list[Path], target: Path, on_progress) -> str:
+    probes = [_probe(path) for path in inputs]
+    total = sum(p["duration"] for p in probes)
+    if all(p["stream"] == probes[0]["stream"] for p in probes):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+            for path in inputs:
+                listing.write("file '" + str(path).replace("'", "'\\''") + "'\n")
+        try:
+            _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", listing.name, "-c", "copy",
+                         "-movflags", "+faststart", str(target)], total, on_progress)
+        finally:
+            os.remove(listing.name)
+        return "copy"
+
+    # The concat demuxer decodes every file with the first one's parameters, so
+    # mismatched clips go in as separate inputs, are each scaled/padded to the
+    # first clip's size and rate, and are joined by the concat filter.
+    _run_ffmpeg([*_reencode_args(inputs, probes[0]["stream"]),
+                 "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+                 "-movflags", "+faststart", str(target)], total, on_progress)
+    return "reencode"
+
+
+def _reencode_args(inputs: list[Path], first: dict) -> list[str]:
+    width, height, fps = first["width"], first["height"], first["r_frame_rate"]
+    normalize = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                 f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps={fps},setsar=1,format=yuv420p")
+    args = []
+    for path in inputs:
+        args += ["-i", str(path)]
+    chains = [f"[{i}:v:0]{normalize}[v{i}]" for i in range(len(inputs))]
+    joined = "".join(f"[v{i}]" for i in range(len(inputs))) + f"concat=n={len(inputs)}:v=1:a=0[out]"
+    return [*args, "-filter_complex", ";".join(chains + [joined]), "-map", "[out]", "-an"]
+
+
+def _concat_cv2(inputs: list[Path], target: Path, on_progress) -> str:
+    captures = [cv2.VideoCapture(str(path)) for path in inputs]
+    try:
+        fps = captures[0].get(cv2.CAP_PROP_FPS) or 16
+        width = int(captures[0].get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(captures[0].get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total = sum(max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) for cap in captures)
+        writer = cv2.VideoWriter(str(target), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        if not writer.isOpened():
+            raise AssemblyError("Could not open a video writer")
+        done = 0
+        for cap in captures:
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if frame.shape[1] != width or frame.shape[0] != height:
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                writer.write(frame)
+                done += 1
+                if done % 16 == 0:
+                    on_progress(done / total)
+        writer.release()
+    finally:
+        for cap in captures:
+            cap.release()
+    return "cv2"
+
+
+def assemble(take_hashes: list[str], on_progress=lambda fraction: None) -> dict:
+    """
+    Blocking: build (or reuse) the mp4 for these takes, in order.
+    Returns {"key", "path", "url", "method"}; method is "cached", "copy", "reencode" or "cv2".
+    """
+    if not take_hashes:
+        raise AssemblyError("Scene has no rendered shots")
+    key = scene_key(take_hashes)
+    target = output_path(key)
+    if target.exists():
+        return {"key": key, "path": str(target), "url": output_url(key), "method": "cached"}
+
+    inputs = []
+    for sha256 in take_hashes:
+        path = blob_store.local_path(sha256)
+        if path is None or not path.exists():
+            raise AssemblyError(f"Video {sha256[:12]} is missing")
+        inputs.append(path)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{key}.{uuid.uuid4().hex[:8]}.part.mp4")
+    try:
+        if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+            method = _concat_ffmpeg(inputs, tmp, on_progress)
+        else:
+            method = _concat_cv2(inputs, tmp, on_progress)
+        os.replace(tmp, target)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    on_progress(1.0)
+    return {"key": key, "path": str(target), "url": output_url(key), "method": method}
+
+
+def discard(key: str | None):
+    """Remove a superseded scene render."""
+    if key:
+        output_path(key).unlink(missing_ok=True)
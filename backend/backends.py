@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import aiohttp
+
+# Registry of ComfyUI render servers.
+#
+# The pool lives in backends.json (override with COMFY_BACKENDS_FILE) and can be
+# edited at runtime through the /backends admin routes. A background monitor
+# polls each server's /queue to learn whether it is alive and how deep its queue
+# is; the job dispatcher asks pick() for the least-loaded healthy server.
+# Servers pinned through the x-comfy-url header are tracked (and probed) only
+# while jobs reference them: the queue discard()s them once their last job ends.
+#
+# backends.json:
+#   {"backends": [{"name": "gpu-1", "url": "http://10.0.0.5:8188", "max_concurrency": 1}]}
+
+BASE_DIR = Path(__file__).resolve().parent
+CONFIG_PATH = Path(os.environ.get("COMFY_BACKENDS_FILE", BASE_DIR / "backends.json"))
+DEFAULT_URL = "http://127.0.0.1:8188"
+DEFAULT_CONCURRENCY = int(os.environ.get("COMFY_MAX_CONCURRENCY", "1"))
+
+HEALTH_INTERVAL = 5.0    # seconds between /queue probes
+PROBE_TIMEOUT = 3.0
+MAX_FAILURES = 2         # consecutive failed probes before a node is declared down
+
+
+@dataclass
+class Backend:
+    name: str
+    url: str
+    max_concurrency: int = DEFAULT_CONCURRENCY
+    persistent: bool = True          # False for ad-hoc URLs pinned via the x-comfy-url header
+    healthy: bool = True             # optimistic until the first probe says otherwise
+    queue_depth: int = 0             # running + pending on the ComfyUI side
+    in_flight: int = 0               # jobs we are currently running there
+    failures: int = 0
+    last_checked: float | None = None
+    last_error: str | None = None
+
+    @property
+    def load(self) -> int:
+        # Our in-flight jobs usually show up in ComfyUI's queue too; other clients' work only shows there.
+        return max(self.queue_depth, self.in_flight)
+
+    def has_capacity(self) -> bool:
+        return self.healthy and self.in_flight < self.max_concurrency
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["load"] = self.load
+        return data
+
+
+class BackendRegistry:
+    def __init__(self, config_path: Path = CONFIG_PATH):
+        self.config_path = Path(config_path)
+        self._backends: dict[str, Backend] = {}   # url -> Backend
+        self._down_listeners = []
+        self._up_listeners = []
+        self._monitor = None
+        self.load()
+
+    # --- 1. CONFIG ---
+
+    def load(self):
+        entries = []
+        if self.config_path.exists():
+            with open(self.config_path, "r") as f:
+                entries = json.load(f).get("backends", [])
+        if not entries:
+            entries = [{"name": "local", "url": DEFAULT_URL}]
+        self._backends = {}
+        for entry in entries:
+            backend = Backend(
+                name=entry["name"],
+                url=entry["url"].rstrip("/"),
+                max_concurrency=int(entry.get("max_concurrency", DEFAULT_CONCURRENCY)),
+            )
+            self._backends[backend.url] = backend
+
+    def save(self):
+        entries = [
+            {"name": b.name, "url": b.url, "max_concurrency": b.max_concurrency}
+            for b in self._backends.values() if b.persistent
+        ]
+        tmp_path = self.config_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"backends": entries}, f, indent=2)
+        os.replace(tmp_path, self.config_path)
+
+    def add(self, name: str, url: str, max_concurrency: int = DEFAULT_CONCURRENCY) -> Backend:
+        url = url.rstrip("/")
+        if any(b.name == name and b.url != url for b in self._backends.values()):
+            raise ValueError(f"A backend named '{name}' already exists")
+        backend = self._backends.get(url)
+        if backend is None:
+            backend = Backend(name=name, url=url, max_concurrency=max_concurrency)
+            self._backends[url] = backend
+        backend.name, backend.max_concurrency, backend.persistent = name, max_concurrency, True
+        self.save()
+        return backend
+
+    def remove(self, name: str) -> Backend:
+        backend = next((b for b in self._backends.values() if b.name == name), None)
+        if backend is None:
+            raise KeyError(name)
+        del self._backends[backend.url]
+        self.save()
+        self._fire_down(backend)
+        return backend
+
+    # --- 2. LOOKUP / DISPATCH ---
+
+    def all(self) -> list[Backend]:
+        return list(self._backends.values())
+
+    def get(self, url: str) -> Backend:
+        """Known backend for this URL, or an ad-hoc (unsaved) one for a header-pinned server."""
+        url = url.rstrip("/")
+        backend = self._backends.get(url)
+        if backend is None:
+            backend = Backend(name=url, url=url, persistent=False)
+            self._backends[url] = backend
+        return backend
+
+    def discard(self, backend: Backend):
+        """Stop tracking an ad-hoc backend nothing is running on; pool members stay."""
+        if not backend.persistent and backend.in_flight == 0 and self._backends.get(backend.url) is backend:
+            del self._backends[backend.url]
+
+    def pick(self) -> Backend | None:
+        """Least-loaded healthy persistent backend with a free slot, or None if all are busy/down."""
+        candidates = [b for b in self._backends.values() if b.persistent and b.has_capacity()]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: (b.load / b.max_concurrency, b.in_flight, b.name))
+
+    def acquire(self, backend: Backend):
+        backend.in_flight += 1
+
+    def release(self, backend: Backend):
+        backend.in_flight = max(0, backend.in_flight - 1)
+
+    # --- 3. HEALTH ---
+
+    def on_down(self, callback):
+        """callback(backend) runs when a node fails its probes or is removed from the pool."""
+        self._down_listeners.append(callback)
+
+    def on_up(self, callback):
+        """callback(backend) runs when a node that was down answers its probe again."""
+        self._up_listeners.append(callback)
+
+    def _fire_down(self, backend: Backend):
+        for callback in self._down_listeners:
+            callback(backend)
+
+    def _fire_up(self, backend: Backend):
+        for callback in self._up_listeners:
+            callback(backend)
+
+    async def probe(self, backend: Backend, session: aiohttp.ClientSession | None = None) -> bool:
+        """Refresh one backend's health and queue depth. Returns whether THIS probe got an answer."""
+        ok = False
+        own_session = session is None
+        if own_session:
+            session = aiohttp.ClientSession()
+        try:
+            timeout = aiohttp.ClientTimeout(total=PROBE_TIMEOUT)
+            async with session.get(f"{backend.url}/queue", timeout=timeout) as resp:
+                resp.raise_for_status()
+                queue = await resp.json(content_type=None)
+            backend.queue_depth = len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+            backend.failures, backend.last_error = 0, None
+            ok = True
+            if not backend.healthy:
+                backend.healthy = True
+                print(f"🟢 ComfyUI backend {backend.name} is back ONLINE")
+                self._fire_up(backend)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+            backend.failures += 1
+            backend.last_error = str(e) or type(e).__name__
+            if backend.healthy and backend.failures >= MAX_FAILURES:
+                backend.healthy = False
+                print(f"🔴 ComfyUI backend {backend.name} is DOWN ({backend.last_error})")
+                self._fire_down(backend)
+        finally:
+            backend.last_checked = time.time()
+            if own_session:
+                await session.close()
+        return ok
+
+    async def probe_all(self, session: aiohttp.ClientSession | None = None):
+        await asyncio.gather(*(self.probe(b, session) for b in self.all()))
+
+    async def _monitor_loop(self):
+        async with aiohttp.ClientSession() as session:
+            while True:
+                await self.probe_all(session)
+                await asyncio.sleep(HEALTH_INTERVAL)
+
+    async def start(self):
+        self._monitor = asyncio.create_task(self._monitor_loop())
+
+    async def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+
+
+backend_registry = BackendRegistry()
@@ -0,0 +1,87 @@
+"""
+Requests/sec on GET /projects/{id}/scenes: connect-per-request vs the pooled db layer.
+
+    python benchmarks/bench_db.py --scenes 20 --shots 10 --requests 2000 --threads 8
+
+"before" swaps in the old `sqlite3.connect('studio.db')` helper; "after" uses
+db.get_db_connection (per-thread cached connection, WAL, statement cache).
+
+The route handler is called straight from a thread pool, the way Starlette
+runs sync routes, so HTTP and JSON encoding costs don't drown out the
+data-access layer. A writer thread keeps updating shots meanwhile, and any
+"database is locked" errors are counted.
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import use_temp_db, seed_project
+
+use_temp_db()
+
+import db  # noqa: E402
+import main  # noqa: E402
+
+
+def legacy_get_db_connection():
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def run(project_id: int, requests: int, threads: int) -> tuple[float, int]:
+    """Returns (reads/sec, lock errors) with a concurrent writer running."""
+    errors = 0
+    stop = threading.Event()
+
+    def hit(_):
+        nonlocal errors
+        try:
+            main.project_scenes(project_id)
+        except sqlite3.OperationalError:
+            errors += 1
+
+    def writer():
+        nonlocal errors
+        while not stop.is_set():
+            try:
+                main.update_shot(1, main.ShotUpdate(video_url=f"http://127.0.0.1:8000/generated/w_{time.time()}.mp4"))
+            except sqlite3.OperationalError:
+                errors += 1
+            time.sleep(0.005)
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(hit, range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    writer_thread.join()
+    return requests / elapsed, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--shots", type=int, default=10, help="shots per scene")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    project_id = seed_project(db.get_db_connection(), args.scenes, args.shots)
+
+    pooled = main.get_db_connection
+    main.get_db_connection = legacy_get_db_connection
+    run(project_id, 50, 1)  # warm-up
+    before, before_errors = run(project_id, args.requests, args.threads)
+
+    main.get_db_connection = pooled
+    run(project_id, 50, 1)
+    after, after_errors = run(project_id, args.requests, args.threads)
+
+    print(f"GET /projects/{project_id}/scenes  ({args.scenes} scenes x {args.shots} shots, {args.threads} threads + 1 writer)")
+    print(f"  before (connect per request): {before:8.1f} req/s   {before_errors} lock errors")
+    print(f"  after  (pooled connection):   {after:8.1f} req/s   {after_errors} lock errors   ({after / before:.2f}x)")
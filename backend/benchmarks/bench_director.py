@@ -0,0 +1,102 @@
+"""
+Director enhancement against a stubbed local Gemini client (no network, no key).
+
+    python benchmarks/bench_director.py --shots 50 --latency 0.8 --concurrency 4 --rate 5
+
+"serial" awaits one enhance at a time (what the old sync route amounted to per
+worker); "batch" is Director.enhance_many, as /director/enhance_batch uses it.
+Every third shot repeats an earlier prompt, so the batch also exercises
+coalescing. Then two checks: 20 identical concurrent requests must make one
+upstream call, and a model that hangs must be abandoned after --timeout
+(a timeout only reorders the models; a 403/404 benches one).
+The cache is disabled (ttl 0) so every run goes upstream.
+"""
+import argparse
+import asyncio
+import time
+import types
+
+from common import use_temp_db
+
+use_temp_db()
+
+import director as director_module  # noqa: E402
+from director import Director  # noqa: E402
+from director_cache import director_cache, model_health  # noqa: E402
+
+
+class StubModels:
+    """Quacks like client.aio.models: answers after `latency`; models in `hang` never answer."""
+
+    def __init__(self, latency: float, hang=()):
+        self.latency = latency
+        self.hang = set(hang)
+        self.calls = 0
+
+    async def generate_content(self, model, contents):
+        self.calls += 1
+        if model in self.hang:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.latency)
+        return types.SimpleNamespace(text=f"Slow dolly in. {contents[-40:]}")
+
+
+def stub_client(latency: float, hang=()):
+    models = StubModels(latency, hang)
+    return types.SimpleNamespace(aio=types.SimpleNamespace(models=models)), models
+
+
+def reset_health():
+    model_health._state = {}
+
+
+async def main(args):
+    director_cache.ttl = 0
+    prompts = [f"[CONTEXT: rain alley] beat {i if i % 3 else i // 3}" for i in range(args.shots)]
+    requests = [(p, "Noir", "Push In") for p in prompts]
+
+    client, models = stub_client(args.latency)
+    director = Director(client, timeout=args.timeout, concurrency=args.concurrency, rate=args.rate)
+    start = time.perf_counter()
+    for request in requests:
+        await director.enhance(*request)
+    serial = time.perf_counter() - start
+    serial_calls = models.calls
+
+    client, models = stub_client(args.latency)
+    director = Director(client, timeout=args.timeout, concurrency=args.concurrency, rate=args.rate)
+    start = time.perf_counter()
+    await director.enhance_many(requests)
+    batch = time.perf_counter() - start
+    print(f"{args.shots} prompts ({len(set(prompts))} distinct), {args.latency}s per call, "
+          f"concurrency {args.concurrency}, {args.rate}/s")
+    print(f"  serial: {serial:6.2f}s  {serial_calls} upstream calls")
+    print(f"  batch:  {batch:6.2f}s  {models.calls} upstream calls, {director.stats['coalesced']} coalesced")
+
+    client, models = stub_client(args.latency)
+    director = Director(client, timeout=args.timeout, concurrency=args.concurrency, rate=args.rate)
+    await asyncio.gather(*(director.enhance("same shot", "Noir", "Orbit") for _ in range(20)))
+    print(f"  20 identical concurrent requests -> {models.calls} upstream call(s)")
+
+    reset_health()
+    hung = director_module.MODELS[0]
+    client, models = stub_client(args.latency, hang=[hung])
+    director = Director(client, timeout=args.timeout, concurrency=args.concurrency, rate=args.rate)
+    start = time.perf_counter()
+    await director.enhance("a hanging model", "Noir", "Static")
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    await director.enhance("after the hang", "Noir", "Static")
+    second = time.perf_counter() - start
+    print(f"  {hung} hangs: first request {first:.2f}s (timeout {args.timeout}s, then next model), "
+          f"next request {second:.2f}s (the model that answered goes first)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.8, help="stubbed Gemini seconds per call")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="upstream calls started per second")
+    parser.add_argument("--timeout", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
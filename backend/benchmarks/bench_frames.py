@@ -0,0 +1,118 @@
+"""
+Last-frame extraction for /shots/{id}/stitch: old seek-to-FRAME_COUNT vs frames.py.
+
+    python benchmarks/bench_frames.py --clips 81 480 1440
+
+Each clip is an mp4 whose frames carry their own index (a row of bit squares), so we
+can check which frame each method really returned. "before" trusts
+CAP_PROP_FRAME_COUNT and reads at total - 1, as stitch_shot_endpoint did;
+"after" is frames.extract(path, -1) (seek one window back, decode forward).
+The cached path (frames.get_frame on a repeat stitch) is timed separately.
+
+--skew N re-runs everything with CAP_PROP_FRAME_COUNT reported N frames off,
+as happens with VFR or re-muxed ComfyUI outputs.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from common import use_temp_db, timed, percentile
+
+use_temp_db()
+
+import frames  # noqa: E402
+from blobstore import blob_store  # noqa: E402
+
+
+BITS = 12
+
+
+def make_clip(path: Path, count: int, fps: int = 16):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (832, 480))
+    for i in range(count):
+        frame = np.full((480, 832, 3), 96, dtype=np.uint8)
+        for bit in range(BITS):
+            if i >> bit & 1:
+                frame[16:64, 16 + bit * 64:64 + bit * 64] = 255
+            else:
+                frame[16:64, 16 + bit * 64:64 + bit * 64] = 0
+        writer.write(frame)
+    writer.release()
+
+
+def frame_index(frame) -> int:
+    """Recover the index from the row of black/white squares."""
+    return sum(1 << bit for bit in range(BITS) if frame[40, 40 + bit * 64].mean() > 128)
+
+
+class SkewedCapture:
+    """cv2.VideoCapture whose container frame count is off by `skew`."""
+
+    def __init__(self, path, skew: int):
+        self._cap = REAL_CAPTURE(path)
+        self._skew = skew
+
+    def get(self, prop):
+        value = self._cap.get(prop)
+        return value + self._skew if prop == cv2.CAP_PROP_FRAME_COUNT else value
+
+    def __getattr__(self, name):
+        return getattr(self._cap, name)
+
+
+REAL_CAPTURE = cv2.VideoCapture
+
+
+def legacy_last_frame(path: Path):
+    cap = cv2.VideoCapture(str(path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames - 1)
+    ret, frame = cap.read()
+    cap.release()
+    return frame if ret else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, nargs="+", default=[81, 480, 1440], help="frame counts")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--skew", type=int, default=8, help="also test a frame count misreported by this much")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="studio_frames_"))
+    blob_store.root = workdir
+    frames.FRAME_DIR = workdir / "frames"
+
+    print(f"{'frames':>7} {'skew':>5} | {'before p50':>10} {'ok':>3} | {'after p50':>9} {'ok':>3} | {'cached':>8}")
+    for count in args.clips:
+        clip = workdir / f"clip_{count}.mp4"
+        make_clip(clip, count)
+        blob = blob_store.ingest(clip)
+        path = Path(blob["path"])
+
+        for skew in sorted({0, args.skew}):
+            cv2.VideoCapture = (lambda p, s=skew: SkewedCapture(p, s)) if skew else REAL_CAPTURE
+
+            before = timed(lambda: legacy_last_frame(path), args.repeat)
+            legacy = legacy_last_frame(path)
+            before_ok = legacy is not None and frame_index(legacy) == count - 1
+
+            after = timed(lambda: frames.extract(path, -1), args.repeat)
+            index, frame = frames.extract(path, -1)
+            after_ok = index == count - 1 and frame_index(frame) == count - 1
+
+            for cached in frames.FRAME_DIR.rglob("*.png"):
+                cached.unlink()
+            asyncio.run(frames.get_frame(blob["sha256"], -1))
+            start = time.perf_counter()
+            asyncio.run(frames.get_frame(blob["sha256"], -1))
+            cached = time.perf_counter() - start
+
+            print(f"{count:>7} {skew:>+5} | {percentile(before, 50) * 1000:8.1f}ms {'yes' if before_ok else 'NO':>3} | "
+                  f"{percentile(after, 50) * 1000:7.1f}ms {'yes' if after_ok else 'NO':>3} | {cached * 1000:6.2f}ms")
+        cv2.VideoCapture = REAL_CAPTURE
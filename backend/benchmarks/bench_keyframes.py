@@ -0,0 +1,104 @@
+"""
+Keyframes for a whole scene: one /generate per shot vs /scenes/{id}/generate_keyframes.
+
+    python benchmarks/bench_keyframes.py --shots 50 --delay 0.2 --latency 0.05
+
+Both paths render against an in-process fake ComfyUI (one prompt at a time,
+like a single GPU). "per-shot" is what the frontend did: for every shot a
+separate generate_cinematic_image() call (its own session, websocket, queue
+and download, with the GPU idle in between) followed by its own UPDATE.
+"batched" is run_keyframes_job: every prompt queued up front, identical prompts
+sharing a latent batch, downloads overlapping later renders, one transaction.
+
+--unique sets how many distinct prompts the shots use (default: all distinct,
+so only pipelining helps); --batch-cost is the extra GPU time per additional
+image in a batch, as a fraction of --delay; --latency is the round trip to
+the ComfyUI server (0 for a local GPU, ~0.05-0.15s for a RunPod pod).
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from common import use_temp_db
+
+use_temp_db()
+
+import runpod_client  # noqa: E402
+from runpod_client import generate_cinematic_image, generate_cinematic_batch  # noqa: E402
+from db import get_db_connection  # noqa: E402
+from fake_comfy import serve  # noqa: E402
+
+PORT = 8197
+
+
+def seed_scene(shots: int, unique: int) -> list[tuple[int, str]]:
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO projects (name, description, aspect_ratio) VALUES ('Bench', 'keyframes', '16:9')")
+    cursor.execute("INSERT INTO scenes (project_id, name, description) VALUES (?, 'Scene', '')", (cursor.lastrowid,))
+    scene_id = cursor.lastrowid
+    cursor.executemany(
+        "INSERT INTO shots (scene_id, prompt, status, order_index) VALUES (?, ?, 'pending', ?)",
+        [(scene_id, f"[CONTEXT: neon alley] beat {i % unique}", i) for i in range(shots)],
+    )
+    conn.commit()
+    rows = conn.execute("SELECT id, prompt FROM shots WHERE scene_id = ? ORDER BY order_index", (scene_id,)).fetchall()
+    conn.close()
+    return [(r["id"], r["prompt"]) for r in rows]
+
+
+async def per_shot(shots, base_url) -> int:
+    ok = 0
+    for shot_id, prompt in shots:
+        result = await generate_cinematic_image(prompt, "16:9", "Arri Alexa 35", "Anamorphic", "35mm", False, base_url)
+        if "error" in result:
+            continue
+        conn = get_db_connection()
+        conn.execute("UPDATE shots SET keyframe_url = ?, status = 'ready_for_video' WHERE id = ?", (result["image_url"], shot_id))
+        conn.commit()
+        conn.close()
+        ok += 1
+    return ok
+
+
+async def batched(shots, base_url) -> int:
+    results = await generate_cinematic_batch([p for _, p in shots], "16:9", "Arri Alexa 35", "Anamorphic", "35mm", False, base_url)
+    rows = [(r["path"], shot_id) for (shot_id, _), r in zip(shots, results) if "error" not in r]
+    conn = get_db_connection()
+    conn.executemany("UPDATE shots SET keyframe_url = ?, status = 'ready_for_video' WHERE id = ?", rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+async def main(args):
+    runpod_client.OUTPUT_DIR = tempfile.mkdtemp(prefix="studio_keyframes_")
+    fake, runner = await serve(PORT, args.delay, args.output_bytes, batch_cost=args.batch_cost, latency=args.latency)
+    base_url = f"http://127.0.0.1:{PORT}"
+    try:
+        print(f"{args.shots} shots, {args.unique} distinct prompt(s), {args.delay}s per prompt, "
+              f"batch cost {args.batch_cost}, {args.latency * 1000:.0f}ms round trip")
+        print(f"{'path':>9} | {'wall':>7} | {'shots/s':>7} | {'prompts':>7} | ok")
+        for name, fn in (("per-shot", per_shot), ("batched", batched)):
+            shots = seed_scene(args.shots, args.unique)
+            received = fake.prompts_received
+            start = time.perf_counter()
+            ok = await fn(shots, base_url)
+            wall = time.perf_counter() - start
+            print(f"{name:>9} | {wall:6.2f}s | {args.shots / wall:7.2f} | {fake.prompts_received - received:>7} | {ok}/{args.shots}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=50)
+    parser.add_argument("--unique", type=int, default=None, help="distinct prompts (default: one per shot)")
+    parser.add_argument("--delay", type=float, default=0.2, help="fake GPU seconds per prompt")
+    parser.add_argument("--batch-cost", type=float, default=0.6)
+    parser.add_argument("--latency", type=float, default=0.05, help="round trip per HTTP request to ComfyUI")
+    parser.add_argument("--output-bytes", type=int, default=2 * 1024 * 1024)
+    args = parser.parse_args()
+    args.unique = args.unique or args.shots
+    asyncio.run(main(args))
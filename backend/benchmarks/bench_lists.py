@@ -0,0 +1,74 @@
+"""
+Asset library on a big project: GET /projects/{id}/assets with 20k assets.
+
+    python benchmarks/bench_lists.py --assets 20000
+
+"before" is the original route (SELECT * of every asset, prompts included).
+"after" rows are the same route with ?fields= and/or ?limit= keyset pages;
+"deep page" is a page far down the list, which costs the same as the first
+one because the cursor seeks by id instead of skipping rows with OFFSET.
+Sizes are the JSON bytes the client would download.
+"""
+import argparse
+import json
+
+from common import use_temp_db, seed_project, timed, percentile
+
+use_temp_db()
+
+import db  # noqa: E402
+import main  # noqa: E402
+from listing import row_count  # noqa: E402
+from thumbnails import thumbnail_url  # noqa: E402
+
+GRID_FIELDS = "id,type,name,thumbnail_url"
+
+
+def legacy_get_project_assets(project_id: int):
+    conn = db.get_db_connection()
+    assets = conn.execute('SELECT * FROM assets WHERE project_id = ? ORDER BY id DESC', (project_id,)).fetchall()
+    conn.close()
+    return {"assets": [{**dict(a), "thumbnail_url": thumbnail_url(a['sha256'])} for a in assets]}
+
+
+def legacy_count(project_id: int):
+    conn = db.get_db_connection()
+    n = conn.execute("SELECT COUNT(*) FROM assets WHERE project_id = ?", (project_id,)).fetchone()[0]
+    conn.close()
+    return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    seed_project(conn, 5, 20, assets=2000)           # a neighbour, so the index has something to skip
+    project_id = seed_project(conn, 5, 20, assets=args.assets)
+    deep_cursor = conn.execute(
+        "SELECT id FROM assets WHERE project_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?", (project_id, args.assets * 9 // 10)
+    ).fetchone()[0]
+    conn.close()
+
+    cases = [
+        ("before: everything", lambda: legacy_get_project_assets(project_id)),
+        ("all rows, grid fields", lambda: main.get_project_assets(project_id, fields=GRID_FIELDS)),
+        (f"page of {args.page}, all fields", lambda: main.get_project_assets(project_id, limit=args.page)),
+        (f"page of {args.page}, grid fields", lambda: main.get_project_assets(project_id, limit=args.page, fields=GRID_FIELDS)),
+        ("deep page, grid fields", lambda: main.get_project_assets(project_id, limit=args.page, cursor=deep_cursor, fields=GRID_FIELDS)),
+    ]
+
+    print(f"{args.assets} assets in the project, {args.repeat} runs each")
+    print(f"{'':32} | {'p50':>9} {'p95':>9} | {'payload':>10}")
+    for name, fn in cases:
+        size = len(json.dumps(fn()))
+        samples = timed(fn, args.repeat)
+        print(f"{name:32} | {percentile(samples, 50) * 1000:7.2f}ms {percentile(samples, 95) * 1000:7.2f}ms | {size / 1024:8.1f}KB")
+
+    assert legacy_count(project_id) == main.get_project_assets(project_id, limit=1)["total"]
+    count = timed(lambda: legacy_count(project_id), args.repeat)
+    cached = timed(lambda: row_count("assets", project_id), args.repeat)
+    print(f"total: COUNT(*) p50 {percentile(count, 50) * 1000:.3f}ms, row_counts p50 {percentile(cached, 50) * 1000:.3f}ms")
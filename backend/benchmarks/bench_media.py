@@ -0,0 +1,113 @@
+"""
+Seek latency when scrubbing a large render: Range requests at random offsets.
+
+    python benchmarks/bench_media.py --size-mb 200 --seeks 200
+
+"before" is the old `app.mount("/generated", StaticFiles(...))`; "after" is
+the /generated route in main.py (media.py). Both run under uvicorn on
+localhost and serve the same content-addressed file. Each seek asks for
+1 MiB at a random offset, like a <video> element jumping around the clip;
+latency is measured until the last byte arrives. A conditional GET with the
+ETag from the first response is also timed.
+"""
+import argparse
+import hashlib
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.staticfiles import StaticFiles
+
+from common import use_temp_db, percentile
+
+use_temp_db()
+
+import main  # noqa: E402
+
+SEEK_BYTES = 1 << 20
+
+
+def make_clip(root: Path, size_mb: int) -> str:
+    block = os.urandom(1 << 20)
+    hasher = hashlib.sha256()
+    tmp = root / "clip.part"
+    with open(tmp, "wb") as f:
+        for i in range(size_mb):
+            chunk = block[i % 251:] + block[:i % 251]
+            hasher.update(chunk)
+            f.write(chunk)
+    sha256 = hasher.hexdigest()
+    relpath = f"{sha256[:2]}/{sha256[2:4]}/{sha256}.mp4"
+    (root / relpath).parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp, root / relpath)
+    return relpath
+
+
+def serve(app) -> tuple[uvicorn.Server, int]:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, port
+
+
+def measure(port: int, relpath: str, size: int, seeks: int) -> dict:
+    url = f"http://127.0.0.1:{port}/generated/{relpath}"
+    rng = random.Random(7)
+    samples = []
+    with httpx.Client() as client:
+        first = client.get(url, headers={"Range": "bytes=0-1023"})
+        assert first.status_code == 206, first.status_code
+        for _ in range(seeks):
+            offset = rng.randrange(0, size - SEEK_BYTES)
+            start = time.perf_counter()
+            resp = client.get(url, headers={"Range": f"bytes={offset}-{offset + SEEK_BYTES - 1}"})
+            samples.append(time.perf_counter() - start)
+            assert resp.status_code == 206 and len(resp.content) == SEEK_BYTES
+
+        etag = first.headers.get("etag")
+        revalidate = []
+        for _ in range(50):
+            start = time.perf_counter()
+            resp = client.get(url, headers={"If-None-Match": etag})
+            revalidate.append(time.perf_counter() - start)
+    return {
+        "p50": percentile(samples, 50), "p95": percentile(samples, 95),
+        "revalidate": percentile(revalidate, 50), "revalidate_status": resp.status_code,
+        "cache": first.headers.get("cache-control", "-"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--seeks", type=int, default=200)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="studio_media_"))
+    relpath = make_clip(root, args.size_mb)
+    size = (root / relpath).stat().st_size
+    main.OUTPUT_DIR = root
+
+    before_app = Starlette()
+    before_app.mount("/generated", StaticFiles(directory=str(root)), name="generated")
+    results = {}
+    for label, app in (("before (StaticFiles)", before_app), ("after  (media.py)", main.app)):
+        server, port = serve(app)
+        results[label] = measure(port, relpath, size, args.seeks)
+        server.should_exit = True
+
+    print(f"{args.size_mb} MB clip, {args.seeks} random 1 MiB seeks")
+    for label, r in results.items():
+        print(f"  {label}: seek p50 {r['p50'] * 1000:6.2f}ms  p95 {r['p95'] * 1000:6.2f}ms | "
+              f"If-None-Match -> {r['revalidate_status']} in {r['revalidate'] * 1000:.2f}ms | Cache-Control: {r['cache']}")
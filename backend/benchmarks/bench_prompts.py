@@ -0,0 +1,106 @@
+"""
+Per-shot prompt assembly: the old inline code vs prompt_compiler.
+
+    python benchmarks/bench_prompts.py --shots 1000 --distinct 120
+
+"before" is the pre-compiler path for one shot: split("]", 1) context parsing,
+the camera-move dict rebuilt on every call (as the in-function literal was),
+two GEAR_PROMPTS lookups and string assembly, for both the Flux keyframe
+prompt and the Director instruction. "cold" is prompt_compiler with its memo
+cleared before each pass; "warm" is a re-render of the same scene. Scenes
+repeat prompts (stitched shots share a context block), hence --distinct.
+"""
+import argparse
+import time
+
+from common import percentile
+
+import prompt_compiler as pc  # noqa: E402
+
+
+def legacy_image_prompt(prompt, camera, lens, focal_length, chroma):
+    combined = [t for t in (pc.GEAR_PROMPTS.get(camera, ""), pc.GEAR_PROMPTS.get(lens, "")) if t]
+    full_prompt = f"{prompt}, {', '.join(combined)}, {focal_length} focal length"
+    if chroma:
+        full_prompt += ", green screen background, chroma key, flat lighting, evenly lit"
+    else:
+        full_prompt += ", cinematic lighting, photorealistic, 8k, detailed texture"
+    return full_prompt
+
+
+def legacy_instruction(user_prompt, style, camera):
+    scene_context, shot_action = "", user_prompt
+    if "[CONTEXT:" in user_prompt and "]" in user_prompt:
+        parts = user_prompt.split("]", 1)
+        scene_context = parts[0].replace("[CONTEXT:", "").strip()
+        shot_action = parts[1].strip()
+    camera_descriptions = {**pc.CAMERA_MOVES}
+    motion_desc = camera_descriptions.get(camera, camera)
+    context_instruction = ""
+    if scene_context:
+        context_instruction = (
+            f"SCENE CONTEXT (THE WORLD - DO NOT CHANGE): {scene_context}\n"
+            f"Constraint: You MUST maintain the lighting, weather, and atmosphere described in the CONTEXT.\n"
+        )
+    instruction = (
+        f"You are a Prompt Engineer for Wan 2.2 Video AI. \n{context_instruction}"
+        f"SHOT ACTION (THE SUBJECT/MOVEMENT): {shot_action}\nStyle: {style}\nRequired Camera Motion: {motion_desc}\n\n"
+        f"TASK: Write a single, vivid paragraph (40-60 words). \nCRITICAL RULES:\n"
+        f"1. CONTINUITY: If a Context is provided, keep it strictly consistent. Only animate the Action.\n"
+        f"2. MOVEMENT: You MUST include the camera description '{motion_desc}' verbatim.\n"
+        f"3. SPEED: Describe movement as 'slow', 'measured', or 'cinematic'. Avoid 'rushing'.\n"
+        f"4. NO PREAMBLE. Return ONLY the final prompt."
+    )
+    return instruction, f"Continuous single shot. {motion_desc} {user_prompt} in {style} style."
+
+
+def before(shots):
+    for prompt, move in shots:
+        legacy_image_prompt(prompt, "Arri Alexa 35", "Cooke S4/i Prime", "35mm", False)
+        legacy_instruction(prompt, "Cinematic", move)
+
+
+def after(shots):
+    pc.image_prompts([p for p, _ in shots], "Arri Alexa 35", "Cooke S4/i Prime", "35mm", False)
+    pc.video_instructions([(p, "Cinematic", m) for p, m in shots])
+
+
+def clear_memo():
+    for fn in (pc.parse_context, pc.gear_text, pc.image_prompt, pc.video_instruction):
+        fn.cache_clear()
+
+
+def run(fn, shots, repeat, cold=False) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        if cold:
+            clear_memo()
+        start = time.perf_counter()
+        fn(shots)
+        samples.append((time.perf_counter() - start) / len(shots))
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--distinct", type=int, default=120, help="distinct shot prompts in the scene")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    moves = list(pc.CAMERA_MOVES)
+    shots = [
+        (f"[CONTEXT: rain-soaked neon alley, night, beat {i % args.distinct // 10}] "
+         f"A detective lights a cigarette, take {i % args.distinct}", moves[i % len(moves)])
+        for i in range(args.shots)
+    ]
+    for legacy, compiled in zip(
+        [legacy_image_prompt("x", "Arri Alexa 35", "Cooke S4/i Prime", "35mm", False)] + [legacy_instruction(p, "Cinematic", m) for p, m in shots[:50]],
+        [pc.image_prompt("x", "Arri Alexa 35", "Cooke S4/i Prime", "35mm", False)] + [pc.video_instruction(p, "Cinematic", m) for p, m in shots[:50]],
+    ):
+        assert legacy == compiled, "compiled prompts differ from the legacy output"
+
+    print(f"{args.shots} shots, {args.distinct} distinct prompts (per-shot cost, p50)")
+    for name, fn, cold in (("before", before, False), ("cold", after, True), ("warm", after, False)):
+        samples = run(fn, shots, args.repeat, cold)
+        print(f"  {name:>6}: {percentile(samples, 50) * 1e6:6.2f} µs/shot")
@@ -0,0 +1,97 @@
+"""
+Latency of the storyboard read, GET /projects/{id}/scenes, on seeded projects.
+
+    python benchmarks/bench_scenes.py --sizes 10 1000 10000
+
+"before" is the original loop (one shots query per scene, no indexes); "after"
+is the current tree build (one LEFT JOIN grouped in Python, with the indexes
+that migrations/0004_read_indexes.sql creates). The second table goes through
+HTTP: a rebuild after an edit, a repeat read served from tree_cache.py, and a
+revalidation with the ETag the client already has (304).
+"""
+import argparse
+import sqlite3
+
+from common import use_temp_db, seed_project, timed, percentile
+
+use_temp_db()
+
+import db  # noqa: E402
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+INDEXES = ["idx_shots_scene_order", "idx_scenes_project_order", "idx_takes_shot_created", "idx_assets_project"]
+
+
+def legacy_get_scenes(project_id: int):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    scenes = conn.execute('SELECT * FROM scenes WHERE project_id = ? ORDER BY order_index ASC', (project_id,)).fetchall()
+    results = []
+    for scene in scenes:
+        shots = conn.execute('SELECT * FROM shots WHERE scene_id = ? ORDER BY order_index ASC', (scene['id'],)).fetchall()
+        results.append({**dict(scene), "shots": shots})
+    conn.close()
+    return {"scenes": results}
+
+
+def shape(total_shots: int) -> tuple[int, int]:
+    """Roughly feature-film proportions: ~20 shots per scene."""
+    per_scene = min(20, total_shots)
+    return max(1, total_shots // per_scene), per_scene
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    # Filler projects so the indexes have something to skip over.
+    for _ in range(3):
+        seed_project(conn, 50, 20)
+
+    projects = {size: seed_project(conn, *shape(size)) for size in args.sizes}
+    saved_indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name IN (%s)" % ",".join("?" * len(INDEXES)), INDEXES
+    )]
+
+    print(f"{'shots':>7} | {'before p50':>11} {'p95':>9} | {'after p50':>10} {'p95':>9} | speedup")
+    for size, project_id in projects.items():
+        for name in INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.commit()
+        before = timed(lambda: legacy_get_scenes(project_id), args.repeat)
+
+        for sql in saved_indexes:
+            conn.execute(sql)
+        conn.commit()
+        main.project_scenes(project_id)  # warm the statement cache
+        after = timed(lambda: main.project_scenes(project_id), args.repeat)
+
+        assert legacy_get_scenes(project_id)["scenes"][-1]["id"] == main.project_scenes(project_id)["scenes"][-1]["id"]
+        b50, a50 = percentile(before, 50), percentile(after, 50)
+        print(f"{size:>7} | {b50 * 1000:9.2f}ms {percentile(before, 95) * 1000:7.2f}ms | "
+              f"{a50 * 1000:8.2f}ms {percentile(after, 95) * 1000:7.2f}ms | {b50 / a50:6.1f}x")
+
+    client = TestClient(main.app)
+    print(f"\n{'shots':>7} | {'after edit':>10} | {'cached':>8} | {'304':>8}   (HTTP p50)")
+    for size, project_id in projects.items():
+        shot_id = conn.execute(
+            "SELECT shots.id FROM shots JOIN scenes ON scenes.id = shots.scene_id WHERE scenes.project_id = ? LIMIT 1", (project_id,)
+        ).fetchone()[0]
+        url = f"/projects/{project_id}/scenes"
+
+        def edit_then_read():
+            conn.execute("UPDATE shots SET prompt = prompt WHERE id = ?", (shot_id,))
+            conn.commit()
+            client.get(url)
+
+        rebuilt = timed(edit_then_read, args.repeat)
+        etag = client.get(url).headers["etag"]
+        cached = timed(lambda: client.get(url), args.repeat)
+        revalidated = timed(lambda: client.get(url, headers={"If-None-Match": etag}), args.repeat)
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+        print(f"{size:>7} | {percentile(rebuilt, 50) * 1000:8.2f}ms | {percentile(cached, 50) * 1000:6.2f}ms | "
+              f"{percentile(revalidated, 50) * 1000:6.2f}ms")
@@ -0,0 +1,89 @@
+"""
+Serializing the storyboard tree of a 10k-shot project (GET /projects/{id}/scenes).
+
+    python benchmarks/bench_serialize.py --scenes 100 --shots 100
+
+"before" is what FastAPI did for the untyped route: jsonable_encoder over the
+dict tree, then json.dumps in JSONResponse. "after" is what the route does now
+on a tree cache miss: orjson over the tree as built (schemas.SceneTree only
+documents it). The middle row is the full response-model path the other typed
+routes take: validate against the model, dump to JSON types, orjson.
+
+The second table is the wire: the same body as sent with each coding
+compression.py can negotiate, and what compressing it costs.
+"""
+import argparse
+import gzip
+import json
+
+from common import use_temp_db, seed_project, timed, percentile
+
+use_temp_db()
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import compression  # noqa: E402
+import db  # noqa: E402
+import main  # noqa: E402
+import schemas  # noqa: E402
+
+tree_model = TypeAdapter(schemas.SceneTree)
+
+
+def before(tree: dict) -> bytes:
+    return json.dumps(jsonable_encoder(tree), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def typed(tree: dict) -> bytes:
+    return orjson.dumps(tree_model.dump_python(tree_model.validate_python(tree), mode="json"))
+
+
+def after(tree: dict) -> bytes:
+    return orjson.dumps(tree)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, default=100)
+    parser.add_argument("--shots", type=int, default=100, help="shots per scene")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    project_id = seed_project(conn, args.scenes, args.shots)
+    conn.close()
+    tree = main.project_scenes(project_id)
+    assert json.loads(before(tree)) == json.loads(typed(tree)) == json.loads(after(tree))
+
+    cases = [
+        ("before: jsonable_encoder + json", lambda: before(tree)),
+        ("json.dumps only", lambda: json.dumps(tree).encode()),
+        ("response model + orjson", lambda: typed(tree)),
+        ("after: orjson", lambda: after(tree)),
+    ]
+
+    build = timed(lambda: main.project_scenes(project_id), args.repeat)
+    print(f"{args.scenes * args.shots} shots in {args.scenes} scenes, {args.repeat} runs each "
+          f"(building the tree from SQLite: p50 {percentile(build, 50) * 1000:.1f}ms)")
+    print(f"{'serialize':34} | {'p50':>9} {'p95':>9}")
+    base = None
+    for name, fn in cases:
+        samples = timed(fn, args.repeat)
+        p50 = percentile(samples, 50)
+        base = base or p50
+        print(f"{name:34} | {p50 * 1000:7.1f}ms {percentile(samples, 95) * 1000:7.1f}ms   {base / p50:5.1f}x")
+
+    body = after(tree)
+    codings = [("identity", lambda: body)]
+    codings += [(f"gzip -{level}", lambda level=level: gzip.compress(body, level)) for level in (1, compression.GZIP_LEVEL, 9)]
+    if compression.brotli is not None:
+        codings += [(f"br q{q}", lambda q=q: compression.brotli.compress(body, quality=q)) for q in (compression.BROTLI_QUALITY, 11)]
+    else:
+        print("(brotli not installed: br rows skipped)")
+
+    print(f"\n{'coding':34} | {'compress p50':>12} | {'on the wire':>12}")
+    for name, fn in codings:
+        samples = timed(fn, max(3, args.repeat // 2))
+        print(f"{name:34} | {percentile(samples, 50) * 1000:10.1f}ms | {len(fn()) / 1024:10.1f}KB")
@@ -0,0 +1,63 @@
+"""
+Importing a shot list: N shots into an empty scene, then a full reorder.
+
+    python benchmarks/bench_shot_import.py --shots 1000
+
+"before" is what a script import had to do: one POST /shots per shot (each
+its own MAX(order_index) lookup and commit), then the old PUT /reorder loop of
+one UPDATE per shot. "after" is one POST /scenes/{id}/shots:batch and one
+PATCH with the new order (prepared INSERTs + a single CASE update, one commit).
+"""
+import argparse
+
+from common import use_temp_db, timed, percentile
+
+use_temp_db()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import db  # noqa: E402
+import main  # noqa: E402
+
+
+def legacy_reorder(scene_id: int, shot_ids: list[int]):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    for index, shot_id in enumerate(shot_ids):
+        cursor.execute("UPDATE shots SET order_index = ? WHERE id = ? AND scene_id = ?", (index, shot_id, scene_id))
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    client = TestClient(main.app)
+    project_id = client.post("/projects", json={"name": "Bench", "description": "", "aspect_ratio": "16:9"}).json()["project_id"]
+    prompts = [f"[CONTEXT: rain-soaked alley] Shot {i}: the detective turns toward the light." for i in range(args.shots)]
+
+    def new_scene() -> int:
+        return client.post(f"/projects/{project_id}/scenes", json={"name": "Import", "description": ""}).json()["id"]
+
+    def import_one_by_one():
+        scene_id = new_scene()
+        ids = [client.post("/shots", json={"scene_id": scene_id, "prompt": p}).json()["id"] for p in prompts]
+        legacy_reorder(scene_id, ids[::-1])
+
+    def import_batched():
+        scene_id = new_scene()
+        ids = client.post(f"/scenes/{scene_id}/shots:batch", json={"shots": [{"prompt": p} for p in prompts]}).json()["created"]
+        scene = client.patch(f"/scenes/{scene_id}/shots:batch", json={"order": ids[::-1]}).json()
+        assert [s["id"] for s in scene["shots"]] == ids[::-1]
+
+    before = timed(import_one_by_one, args.repeat)
+    after = timed(import_batched, args.repeat)
+
+    b50, a50 = percentile(before, 50), percentile(after, 50)
+    print(f"{args.shots} shots, import + reorder over HTTP ({args.repeat} runs)")
+    print(f"  before (per-shot calls)  p50 {b50 * 1000:9.1f}ms   max {max(before) * 1000:9.1f}ms")
+    print(f"  after  (batch + PATCH)   p50 {a50 * 1000:9.1f}ms   max {max(after) * 1000:9.1f}ms")
+    print(f"  speedup {b50 / a50:.1f}x")
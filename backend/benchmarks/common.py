@@ -0,0 +1,63 @@
+"""Shared helpers for the benchmark scripts: a throwaway studio.db and seed data."""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def use_temp_db() -> str:
+    """Point the app at a fresh, fully migrated database file. Call BEFORE importing main."""
+    path = os.path.join(tempfile.mkdtemp(prefix="studio_bench_"), "studio.db")
+    os.environ["STUDIO_DB"] = path
+    import db
+    import migrate
+    db.DB_PATH = path
+    migrate.apply_pending(path, verbose=False)
+    return path
+
+
+def seed_project(conn, scenes: int, shots_per_scene: int, assets: int = 0) -> int:
+    """Insert one project with `scenes` x `shots_per_scene` shots. Returns the project id."""
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO projects (name, description, aspect_ratio) VALUES ('Bench', 'seeded', '16:9')")
+    project_id = cursor.lastrowid
+    prompt = "[CONTEXT: rain-soaked neon alley at night] A detective lights a cigarette and looks up. " * 3
+    for s in range(scenes):
+        cursor.execute(
+            "INSERT INTO scenes (project_id, name, description, order_index) VALUES (?, ?, ?, ?)",
+            (project_id, f"Scene {s}", "seeded scene", s),
+        )
+        scene_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO shots (scene_id, prompt, status, keyframe_url, video_url, order_index) VALUES (?, ?, 'complete', ?, ?, ?)",
+            [
+                (scene_id, prompt, f"http://127.0.0.1:8000/generated/k_{s}_{i}.png",
+                 f"http://127.0.0.1:8000/generated/v_{s}_{i}.mp4", i)
+                for i in range(shots_per_scene)
+            ],
+        )
+    cursor.executemany(
+        "INSERT INTO assets (project_id, type, name, prompt, image_path) VALUES (?, 'cast', ?, ?, ?)",
+        [(project_id, f"Asset {i}", prompt, f"http://127.0.0.1:8000/generated/a_{i}.png") for i in range(assets)],
+    )
+    conn.commit()
+    return project_id
+
+
+def timed(fn, repeat: int) -> list[float]:
+    """Run fn `repeat` times, returning per-call latencies in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
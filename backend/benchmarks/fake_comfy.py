@@ -0,0 +1,192 @@
+"""
+Fake ComfyUI server for exercising the render pipeline without a GPU.
+
+Speaks the subset of the ComfyUI API the backend uses: /prompt, /ws, /history,
+/view, /queue, /upload/image and /system_stats. Prompts run one at a time
+(like a single GPU) and each takes --delay seconds, plus --batch-cost x delay
+for every extra image in a latent batch. --latency adds a round trip to every
+HTTP request, like a remote RunPod pod.
+
+    python benchmarks/fake_comfy.py --port 8191 --delay 2
+    python benchmarks/fake_comfy.py --port 8192 --delay 2 --no-ws
+
+Point backends.json at a few of these and kill one mid-render to watch its
+jobs get re-queued onto the others.
+"""
+import argparse
+import asyncio
+import json
+import os
+import uuid
+
+from aiohttp import web
+
+
+class FakeComfy:
+    def __init__(self, delay: float, output_bytes: int, websocket: bool = True, flaky: bool = False, batch_cost: float = 0.0,
+                 latency: float = 0.0):
+        self.delay = delay
+        self.latency = latency         # seconds added to every HTTP request
+        self.batch_cost = batch_cost   # extra delay per additional image in a batch, as a fraction of `delay`
+        self.output_bytes = output_bytes
+        self.output = os.urandom(64) * (output_bytes // 64)
+        self.websocket = websocket
+        self.flaky = flaky           # cut the first transfer of each file halfway through
+        self.served = set()
+        self.history = {}
+        self.pending = []            # [(prompt_id, client_id, workflow)]
+        self.running = None
+        self.sockets = {}            # client_id -> WebSocketResponse
+        self.uploads = {}
+        self.prompts_received = 0
+        self._work = asyncio.Event()
+
+    async def send(self, client_id, event_type, data):
+        ws = self.sockets.get(client_id)
+        if ws is not None and not ws.closed:
+            await ws.send_str(json.dumps({"type": event_type, "data": data}))
+
+    async def worker(self):
+        while True:
+            if not self.pending:
+                self._work.clear()
+                await self._work.wait()
+                continue
+            prompt_id, client_id, workflow = self.pending.pop(0)
+            self.running = prompt_id
+            await self.send(client_id, "execution_start", {"prompt_id": prompt_id})
+            batch = 1
+            for node in workflow.values():
+                batch = max(batch, int(node.get("inputs", {}).get("batch_size", 1) or 1))
+            delay = self.delay * (1 + self.batch_cost * (batch - 1))
+            steps = 4
+            for step in range(1, steps + 1):
+                await asyncio.sleep(delay / steps)
+                await self.send(client_id, "progress", {"value": step, "max": steps, "prompt_id": prompt_id, "node": "3"})
+
+            is_video = any(node.get("class_type") == "VHS_VideoCombine" for node in workflow.values())
+            key, ext = ("gifs", "mp4") if is_video else ("images", "png")
+            files = [{"filename": f"{prompt_id}_{i}.{ext}", "subfolder": "", "type": "output"} for i in range(batch)]
+            save_node = next((nid for nid, n in workflow.items() if n.get("class_type") in ("SaveImage", "VHS_VideoCombine")), "9")
+            output = {key: files}
+
+            self.history[prompt_id] = {"outputs": {save_node: output}, "status": {"status_str": "success", "completed": True}}
+            await self.send(client_id, "executed", {"node": save_node, "output": output, "prompt_id": prompt_id})
+            await self.send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+            self.running = None
+
+    # --- ROUTES ---
+
+    async def prompt(self, request):
+        body = await request.json()
+        prompt_id = str(uuid.uuid4())
+        self.prompts_received += 1
+        self.pending.append((prompt_id, body.get("client_id"), body["prompt"]))
+        self._work.set()
+        return web.json_response({"prompt_id": prompt_id, "number": self.prompts_received, "node_errors": {}})
+
+    async def get_history(self, request):
+        prompt_id = request.match_info["prompt_id"]
+        return web.json_response({prompt_id: self.history[prompt_id]} if prompt_id in self.history else {})
+
+    async def view(self, request):
+        data, status = self.output, 200
+        http_range = request.http_range
+        if http_range.start:
+            data, status = data[http_range.start:], 206
+
+        resp = web.StreamResponse(status=status, headers={"Content-Type": "application/octet-stream"})
+        resp.content_length = len(data)
+        if status == 206:
+            resp.headers["Content-Range"] = f"bytes {http_range.start}-{len(self.output) - 1}/{len(self.output)}"
+        await resp.prepare(request)
+
+        filename = request.query.get("filename")
+        if self.flaky and filename not in self.served:
+            self.served.add(filename)
+            await resp.write(data[:len(data) // 2])
+            request.transport.close()
+            return resp
+        await resp.write(data)
+        await resp.write_eof()
+        return resp
+
+    async def ws(self, request):
+        if not self.websocket:
+            raise web.HTTPNotFound()
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or str(uuid.uuid4())
+        self.sockets[client_id] = ws
+        await ws.send_str(json.dumps({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": len(self.pending)}}, "sid": client_id}}))
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self.sockets.pop(client_id, None)
+        return ws
+
+    async def queue(self, request):
+        running = [[0, self.running]] if self.running else []
+        return web.json_response({"queue_running": running, "queue_pending": [[0, p[0]] for p in self.pending]})
+
+    async def upload_image(self, request):
+        form = await request.post()
+        image = form["image"]
+        self.uploads[image.filename] = len(image.file.read())
+        return web.json_response({"name": image.filename, "subfolder": "", "type": "input"})
+
+    async def system_stats(self, request):
+        return web.json_response({"system": {"os": "fake", "python_version": "3"}, "devices": []})
+
+    def app(self) -> web.Application:
+        @web.middleware
+        async def round_trip(request, handler):
+            await asyncio.sleep(self.latency)
+            return await handler(request)
+
+        app = web.Application(middlewares=[round_trip] if self.latency else [])
+        app.router.add_post("/prompt", self.prompt)
+        app.router.add_get("/history/{prompt_id}", self.get_history)
+        app.router.add_get("/view", self.view)
+        app.router.add_get("/ws", self.ws)
+        app.router.add_get("/queue", self.queue)
+        app.router.add_post("/upload/image", self.upload_image)
+        app.router.add_get("/system_stats", self.system_stats)
+
+        async def start_worker(app):
+            app["worker"] = asyncio.create_task(self.worker())
+
+        async def stop_worker(app):
+            app["worker"].cancel()
+
+        app.on_startup.append(start_worker)
+        app.on_cleanup.append(stop_worker)
+        return app
+
+
+async def serve(port: int, delay: float = 0.5, output_bytes: int = 256 * 1024, websocket: bool = True,
+                flaky: bool = False, batch_cost: float = 0.0, latency: float = 0.0):
+    """Start a fake server inside an existing event loop (for benchmarks). Returns (FakeComfy, AppRunner)."""
+    fake = FakeComfy(delay, output_bytes, websocket, flaky, batch_cost, latency)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return fake, runner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--delay", type=float, default=2.0, help="Seconds each prompt 'renders' for")
+    parser.add_argument("--output-bytes", type=int, default=256 * 1024, help="Size of each fake output file")
+    parser.add_argument("--no-ws", action="store_true", help="Refuse websocket connections (forces polling)")
+    parser.add_argument("--flaky", action="store_true", help="Drop the first download of each output halfway (tests resume)")
+    parser.add_argument("--batch-cost", type=float, default=0.0, help="Extra delay per additional batched image, as a fraction of --delay")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of round trip added to every HTTP request")
+    args = parser.parse_args()
+
+    fake = FakeComfy(args.delay, args.output_bytes, websocket=not args.no_ws, flaky=args.flaky,
+                     batch_cost=args.batch_cost, latency=args.latency)
+    print(f"🧪 Fake ComfyUI on http://127.0.0.1:{args.port} ({args.delay}s per prompt)")
+    web.run_app(fake.app(), host="127.0.0.1", port=args.port, print=None)
@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from db import get_db_connection
+
+# Content-addressed store for everything under generated/ (renders, stitched
+# keyframes) and character face uploads.
+#
+# A file lives at generated/<h[0:2]>/<h[2:4]>/<sha256>.<ext>, so identical
+# bytes are stored once no matter how often they are rendered or uploaded.
+# Each blob has a row in `blobs`; SQLite triggers (migrations/0006) keep its
+# refcount in step with the sha256 columns of assets, takes, shots and
+# characters, so routes just write/delete rows and call collect() afterwards.
+#
+# A fresh blob has refcount 0 until the row pointing at it is inserted, so
+# collect() leaves blobs alone for GC_GRACE seconds after they were ingested.
+
+BASE_DIR = Path(__file__).resolve().parent
+STORE_DIR = BASE_DIR / "generated"
+PUBLIC_URL = "http://127.0.0.1:8000"
+GC_GRACE = 60
+DERIVATIVE_DIRS = ("thumbs", "frames")   # thumbnails.py, frames.py
+CHUNK = 1 << 20
+
+
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def is_sha256(value: str) -> bool:
+    """True for a blob key as the store writes it: 64 lowercase hex characters."""
+    return bool(SHA256_PATTERN.fullmatch(value or ""))
+
+
+def sha256_file(path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: Path = STORE_DIR, web_prefix: str = "/generated"):
+        self.root = Path(root)
+        self.web_prefix = web_prefix
+        self._lock = threading.Lock()
+
+    def relpath(self, sha256: str, ext: str) -> str:
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+    def ingest(self, src_path, sha256: str | None = None, ext: str | None = None) -> dict:
+        """
+        Move a finished file into the store (it must be on the same filesystem,
+        e.g. a download in generated/). If the content is already stored the
+        source is simply deleted. Returns {"sha256", "url", "path", "size"}.
+        """
+        src_path = Path(src_path)
+        sha256 = sha256 or sha256_file(src_path)
+        ext = (ext or src_path.suffix.lstrip(".") or "bin").lower()
+
+        with self._lock:
+            conn = get_db_connection()
+            row = conn.execute("SELECT path, url, size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            relpath = row["path"] if row else self.relpath(sha256, ext)
+            target = self.root / relpath
+            if target.exists():
+                src_path.unlink()
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(src_path, target)
+
+            url = row["url"] if row else f"{PUBLIC_URL}{self.web_prefix}/{relpath}"
+            size = target.stat().st_size
+            conn.execute(
+                "INSERT INTO blobs (sha256, path, url, size, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET last_seen = excluded.last_seen",
+                (sha256, relpath, url, size, time.time()),
+            )
+            conn.commit()
+            conn.close()
+        return {"sha256": sha256, "url": url, "path": str(target), "size": size}
+
+    def ingest_stream(self, fileobj, ext: str) -> dict:
+        """Store an uploaded file object, hashing it while it is copied to disk."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f"upload_{uuid.uuid4().hex[:8]}.part"
+        hasher = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as out:
+                for chunk in iter(lambda: fileobj.read(CHUNK), b""):
+                    hasher.update(chunk)
+                    out.write(chunk)
+            return self.ingest(tmp_path, hasher.hexdigest(), ext)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def resolve_url(self, url: str | None) -> str | None:
+        """sha256 of the blob served at `url` (None for URLs the store doesn't own)."""
+        if not url:
+            return None
+        conn = get_db_connection()
+        row = conn.execute("SELECT sha256 FROM blobs WHERE url = ?", (url,)).fetchone()
+        conn.close()
+        return row["sha256"] if row else None
+
+    def resolve_urls(self, urls) -> dict:
+        """resolve_url for many URLs in one query: {url: sha256} for the ones the store owns."""
+        urls = sorted({url for url in urls if url})
+        if not urls:
+            return {}
+        conn = get_db_connection()
+        rows = conn.execute(
+            "SELECT url, sha256 FROM blobs WHERE url IN (SELECT value FROM json_each(?))", (json.dumps(urls),)
+        ).fetchall()
+        conn.close()
+        return {row["url"]: row["sha256"] for row in rows}
+
+    def local_path(self, sha256: str | None) -> Path | None:
+        if not sha256:
+            return None
+        conn = get_db_connection()
+        row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        conn.close()
+        return self.root / row["path"] if row else None
+
+    def collect(self, grace: float = GC_GRACE) -> dict:
+        """Delete every blob no row references any more. Returns {"removed", "bytes"}."""
+        with self._lock:
+            conn = get_db_connection()
+            # Outputs held by the render cache are evicted by render_cache.py, by size
+            doomed = conn.execute(
+                "DELETE FROM blobs WHERE refcount <= 0 AND last_seen < ? "
+                "AND sha256 NOT IN (SELECT sha256 FROM render_cache) RETURNING sha256, path, size",
+                (time.time() - grace,),
+            ).fetchall()
+            conn.commit()
+            conn.close()
+
+            freed = 0
+            for row in doomed:
+                try:
+                    (self.root / row["path"]).unlink()
+                    freed += row["size"] or 0
+                except FileNotFoundError:
+                    pass
+                # Thumbnails, posters and extracted frames derived from it
+                for folder in DERIVATIVE_DIRS:
+                    for derivative in (self.root / folder / row["sha256"][:2]).glob(f"{row['sha256']}_*"):
+                        derivative.unlink(missing_ok=True)
+        if doomed:
+            print(f"🧹 Removed {len(doomed)} unreferenced blob(s), {freed / 1e6:.1f} MB")
+        return {"removed": len(doomed), "bytes": freed}
+
+    def sweep_legacy(self, *dirs: Path) -> dict:
+        """
+        Delete pre-store flat files (generated/flux_xxx.png, assets/faces/...)
+        whose exact bytes are already in the store. Anything else is kept.
+        """
+        removed, freed = 0, 0
+        conn = get_db_connection()
+        for directory in (self.root, *dirs):
+            if not directory.exists():
+                continue
+            for path in directory.iterdir():
+                if not path.is_file() or path.suffix == ".part":
+                    continue
+                sha256 = sha256_file(path)
+                row = conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+                if row and (self.root / row["path"]).exists():
+                    freed += path.stat().st_size
+                    path.unlink()
+                    removed += 1
+        conn.close()
+        return {"removed": removed, "bytes": freed}
+
+
+blob_store = BlobStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Garbage-collect the content-addressed blob store")
+    parser.add_argument("--grace", type=float, default=GC_GRACE, help="Keep unreferenced blobs younger than this (seconds)")
+    parser.add_argument("--legacy", action="store_true", help="Also delete old flat files already imported into the store")
+    args = parser.parse_args()
+
+    result = blob_store.collect(args.grace)
+    print(f"✅ GC: {result['removed']} blob(s) removed, {result['bytes'] / 1e6:.1f} MB freed")
+    if args.legacy:
+        legacy = blob_store.sweep_legacy(BASE_DIR / "assets" / "faces")
+        print(f"✅ Legacy sweep: {legacy['removed']} duplicate file(s) removed, {legacy['bytes'] / 1e6:.1f} MB freed")
@@ -1,36 +1,20 @@
-import sqlite3
-import os
-import shutil
 from fastapi import UploadFile
 from models import Character
-
-DB_PATH = "studio.db"
-FACES_DIR = "assets/faces"
-
-# Ensure the faces directory exists
-if not os.path.exists(FACES_DIR):
-    os.makedirs(FACES_DIR)
-
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+from db import get_db_connection
+from blobstore import blob_store
 
 def add_character(name: str, description: str, face_file: UploadFile) -> Character:
-    # 1. Save the Face Image locally
+    # 1. Save the Face Image into the content-addressed store
     file_extension = face_file.filename.split(".")[-1]
-    safe_filename = f"{name.replace(' ', '_').lower()}_ref.{file_extension}"
-    file_path = os.path.join(FACES_DIR, safe_filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(face_file.file, buffer)
+    blob = blob_store.ingest_stream(face_file.file, file_extension)
+    file_path = blob["path"]
 
     # 2. Save to SQLite
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute(
-        "INSERT INTO characters (name, description, face_path) VALUES (?, ?, ?)", 
-        (name, description, file_path)
+        "INSERT INTO characters (name, description, face_path, face_sha256) VALUES (?, ?, ?, ?)", 
+        (name, description, file_path, blob["sha256"])
     )
     new_id = cursor.lastrowid
     conn.commit()
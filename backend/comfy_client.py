@@ -0,0 +1,451 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import aiohttp
+
+from metrics import comfy_errors, comfy_timeouts, current_request_id, renders_in_flight, stage_seconds, timed_stage
+
+# Shared asyncio client for ComfyUI. Both generators (Flux images in
+# runpod_client.py and Wan videos in local_video.py) submit through here.
+#
+# Completion is detected on ComfyUI's /ws?clientId= progress stream, so an
+# output is fetched the moment its `executed` event arrives. If the socket
+# can't be opened (or drops mid-render) we fall back to polling /history
+# with exponential backoff.
+#
+# The same stream carries step progress; pass on_event to hear about it (see
+# ComfyClient._emit for the event shape).
+#
+# Each client reports to metrics.py under its `operation` (the generator using
+# it): submit/upload/download times, how a render split into queue wait and
+# execution, errors, timeouts and prompts in flight per server. Its ComfyUI
+# client_id starts with the id of the HTTP request being served, if any.
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+DEFAULT_TIMEOUT = 1800      # seconds a single render may take (Wan can be slow)
+POLL_MIN_DELAY = 0.25       # fallback polling starts fast...
+POLL_MAX_DELAY = 4.0        # ...and backs off to this ceiling
+DOWNLOAD_CHUNK = 1 << 20    # outputs are streamed to disk 1 MiB at a time
+DOWNLOAD_RETRIES = 3        # resume attempts (HTTP Range) after a dropped connection
+
+
+class ComfyError(Exception):
+    """Raised when ComfyUI rejects a prompt, fails executing it, or times out."""
+
+
+def _fsync_dir(path: str):
+    """Persist the rename itself (POSIX only; Windows can't open directories)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ComfyClient:
+    def __init__(self, base_url: str, client_id: str | None = None, session: aiohttp.ClientSession | None = None,
+                 on_event=None, operation: str = "comfy"):
+        self.base_url = base_url.rstrip("/")
+        request_id = current_request_id()
+        # Unique per client (ComfyUI keeps one socket per id), traceable to the request
+        self.client_id = client_id or (f"{request_id}-{uuid.uuid4().hex[:8]}" if request_id else str(uuid.uuid4()))
+        self.on_event = on_event      # callable(dict) for progress events, or None
+        self.operation = operation    # metrics label, e.g. "generate_wan_video"
+        self._session = session
+        self._owns_session = session is None
+        self._queued = {}             # prompt id -> when we queued it (monotonic), until it settles
+        self._started = {}            # prompt id -> when ComfyUI began executing it
+        self._messages = {}           # prompt id -> status messages from its /history entry
+
+    async def __aenter__(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(headers=HEADERS)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError("ComfyClient must be used as 'async with ComfyClient(...)'")
+        return self._session
+
+    def ws_url(self) -> str:
+        scheme = "wss" if self.base_url.startswith("https") else "ws"
+        host = self.base_url.split("://", 1)[-1]
+        return f"{scheme}://{host}/ws?clientId={self.client_id}"
+
+    # --- 1. PLAIN HTTP API ---
+
+    async def queue_prompt(self, workflow: dict) -> str:
+        payload = {"prompt": workflow, "client_id": self.client_id}
+        with timed_stage(self.operation, "submit"):
+            async with self.session.post(f"{self.base_url}/prompt", json=payload) as resp:
+                body = await resp.text()
+                if resp.status != 200:
+                    raise self._fail("rejected", f"ComfyUI rejected prompt ({resp.status}): {body[:300]}")
+        prompt_id = json.loads(body)["prompt_id"]
+        self._queued[prompt_id] = time.monotonic()
+        renders_in_flight.inc(backend=self.base_url)
+        return prompt_id
+
+    async def get_history(self, prompt_id: str) -> dict:
+        async with self.session.get(f"{self.base_url}/history/{prompt_id}") as resp:
+            if resp.status != 200:
+                return {}
+            return await resp.json(content_type=None)
+
+    async def download(self, file_info: dict, output_path: str, checksum: bool = False) -> str | None:
+        """
+        Stream an output file ({filename, subfolder, type}) to `output_path`.
+
+        Chunks go to a temp file next to the destination, which is fsynced and
+        atomically renamed into place once its size matches Content-Length, so
+        a half-written render is never visible under its final name. A dropped
+        connection resumes with a Range request. Returns the SHA-256 hex digest
+        when `checksum` is set (hashed while streaming), else None.
+        """
+        params = {"filename": file_info["filename"], "subfolder": file_info.get("subfolder", ""), "type": file_info.get("type", "output")}
+        tmp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.part"
+        hasher = hashlib.sha256() if checksum else None
+        written, expected = 0, None
+        started = time.perf_counter()
+
+        try:
+            with open(tmp_path, "wb") as f:
+                for attempt in range(DOWNLOAD_RETRIES + 1):
+                    headers = {"Range": f"bytes={written}-"} if written else {}
+                    try:
+                        async with self.session.get(f"{self.base_url}/view", params=params, headers=headers) as resp:
+                            if resp.status not in (200, 206):
+                                raise self._fail("download", f"Could not fetch {params['filename']} ({resp.status})")
+                            if written and resp.status == 200:
+                                # Server ignored the Range header: start over.
+                                f.seek(0)
+                                f.truncate()
+                                written = 0
+                                hasher = hashlib.sha256() if checksum else None
+                            if resp.content_length is not None and "Content-Encoding" not in resp.headers:
+                                expected = written + resp.content_length
+
+                            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK):
+                                f.write(chunk)
+                                if hasher is not None:
+                                    hasher.update(chunk)
+                                written += len(chunk)
+                        if expected is None or written == expected:
+                            break
+                        reason = f"got {written} of {expected} bytes"
+                    except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                        reason = str(e) or type(e).__name__
+                    if attempt == DOWNLOAD_RETRIES:
+                        raise self._fail("download", f"Download of {params['filename']} failed: {reason}")
+                    print(f"⚠️ Download of {params['filename']} interrupted ({reason}), resuming at byte {written}")
+                    await asyncio.sleep(0.5 * (attempt + 1))
+
+                f.flush()
+                await asyncio.to_thread(os.fsync, f.fileno())
+            os.replace(tmp_path, output_path)
+            _fsync_dir(os.path.dirname(os.path.abspath(output_path)))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._observe("download", time.perf_counter() - started)
+        return hasher.hexdigest() if hasher is not None else None
+
+    async def upload_image(self, local_path: str, overwrite: bool = True) -> str:
+        """Push a local image into ComfyUI's input folder; returns the remote name for LoadImage."""
+        form = aiohttp.FormData()
+        form.add_field("overwrite", "true" if overwrite else "false")
+        with open(local_path, "rb") as f:
+            form.add_field("image", f.read(), filename=local_path.replace("\\", "/").split("/")[-1])
+        with timed_stage(self.operation, "upload"):
+            async with self.session.post(f"{self.base_url}/upload/image", data=form) as resp:
+                if resp.status != 200:
+                    raise self._fail("upload", f"Image upload failed ({resp.status})")
+                info = await resp.json(content_type=None)
+        if info.get("subfolder"):
+            return f"{info['subfolder']}/{info['name']}"
+        return info["name"]
+
+    # --- 2. COMPLETION ---
+
+    async def run(self, workflow: dict, output_key: str = "images", timeout: float = DEFAULT_TIMEOUT) -> dict:
+        """
+        Queue a workflow and wait for it. Returns the first node output that
+        carries `output_key` (e.g. "images" or "gifs"), as ComfyUI reports it.
+        """
+        ws = None
+        try:
+            ws = await self.session.ws_connect(self.ws_url(), heartbeat=30)
+        except (aiohttp.ClientError, OSError) as e:
+            print(f"⚠️ ComfyUI websocket unavailable ({e}), falling back to polling")
+
+        prompt_id = None
+        try:
+            # Socket is opened BEFORE queueing so we can't miss the events of a fast render.
+            prompt_id = await self.queue_prompt(workflow)
+            await self.report_queue({prompt_id})
+            output = await asyncio.wait_for(self._wait(prompt_id, ws, output_key), timeout)
+            self._settle(prompt_id, ok=True)
+            return output
+        except asyncio.TimeoutError:
+            comfy_timeouts.inc(backend=self.base_url)
+            raise ComfyError(f"Timed out after {timeout:.0f}s waiting for ComfyUI")
+        except (aiohttp.ClientError, OSError):
+            comfy_errors.inc(backend=self.base_url, kind="connection")
+            raise
+        finally:
+            self._settle(prompt_id, ok=False)
+            if ws is not None:
+                await ws.close()
+
+    async def run_many(self, graphs: list[dict], output_key: str = "images", timeout: float = DEFAULT_TIMEOUT):
+        """
+        Queue every workflow up front so ComfyUI runs them back to back, then
+        yield (index, output, error) as each one finishes, in completion order.
+        A failed prompt yields its error message instead of ending the batch.
+        `timeout` bounds the wait for each next completion, not the whole batch.
+        """
+        ws = None
+        try:
+            ws = await self.session.ws_connect(self.ws_url(), heartbeat=30)
+        except (aiohttp.ClientError, OSError) as e:
+            print(f"⚠️ ComfyUI websocket unavailable ({e}), falling back to polling")
+
+        index = {}
+        try:
+            for i, graph in enumerate(graphs):
+                index[await self.queue_prompt(graph)] = i
+            remaining = set(index)
+            await self.report_queue(remaining)
+            events = self._events_ws(remaining, ws, output_key) if ws is not None else None
+            while remaining:
+                try:
+                    if events is not None:
+                        try:
+                            prompt_id, output, error = await asyncio.wait_for(anext(events), timeout)
+                        except (StopAsyncIteration, aiohttp.ClientError, ConnectionError) as e:
+                            print(f"⚠️ ComfyUI websocket dropped ({e or 'closed'}), falling back to polling")
+                            events = None
+                            continue
+                    else:
+                        prompt_id, output, error = await asyncio.wait_for(self._next_polled(remaining, output_key), timeout)
+                except asyncio.TimeoutError:
+                    comfy_timeouts.inc(len(remaining), backend=self.base_url)
+                    for prompt_id in remaining:
+                        yield index[prompt_id], None, f"Timed out after {timeout:.0f}s waiting for ComfyUI"
+                    return
+                remaining.discard(prompt_id)
+                self._settle(prompt_id, ok=error is None)
+                yield index[prompt_id], output, error
+        except (aiohttp.ClientError, OSError):
+            comfy_errors.inc(backend=self.base_url, kind="connection")
+            raise
+        finally:
+            for prompt_id in index:
+                self._settle(prompt_id, ok=False)
+            if ws is not None:
+                await ws.close()
+
+    async def _events_ws(self, remaining: set, ws, output_key: str):
+        """(prompt_id, output, error) for each prompt in `remaining` as its events arrive."""
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            event = json.loads(msg.data)
+            kind, data = event.get("type"), event.get("data") or {}
+            await self._track(kind, data, remaining)
+            prompt_id = data.get("prompt_id")
+            if prompt_id not in remaining:
+                continue
+
+            if kind == "executed":
+                output = data.get("output") or {}
+                if output.get(output_key):
+                    yield prompt_id, output, None
+            elif kind == "execution_error":
+                comfy_errors.inc(backend=self.base_url, kind="execution")
+                yield prompt_id, None, f"{data.get('node_type', 'Node')} failed: {data.get('exception_message', 'unknown error')}"
+            elif kind == "execution_interrupted":
+                comfy_errors.inc(backend=self.base_url, kind="interrupted")
+                yield prompt_id, None, "Render was interrupted on the ComfyUI server"
+            elif (kind == "executing" and data.get("node") is None) or kind == "execution_success":
+                # Finished without an `executed` event for our output (e.g. fully cached) -> read history.
+                try:
+                    output = await self._output_from_history(prompt_id, output_key, required=True)
+                except ComfyError as e:
+                    yield prompt_id, None, str(e)
+                else:
+                    yield prompt_id, output, None
+
+    async def _next_polled(self, remaining: set, output_key: str) -> tuple:
+        delay = POLL_MIN_DELAY
+        while True:
+            for prompt_id in list(remaining):
+                try:
+                    output = await self._output_from_history(prompt_id, output_key)
+                except ComfyError as e:
+                    return prompt_id, None, str(e)
+                if output is not None:
+                    return prompt_id, output, None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, POLL_MAX_DELAY)
+
+    async def _wait(self, prompt_id: str, ws, output_key: str) -> dict:
+        if ws is not None:
+            try:
+                output = await self._wait_ws(prompt_id, ws, output_key)
+                if output is not None:
+                    return output
+            except (aiohttp.ClientError, ConnectionError) as e:
+                print(f"⚠️ ComfyUI websocket dropped ({e}), falling back to polling")
+        return await self._wait_poll(prompt_id, output_key)
+
+    async def _wait_ws(self, prompt_id: str, ws, output_key: str) -> dict | None:
+        """Returns the output from the stream, or None if the stream ended without one."""
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue  # binary frames are latent previews
+            event = json.loads(msg.data)
+            kind, data = event.get("type"), event.get("data") or {}
+            if data.get("prompt_id") not in (None, prompt_id):
+                continue
+            await self._track(kind, data, {prompt_id})
+
+            if kind == "executed" and data.get("prompt_id") == prompt_id:
+                output = data.get("output") or {}
+                if output.get(output_key):
+                    return output
+            elif kind == "execution_error" and data.get("prompt_id") == prompt_id:
+                raise self._fail("execution", f"{data.get('node_type', 'Node')} failed: {data.get('exception_message', 'unknown error')}")
+            elif kind == "execution_interrupted" and data.get("prompt_id") == prompt_id:
+                raise self._fail("interrupted", "Render was interrupted on the ComfyUI server")
+            elif (kind == "executing" and data.get("node") is None and data.get("prompt_id") == prompt_id) or \
+                    (kind == "execution_success" and data.get("prompt_id") == prompt_id):
+                # Finished without an `executed` event for our output (e.g. fully cached) -> read history.
+                return await self._output_from_history(prompt_id, output_key, required=True)
+        return None
+
+    async def _wait_poll(self, prompt_id: str, output_key: str) -> dict:
+        delay = POLL_MIN_DELAY
+        while True:
+            output = await self._output_from_history(prompt_id, output_key)
+            if output is not None:
+                return output
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, POLL_MAX_DELAY)
+
+    async def _output_from_history(self, prompt_id: str, output_key: str, required: bool = False) -> dict | None:
+        history = await self.get_history(prompt_id)
+        if prompt_id not in history:
+            if required:
+                raise self._fail("history", "ComfyUI finished but reported no history for the prompt")
+            return None
+
+        entry = history[prompt_id]
+        status = entry.get("status") or {}
+        self._messages[prompt_id] = status.get("messages") or []
+        if status.get("status_str") == "error":
+            raise self._fail("execution", "ComfyUI reported an execution error")
+
+        for node_output in entry.get("outputs", {}).values():
+            if node_output.get(output_key):
+                return node_output
+        raise self._fail("history", f"Workflow finished without any '{output_key}' output")
+
+    # --- 3. PROGRESS ---
+
+    def _emit(self, prompt_id: str, stage: str, **detail):
+        """on_event({"prompt_id", "stage": "queued" | "running", ...}); queued events carry queue_position, running ones step/steps."""
+        if self.on_event is not None:
+            self.on_event({"prompt_id": prompt_id, "stage": stage, **detail})
+
+    async def _track(self, kind: str, data: dict, prompt_ids: set):
+        prompt_id = data.get("prompt_id")
+        if kind in ("execution_start", "progress") and prompt_id in prompt_ids:
+            self._started.setdefault(prompt_id, time.monotonic())
+        if self.on_event is None:
+            return
+        if kind == "execution_start" and prompt_id in prompt_ids:
+            self._emit(prompt_id, "running", step=0, steps=None)
+        elif kind == "progress" and prompt_id in prompt_ids:
+            self._emit(prompt_id, "running", step=data.get("value"), steps=data.get("max"), node=data.get("node"))
+        elif kind == "status":
+            # The server's queue changed: ours may have moved up.
+            await self.report_queue(prompt_ids)
+
+    async def report_queue(self, prompt_ids: set):
+        """Emit how many prompts are ahead of each of ours still waiting in ComfyUI's queue."""
+        waiting = [prompt_id for prompt_id in prompt_ids if prompt_id not in self._started]
+        if self.on_event is None or not waiting:
+            return
+        try:
+            async with self.session.get(f"{self.base_url}/queue") as resp:
+                queue = await resp.json(content_type=None) if resp.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return
+        if not queue:
+            return
+        running = len(queue.get("queue_running") or [])
+        pending = [entry[1] for entry in sorted(queue.get("queue_pending") or [], key=lambda entry: entry[0])]
+        for prompt_id in waiting:
+            if prompt_id in pending:
+                self._emit(prompt_id, "queued", queue_position=running + pending.index(prompt_id))
+
+    # --- 4. METRICS ---
+
+    def _observe(self, stage: str, seconds: float):
+        stage_seconds.observe(seconds, operation=self.operation, stage=stage)
+
+    def _fail(self, kind: str, message: str) -> ComfyError:
+        """Count the failure and return the error to raise."""
+        comfy_errors.inc(backend=self.base_url, kind=kind)
+        return ComfyError(message)
+
+    def _settle(self, prompt_id: str | None, ok: bool):
+        """
+        The prompt's output arrived (ok) or we gave up on it: it leaves the
+        in-flight gauge, and a success records where its time went. Only the
+        first call per prompt counts.
+        """
+        queued_at = self._queued.pop(prompt_id, None)
+        if queued_at is None:
+            return
+        renders_in_flight.dec(backend=self.base_url)
+        if not ok:
+            return
+        now = time.monotonic()
+        self._observe("render", now - queued_at)
+        started_at = self._started.get(prompt_id)
+        if started_at is not None:
+            # Seen live on the websocket; noticing the finish took no polling.
+            self._observe("queue_wait", started_at - queued_at)
+            self._observe("execute", now - started_at)
+            return
+
+        # Polled: the /history entry's timestamps (ComfyUI's clock, in ms) split the wait.
+        stamps = {name: data.get("timestamp") for name, data in self._messages.pop(prompt_id, ()) if isinstance(data, dict)}
+        start, end = stamps.get("execution_start"), stamps.get("execution_success")
+        if start and end:
+            execute = (end - start) / 1000
+            lag = max(0.0, time.time() - end / 1000)    # assumes the ComfyUI host's clock roughly agrees with ours
+            self._observe("execute", execute)
+            self._observe("poll_lag", lag)
+            self._observe("queue_wait", max(0.0, now - queued_at - execute - lag))
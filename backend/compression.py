@@ -0,0 +1,120 @@
+import gzip
+import os
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+
+try:
+    import brotli
+except ImportError:          # optional: without it clients just get gzip
+    brotli = None
+
+# Negotiated compression for API responses.
+#
+# A 10k-shot storyboard is ~5 MB of JSON with the same prompt prefixes and URLs
+# on every shot; gzipped it is ~135 KB (benchmarks/bench_serialize.py). Each request gets the best
+# coding its Accept-Encoding allows (q-values honoured): br when the `brotli`
+# package is installed, else gzip, else identity. Bodies under
+# COMPRESS_MIN_BYTES go out as they are.
+#
+# Media routes (renders, thumbnails, faces) are skipped: the files are already
+# compressed and media.py serves them with Range and sendfile. SSE streams are
+# skipped by content type (starlette's default exclusions). A compressed body
+# gets a weak ETag, as it is no longer byte-identical to the uncompressed one;
+# If-None-Match still matches it (media.etag_matches compares weakly).
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))         # 9 costs ~2x the CPU for ~1% smaller JSON
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))  # on-the-fly range; 11 is for static files
+SKIP_PREFIXES = ("/generated/", "/thumbs/", "/assets/faces/")
+THREAD_MIN_BYTES = 128 * 1024                                 # compress bigger bodies off the event loop
+
+
+def available_encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def pick_encoding(accept_encoding: str) -> str | None:
+    """The coding to answer with ('br', 'gzip'), or None for identity."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        offered[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in available_encodings():     # server preference breaks ties
+        q = offered.get(coding, offered.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """`body` in a coding from pick_encoding(), for bodies cached already compressed."""
+    if coding == "br":
+        return brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MIN_BYTES:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(SKIP_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        coding = pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size)
+        elif coding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=GZIP_LEVEL,
+                                      thread_minimum_size=THREAD_MIN_BYTES)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        async def send_weak_etag(message):
+            if coding and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if headers.get("content-encoding") == coding:
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["etag"] = f"W/{etag}"
+            await send(message)
+
+        await responder(scope, receive, send_weak_etag)
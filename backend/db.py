@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Shared SQLite data-access layer.
+#
+# Every thread keeps ONE open connection to studio.db and hands it out again on
+# each get_db_connection() call, so routes no longer pay connect/parse/close per
+# request and sqlite3's per-connection statement cache actually gets reused.
+# The PRAGMAs below are applied once, when that connection is first opened.
+#
+# Routes keep the familiar shape:
+#
+#     conn = get_db_connection()
+#     ...
+#     conn.commit()
+#     conn.close()      # returns the connection to the thread's cache
+#
+# close() rolls back anything left uncommitted instead of really closing. On
+# the event loop thread the connection is shared by every coroutine, so never
+# hold a transaction open across an `await`.
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = os.environ.get("STUDIO_DB", str(BASE_DIR / "studio.db"))
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection whose close() releases it back to the per-thread cache."""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        super().close()
+
+
+def _connect(path: str) -> PooledConnection:
+    conn = sqlite3.connect(
+        path,
+        factory=PooledConnection,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def get_db_connection() -> PooledConnection:
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != DB_PATH:
+        if conn is not None:
+            conn.dispose()
+        conn = _connect(DB_PATH)
+        _local.conn, _local.path = conn, DB_PATH
+    elif conn.in_transaction:
+        # A previous user returned early without commit/close; don't inherit its writes.
+        conn.rollback()
+    return conn
+
+
+@contextmanager
+def transaction():
+    """`with transaction() as conn:` commits on success and rolls back on error."""
+    conn = get_db_connection()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
@@ -1,10 +1,33 @@
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 from google import genai
+from google.genai import errors as genai_errors
+
+from director_cache import director_cache, model_health, cache_key
+from metrics import stage_seconds, timed_stage
+from prompt_compiler import video_instruction
 
 # CONFIG
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+MODELS = ['gemini-2.0-flash', 'gemini-2.0-flash-exp', 'gemini-1.5-flash']   # in order of preference
+CALL_TIMEOUT = float(os.environ.get("DIRECTOR_TIMEOUT", "20"))            # seconds per Gemini call
+MAX_CONCURRENCY = int(os.environ.get("DIRECTOR_CONCURRENCY", "4"))        # Gemini calls in flight
+RATE_LIMIT = float(os.environ.get("DIRECTOR_RATE_LIMIT", "5"))            # Gemini calls started per second
+UNAVAILABLE_CODES = {403, 404}      # model retired, unknown or not enabled for this key: bench it
 client = None
 
+
+def model_unavailable(error: Exception) -> bool:
+    """
+    True when `error` says the model itself can't be used, as opposed to a
+    rate limit (429), a server error or a network blip, which the next
+    request may well not hit. Only the former benches the model.
+    """
+    return isinstance(error, genai_errors.ClientError) and error.code in UNAVAILABLE_CODES
+
+
 if GEMINI_API_KEY:
     try:
         client = genai.Client(api_key=GEMINI_API_KEY)
@@ -12,91 +35,121 @@ if GEMINI_API_KEY:
     except Exception as e:
         print(f"⚠️ Director Engine: OFFLINE ({e})")
 
-def get_director_prompt(user_prompt: str, style: str = "Cinematic", camera: str = "Push In") -> str:
+
+class Director:
     """
-    Translates commands into Wan 2.2 prompts, separating Context (World) from Action (Movement).
+    Async Gemini front end. Identical requests already in flight share one
+    upstream call, upstream calls are capped at `concurrency` at once and
+    `rate` starts per second, and each call gets `timeout` seconds before
+    the next model is tried. `client` is any object with the genai shape
+    (client.aio.models.generate_content), so a local stub can stand in.
+    Cache and model-health reads and writes hit SQLite, so they run in a
+    worker thread rather than on the event loop.
     """
-    
-    # 1. PARSE CONTEXT VS ACTION
-    # We look for the [CONTEXT: ...] tag coming from the Stitch/Scene logic
-    scene_context = ""
-    shot_action = user_prompt
-
-    if "[CONTEXT:" in user_prompt and "]" in user_prompt:
-        try:
-            # Split "CONTEXT: dark alley] Man walks..." into two parts
-            parts = user_prompt.split("]", 1)
-            # Clean up the brackets and label
-            scene_context = parts[0].replace("[CONTEXT:", "").strip()
-            shot_action = parts[1].strip()
-        except:
-            # Fallback if formatting is weird
-            pass
-
-    # 2. THE DICTIONARY (Camera Moves)
-    camera_descriptions = {
-        "Push In": "Slow dolly in. Forward tracking shot. The camera moves physically closer with a steady, cinematic pace.",
-        "Pull Out": "Slow dolly out. Backward tracking shot. The camera retreats smoothly, revealing the environment.",
-        "Static": "Tripod shot. The camera is completely locked off and stable.",
-        "Handheld": "Handheld documentary style. Subtle organic camera shake and breathing motion.",
-        "Pan Right": "Camera truck right. A lateral tracking shot moving parallel to the subject. Smooth, sliding motion.",
-        "Pan Left": "Camera truck left. A lateral tracking shot sliding to the left. The background passes by smoothly.",
-        "Orbit": "Slow arc shot. The camera gently circles around the subject. A subtle orbital movement showcasing depth.",
-        "Tilt Up": "Camera tilts up. A slow vertical scan starting low and revealing the subject upwards.",
-        "Tilt Down": "Camera tilts down. A slow vertical scan starting high and lowering the gaze.",
-        "Crane Up": "Boom up. The camera physically rises straight up, establishing a higher vantage point.",
-        "Crane Down": "Boom down. The camera physically lowers, settling into the scene.",
-        "Zoom In": "Smooth optical zoom in. The camera body stays still while the lens magnifies the subject. Background compression increases.",
-        "Dutch Angle": "Dutch angle. The camera is tilted on its roll axis, creating a diagonal composition. Uneasy tension.",
-        "Low Angle": "Low angle shot. The camera looks up at the subject from a low vantage point, making them appear powerful.",
-        "Drone Overhead": "Top-down God's Eye view. The camera looks straight down. Geometric composition.",
-        "Drone Orbit": "Large-scale drone orbit. The camera circles the subject from a high angle, capturing the vast environment.",
-        "Drone Fly Through": "FPV Drone flight. The camera flies aggressively through the space with high speed and fluidity.",
-    }
-
-    # Resolve Motion
-    motion_desc = camera_descriptions.get(camera, camera)
-
-    # 3. CONSTRUCT THE INSTRUCTION
-    # We now feed the AI two separate pieces of data.
-    context_instruction = ""
-    if scene_context:
-        context_instruction = (
-            f"SCENE CONTEXT (THE WORLD - DO NOT CHANGE): {scene_context}\n"
-            f"Constraint: You MUST maintain the lighting, weather, and atmosphere described in the CONTEXT.\n"
-        )
-
-    system_instruction = (
-        f"You are a Prompt Engineer for Wan 2.2 Video AI. \n"
-        f"{context_instruction}"
-        f"SHOT ACTION (THE SUBJECT/MOVEMENT): {shot_action}\n"
-        f"Style: {style}\n"
-        f"Required Camera Motion: {motion_desc}\n\n"
-        f"TASK: Write a single, vivid paragraph (40-60 words). \n"
-        f"CRITICAL RULES:\n"
-        f"1. CONTINUITY: If a Context is provided, keep it strictly consistent. Only animate the Action.\n"
-        f"2. MOVEMENT: You MUST include the camera description '{motion_desc}' verbatim.\n"
-        f"3. SPEED: Describe movement as 'slow', 'measured', or 'cinematic'. Avoid 'rushing'.\n"
-        f"4. NO PREAMBLE. Return ONLY the final prompt."
-    )
-
-    # 4. FALLBACK
-    fallback = f"Continuous single shot. {motion_desc} {user_prompt} in {style} style."
-
-    if not client:
-        return fallback
 
-    # 5. GENERATE
-    models_to_try = ['gemini-2.0-flash', 'gemini-2.0-flash-exp', 'gemini-1.5-flash']
-    
-    for model in models_to_try:
-        try:
-            response = client.models.generate_content(model=model, contents=system_instruction)
+    def __init__(self, client=None, timeout: float = CALL_TIMEOUT, concurrency: int = MAX_CONCURRENCY, rate: float = RATE_LIMIT):
+        self.client = client
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.rate = rate
+        self._pending = {}         # normalized request -> Task
+        self._slots = None         # asyncio.Semaphore, created on first use inside the loop
+        self._pace = None
+        self._next_start = 0.0
+        self.stats = {"requests": 0, "coalesced": 0, "upstream_calls": 0, "timeouts": 0, "fallbacks": 0}
+
+    async def enhance(self, user_prompt: str, style: str = "Cinematic", camera: str = "Push In") -> str:
+        with timed_stage("get_director_prompt", "total"):
+            return await self._enhance(user_prompt, style, camera)
+
+    async def _enhance(self, user_prompt: str, style: str, camera: str) -> str:
+        self.stats["requests"] += 1
+        system_instruction, fallback = video_instruction(user_prompt, style, camera)
+        if not self.client:
+            return fallback
+
+        # CACHE (same action + style + move while iterating)
+        models_to_try = await asyncio.to_thread(model_health.order, MODELS)
+        with timed_stage("get_director_prompt", "cache"):
+            cached = await asyncio.to_thread(director_cache.get, user_prompt, style, camera, models_to_try)
+        if cached:
+            return cached[0]
+
+        # Concurrent identical requests (double clicks, a batch with repeated shots) share one call.
+        key = cache_key(user_prompt, style, camera, "")
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(user_prompt, style, camera, system_instruction, fallback, models_to_try))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def enhance_many(self, requests: list[tuple[str, str, str]]) -> list[str]:
+        """enhance() for every (prompt, style, camera), concurrently; results in input order."""
+        return await asyncio.gather(*(self.enhance(*request) for request in requests))
+
+    async def _generate(self, user_prompt, style, camera, system_instruction, fallback, models_to_try) -> str:
+        # GENERATE (last working model first, recently failed ones skipped)
+        for model in models_to_try:
+            try:
+                async with self._slot():
+                    self.stats["upstream_calls"] += 1
+                    with timed_stage("get_director_prompt", "upstream"):
+                        response = await asyncio.wait_for(
+                            self.client.aio.models.generate_content(model=model, contents=system_instruction),
+                            self.timeout,
+                        )
+            except asyncio.TimeoutError:
+                # Slow now isn't gone: try the next model, but don't bench this one.
+                self.stats["timeouts"] += 1
+                print(f"⚠️ [Director]: {model} timed out after {self.timeout:g}s")
+                continue
+            except Exception as e:
+                print(f"⚠️ [Director]: {model} failed ({e})")
+                if model_unavailable(e):
+                    await asyncio.to_thread(model_health.record, model, False, str(e))
+                continue
             if response.text:
                 cleaned = response.text.strip().replace('"', '')
                 print(f"🧠 [Director]: {cleaned}")
+                await asyncio.to_thread(model_health.record, model, True)
+                await asyncio.to_thread(director_cache.put, user_prompt, style, camera, model, cleaned)
                 return cleaned
-        except Exception:
-            continue
+            print(f"⚠️ [Director]: {model} returned an empty response")   # blocked or filtered prompt, not a dead model
+
+        self.stats["fallbacks"] += 1
+        return fallback
+
+    @asynccontextmanager
+    async def _slot(self):
+        """One concurrency slot, taken before the rate limiter lets the call start."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._pace = asyncio.Lock()
+        waiting = time.perf_counter()
+        async with self._slots:
+            await self._wait_for_rate()
+            stage_seconds.observe(time.perf_counter() - waiting, operation="get_director_prompt", stage="wait")
+            yield
+
+    async def _wait_for_rate(self):
+        if self.rate <= 0:
+            return
+        async with self._pace:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + 1 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def metrics(self) -> dict:
+        return {**self.stats, "in_flight": len(self._pending)}
+
+
+director = Director(client)
+
 
-    return fallback
\ No newline at end of file
+async def get_director_prompt(user_prompt: str, style: str = "Cinematic", camera: str = "Push In") -> str:
+    return await director.enhance(user_prompt, style, camera)
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import get_db_connection
+
+# Cache for Director (Gemini) prompt enhancement.
+#
+# Re-enhancing the same action text with the same style and camera move is
+# the common case while iterating on a shot, so results are kept under a key
+# built from the normalized (prompt, style, camera_move, model). The hot
+# entries live in an in-memory LRU; every result is also written to the
+# director_cache table, so entries pushed out of memory (or lost to a
+# restart) are still a local read away. Entries older than the TTL are
+# ignored and pruned.
+#
+# ModelHealth remembers which model answered last (tried first next time)
+# and which ones were recently reported unavailable (skipped for
+# MODEL_RETRY_AFTER seconds), so a retired model doesn't cost a failed call on
+# every request. Director only reports hard failures (director.model_unavailable),
+# not rate limits, timeouts or network errors.
+
+CACHE_SIZE = int(os.environ.get("DIRECTOR_CACHE_SIZE", "512"))          # entries kept in memory
+CACHE_TTL = float(os.environ.get("DIRECTOR_CACHE_TTL", str(7 * 86400)))  # seconds; 0 disables the cache
+MODEL_RETRY_AFTER = float(os.environ.get("DIRECTOR_MODEL_RETRY_AFTER", "3600"))
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def cache_key(prompt: str, style: str, camera_move: str, model: str) -> str:
+    raw = "\x1f".join((normalize(prompt), normalize(style), normalize(camera_move), model))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class DirectorCache:
+    def __init__(self, capacity: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._entries = OrderedDict()    # key -> (enhanced_prompt, created_at)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "expired": 0}
+
+    def _fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl
+
+    def get(self, prompt: str, style: str, camera_move: str, models: list[str]) -> tuple[str, str] | None:
+        """(enhanced_prompt, model) cached for any of `models`, checked in order; None on a miss."""
+        if self.ttl <= 0:
+            return None
+        keys = [(cache_key(prompt, style, camera_move, model), model) for model in models]
+        with self._lock:
+            for key, model in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if self._fresh(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[0], model
+                del self._entries[key]
+                self.stats["expired"] += 1
+
+        conn = get_db_connection()
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(
+            f"SELECT key, model, enhanced_prompt, created_at FROM director_cache WHERE key IN ({placeholders}) AND created_at > ?",
+            [key for key, _ in keys] + [time.time() - self.ttl],
+        ).fetchall()
+        conn.close()
+        found = {row["key"]: row for row in rows}
+        with self._lock:
+            for key, model in keys:
+                row = found.get(key)
+                if row is not None:
+                    self._remember(key, row["enhanced_prompt"], row["created_at"])
+                    self.stats["disk_hits"] += 1
+                    return row["enhanced_prompt"], model
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, prompt: str, style: str, camera_move: str, model: str, enhanced_prompt: str):
+        if self.ttl <= 0:
+            return
+        key = cache_key(prompt, style, camera_move, model)
+        now = time.time()
+        with self._lock:
+            self._remember(key, enhanced_prompt, now)
+            self.stats["stores"] += 1
+        conn = get_db_connection()
+        conn.execute(
+            "INSERT INTO director_cache (key, model, enhanced_prompt, created_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET enhanced_prompt = excluded.enhanced_prompt, created_at = excluded.created_at",
+            (key, model, enhanced_prompt, now),
+        )
+        conn.commit()
+        conn.close()
+
+    def _remember(self, key: str, enhanced_prompt: str, created_at: float):
+        self._entries[key] = (enhanced_prompt, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def prune(self) -> int:
+        """Drop expired rows from the persistent tier. Returns how many were removed."""
+        conn = get_db_connection()
+        removed = conn.execute("DELETE FROM director_cache WHERE created_at <= ?", (time.time() - self.ttl,)).rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else None
+        stats["capacity"], stats["ttl"] = self.capacity, self.ttl
+        return stats
+
+
+class ModelHealth:
+    def __init__(self, retry_after: float = MODEL_RETRY_AFTER):
+        self.retry_after = retry_after
+        self._state = None               # model -> {"last_ok", "failed_at", "error"}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._state is None:
+            conn = get_db_connection()
+            rows = conn.execute("SELECT model, last_ok, failed_at, error FROM director_models").fetchall()
+            conn.close()
+            self._state = {row["model"]: dict(row) for row in rows}
+        return self._state
+
+    def order(self, models: list[str]) -> list[str]:
+        """
+        Models to try: the last one that worked first, then the rest in their
+        usual order, minus any that failed within retry_after. If every model
+        is benched, the most recently healthy one is tried anyway.
+        """
+        with self._lock:
+            state = self._load()
+            now = time.time()
+
+            def benched(model):
+                entry = state.get(model) or {}
+                failed_at = entry.get("failed_at")
+                return failed_at is not None and (entry.get("last_ok") or 0) < failed_at and now - failed_at < self.retry_after
+
+            healthy = [m for m in models if (state.get(m) or {}).get("last_ok")]
+            last_good = max(healthy, key=lambda m: state[m]["last_ok"], default=None)
+            ranked = ([last_good] if last_good else []) + [m for m in models if m != last_good]
+            usable = [m for m in ranked if not benched(m)]
+            return usable or ranked[:1]
+
+    def record(self, model: str, ok: bool, error: str | None = None):
+        now = time.time()
+        with self._lock:
+            entry = self._load().setdefault(model, {"model": model, "last_ok": None, "failed_at": None, "error": None})
+            if ok:
+                entry["last_ok"] = now
+            else:
+                entry["failed_at"], entry["error"] = now, (error or "")[:300]
+        conn = get_db_connection()
+        conn.execute(
+            "INSERT INTO director_models (model, last_ok, failed_at, error) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(model) DO UPDATE SET last_ok = excluded.last_ok, failed_at = excluded.failed_at, error = excluded.error",
+            (model, entry["last_ok"], entry["failed_at"], entry["error"]),
+        )
+        conn.commit()
+        conn.close()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {model: {k: v for k, v in entry.items() if k != "model"} for model, entry in self._load().items()}
+
+
+director_cache = DirectorCache()
+model_health = ModelHealth()
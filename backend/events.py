@@ -0,0 +1,120 @@
+import asyncio
+
+from db import get_db_connection
+from jobs import job_queue
+
+# Per-project live event feed (GET /events?project_id=N).
+#
+# The hub holds the one upstream subscription: a listener on the job queue,
+# which in turn hears ComfyUI's step/queue progress through the generators'
+# on_event callbacks. Every open browser tab is just a local asyncio.Queue
+# fed from that listener, so ten tabs on a project cost ten queue puts, not
+# ten ComfyUI websockets or ten pollers.
+#
+# Events (the SSE `event:` name, then the JSON payload):
+#   job    the job as /jobs/{id} returns it (minus payload), with shot_ids and
+#          live = {"stage", "step", "steps", "queue_position"} while rendering
+#   queue  {"positions": {job_id: n}}, jobs of this project still waiting
+#          here, n = jobs ahead of it; sent whenever the queue moves
+#
+# A subscriber that can't keep up loses its oldest events, never blocks the
+# hub; each event is a full snapshot so the next one catches it up.
+
+SUBSCRIBER_BUFFER = 256
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def job_event(job: dict) -> dict:
+    payload = job.get("payload") or {}
+    event = {key: value for key, value in job.items() if key != "payload"}
+    event["shot_ids"] = [job["shot_id"]] if job.get("shot_id") else payload.get("shot_ids", [])
+    return event
+
+
+class EventHub:
+    def __init__(self, queue=job_queue, buffer: int = SUBSCRIBER_BUFFER):
+        self.queue = queue
+        self.buffer = buffer
+        self._subscribers = {}      # project id -> set of asyncio.Queue
+        self._queued = set()        # job ids last seen queued (their positions move together)
+        self.stats = {"published": 0, "dropped": 0}
+        queue.listen(self._on_job)
+
+    # --- 1. SUBSCRIBE ---
+
+    async def subscribe(self, project_id: int, keepalive: float = 15.0):
+        """
+        Yields (event, data) for the project: first a snapshot of its active
+        jobs and their queue positions, then every change. Yields None after
+        `keepalive` idle seconds so the caller can ping through proxies.
+        """
+        updates = asyncio.Queue(self.buffer)
+        self._subscribers.setdefault(project_id, set()).add(updates)
+        try:
+            for job in self._active_jobs(project_id):
+                yield "job", job_event(job)
+            yield "queue", {"positions": self._positions().get(project_id, {})}
+            while True:
+                try:
+                    yield await asyncio.wait_for(updates.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            listeners = self._subscribers.get(project_id)
+            if listeners is not None:
+                listeners.discard(updates)
+                if not listeners:
+                    del self._subscribers[project_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(listeners) for listeners in self._subscribers.values())
+
+    # --- 2. FAN OUT ---
+
+    def _on_job(self, job: dict):
+        """Job queue listener (runs on the event loop)."""
+        if not self._subscribers:
+            return
+        self._send(job.get("project_id"), "job", job_event(job))
+
+        # A job joining or leaving the queue shifts everyone behind it.
+        if job["id"] in self._queued or job["status"] == "queued":
+            for project_id, positions in self._positions().items():
+                self._send(project_id, "queue", {"positions": positions})
+
+    def _send(self, project_id, event: str, data: dict):
+        for updates in self._subscribers.get(project_id, ()):
+            if updates.full():
+                updates.get_nowait()
+                self.stats["dropped"] += 1
+            updates.put_nowait((event, data))
+            self.stats["published"] += 1
+
+    # --- 3. SNAPSHOTS ---
+
+    def _active_jobs(self, project_id: int) -> list[dict]:
+        conn = get_db_connection()
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        ids = [row["id"] for row in conn.execute(
+            f"SELECT id FROM jobs WHERE project_id = ? AND status IN ({placeholders}) ORDER BY id", (project_id, *ACTIVE_STATUSES)
+        )]
+        conn.close()
+        return [job for job in (self.queue.get(job_id) for job_id in ids) if job is not None]
+
+    def _positions(self) -> dict:
+        """{project_id: {job_id: jobs ahead}} for projects with subscribers."""
+        conn = get_db_connection()
+        rows = conn.execute("SELECT id, project_id FROM jobs WHERE status = 'queued' ORDER BY id").fetchall()
+        conn.close()
+        self._queued = {row["id"] for row in rows}
+        positions = {project_id: {} for project_id in self._subscribers}
+        for ahead, row in enumerate(rows):
+            if row["project_id"] in positions:
+                positions[row["project_id"]][row["id"]] = ahead
+        return positions
+
+    def metrics(self) -> dict:
+        return {**self.stats, "subscribers": self.subscriber_count(), "projects": len(self._subscribers)}
+
+
+event_hub = EventHub()
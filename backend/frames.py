@@ -0,0 +1,127 @@
+import asyncio
+import uuid
+from pathlib import Path
+
+import cv2
+
+from blobstore import blob_store
+
+# Exact frame extraction from rendered clips (stitching continues a shot from
+# its last frame).
+#
+# CAP_PROP_FRAME_COUNT is only an estimate from the container, so reading at
+# total - 1 can silently return the wrong frame (or nothing). We still try
+# that first, but only accept it when no frame follows it. Otherwise we seek
+# one window (about a GOP) before the estimate and decode forward until the
+# stream really ends, doubling the window when the estimate overshot.
+#
+# Clips are content-addressed, so a frame is cached forever under
+# generated/frames/<h[0:2]>/<sha256>_<index>.png (negative indices count from
+# the end, -1 being the last frame).
+
+FRAME_DIR = blob_store.root / "frames"
+SEEK_WINDOW = 48          # frames decoded back from the estimated end; roughly one GOP
+
+_pending = {}
+
+
+class FrameError(Exception):
+    pass
+
+
+def _decode_forward(cap, start: int, stop: int | None):
+    """
+    Seek to `start` and decode forward. Returns (index, frame) for `stop`, or
+    for the last frame in the stream if stop is None; None if never reached.
+    """
+    if start != int(cap.get(cv2.CAP_PROP_POS_FRAMES)):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    last = None
+    while stop is None or position <= stop:
+        if not cap.grab():
+            return last
+        if stop is None or position == stop:
+            ok, frame = cap.retrieve()
+            if ok:
+                last = (position, frame)
+            if stop is not None:
+                return last
+        position += 1
+    return None
+
+
+def _last_frame(cap):
+    estimate = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Fast path: the container's count is right when frame N-1 decodes and nothing follows it.
+    if estimate > 0:
+        found = _decode_forward(cap, estimate - 1, estimate - 1)
+        if found is not None and not cap.grab():
+            return found
+
+    window = SEEK_WINDOW
+    while True:
+        start = max(0, estimate - window)
+        found = _decode_forward(cap, start, None)
+        if found is not None or start == 0:
+            return found
+        window *= 2  # the container over-reported its length
+
+
+def extract(video_path, index: int = -1):
+    """(frame_index, BGR image) for frame `index` of the clip. Negative indices count from the end."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise FrameError(f"Could not open {video_path}")
+    try:
+        if index >= 0:
+            found = _decode_forward(cap, index, index)
+            if found is None:
+                raise FrameError(f"Frame {index} is past the end of the clip")
+            return found
+
+        found = _last_frame(cap)
+        if found is None:
+            raise FrameError("Clip has no decodable frames")
+        if index == -1:
+            return found
+        target = found[0] + index + 1
+        if target < 0:
+            raise FrameError(f"Clip has only {found[0] + 1} frames")
+        return _decode_forward(cap, target, target)
+    finally:
+        cap.release()
+
+
+def cache_path(sha256: str, index: int) -> Path:
+    return FRAME_DIR / sha256[:2] / f"{sha256}_{index}.png"
+
+
+def _extract_to_cache(video_path: Path, target: Path, index: int) -> Path:
+    _, frame = extract(video_path, index)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.stem}.{uuid.uuid4().hex[:8]}.part.png")
+    if not cv2.imwrite(str(tmp), frame):
+        raise FrameError("Could not write extracted frame")
+    tmp.replace(target)
+    return target
+
+
+async def get_frame(sha256: str, index: int = -1) -> Path:
+    """Cached PNG of frame `index` of blob `sha256`, decoded in a worker thread on a miss."""
+    target = cache_path(sha256, index)
+    if target.exists():
+        return target
+
+    key = (sha256, index)
+    task = _pending.get(key)
+    if task is None:
+        video_path = await asyncio.to_thread(blob_store.local_path, sha256)
+        if video_path is None or not video_path.exists():
+            raise FrameError("Video file not found")
+        task = _pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(_extract_to_cache, video_path, target, index))
+            _pending[key] = task
+            task.add_done_callback(lambda _: _pending.pop(key, None))
+    return await asyncio.shield(task)
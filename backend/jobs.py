@@ -0,0 +1,354 @@
+import asyncio
+import json
+import os
+import traceback
+
+from backends import backend_registry
+from db import get_db_connection
+from metrics import Gauge, current_request_id, registry, request_id_var
+
+# Persistent render job queue.
+#
+# Submit endpoints insert a row into the `jobs` table and return its id right
+# away; a dispatcher running on the app's event loop drains the queue and runs
+# each job through the handler registered for its `kind`.
+#
+# Jobs are sent to the least-loaded healthy server in the backend registry
+# (or to the server pinned by the submitter), each capped at that server's
+# max_concurrency. If a server dies mid-render its jobs go back to the queue,
+# up to JOB_MAX_ATTEMPTS runs in all; a job pinned to an ad-hoc server (the
+# x-comfy-url header) fails once that server is marked down, as no other node
+# may run it.
+# Kinds registered with local=True (e.g. scene assembly) run on this machine
+# instead, LOCAL_CONCURRENCY at a time, without taking a ComfyUI slot.
+#
+# Job lifecycle: queued -> running -> complete | failed
+
+TERMINAL_STATUSES = ("complete", "failed")
+LOCAL_CONCURRENCY = 1
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))   # runs before a job whose backends keep dying fails
+DISPATCH_RETRY_DELAY = 2.0     # seconds the dispatcher backs off after an error (e.g. database is locked)
+
+
+def _row_to_job(row) -> dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"]) if job["payload"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    def __init__(self, registry=backend_registry):
+        self.registry = registry
+        self._handlers = {}
+        self._local_kinds = set()
+        self._local_running = 0
+        self._progress = {}         # job id -> last progress written
+        self._live = {}             # job id -> latest ComfyUI detail (stage, step, queue position)
+        self._running = {}          # job id -> (task, Backend or None for local jobs)
+        self._requeue = set()       # job ids cancelled because their backend went away
+        self._subscribers = {}      # job id -> set of asyncio.Queue
+        self._listeners = []        # fn(job) called on every change to any job
+        self._loop = None
+        self._wake = None
+        self._dispatcher = None
+
+    # --- 1. REGISTRATION ---
+
+    def handler(self, kind: str, local: bool = False):
+        """
+        Decorator: `async def fn(job) -> dict` runs jobs of this kind; the dict
+        becomes job['result']. local=True jobs don't need a ComfyUI backend.
+        """
+        def register(fn):
+            self._handlers[kind] = fn
+            if local:
+                self._local_kinds.add(kind)
+            return fn
+        return register
+
+    # --- 2. SUBMIT / READ ---
+
+    def submit(self, kind: str, payload: dict, backend: str | None = None,
+               project_id: int | None = None, shot_id: int | None = None) -> int:
+        """Queue a job. `backend` pins it to one ComfyUI URL; otherwise the scheduler picks."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO jobs (kind, status, pinned_backend, project_id, shot_id, payload, request_id) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+            (kind, backend, project_id, shot_id, json.dumps(payload), current_request_id()),
+        )
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        self._notify(job_id)
+        return job_id
+
+    def progress(self, job_id: int, fraction: float | None = None, live: dict | None = None):
+        """
+        Thread-safe: record how far a running job is (0..1) and/or the latest
+        ComfyUI detail for it (`live`, shown as job['live']), and tell subscribers.
+        """
+        changed = live is not None
+        if live is not None:
+            self._live[job_id] = live
+        if fraction is not None:
+            fraction = round(min(max(fraction, 0.0), 1.0), 2)
+            if self._progress.get(job_id) != fraction:
+                self._progress[job_id] = fraction
+                conn = get_db_connection()
+                conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (fraction, job_id))
+                conn.commit()
+                conn.close()
+                changed = True
+        if changed and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._publish, job_id)
+
+    def get(self, job_id: int) -> dict | None:
+        conn = get_db_connection()
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        job = _row_to_job(row)
+        job["live"] = self._live.get(job_id) if job["status"] == "running" else None
+        return job
+
+    def listen(self, fn):
+        """Call fn(job) (on the event loop) whenever any job changes."""
+        self._listeners.append(fn)
+
+    async def subscribe(self, job_id: int):
+        """Yields the job dict every time it changes, ending once it reaches a terminal status."""
+        updates = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(updates)
+        try:
+            job = self.get(job_id)
+            while job is not None:
+                yield job
+                if job["status"] in TERMINAL_STATUSES:
+                    break
+                job = await updates.get()
+        finally:
+            listeners = self._subscribers.get(job_id)
+            if listeners is not None:
+                listeners.discard(updates)
+                if not listeners:
+                    del self._subscribers[job_id]
+
+    # --- 3. WORKERS ---
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+
+        # Anything left 'running' was cut off by a restart -> run it again.
+        self._set_queued("status = 'running'")
+
+        self.registry.on_down(self.requeue_backend)
+        self.registry.on_up(lambda backend: self._wake.set())
+        await self.registry.probe_all()
+        await self.registry.start()
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        self._dispatcher.add_done_callback(self._dispatcher_done)
+
+    async def stop(self):
+        await self.registry.stop()
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        tasks = [task for task, _ in self._running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(self._dispatcher, *tasks, return_exceptions=True)
+        self._dispatcher = None
+
+    def requeue_backend(self, backend):
+        """A node died (or was removed): cancel its renders and put them back in the queue."""
+        for job_id, (task, running_on) in list(self._running.items()):
+            # (a job that noticed the failure itself requeues from its own except block)
+            if running_on is backend and task is not asyncio.current_task():
+                self._requeue.add(job_id)
+                task.cancel()
+        if self._wake is not None:
+            self._wake.set()         # queued jobs pinned to it, if it was ad-hoc, get failed by _claim_next
+
+    def _retry(self, job: dict, error: str):
+        """Back to the queue after its backend failed, unless the job has used up its attempts."""
+        if job["attempts"] >= MAX_ATTEMPTS:
+            print(f"❌ Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+            self._finish(job["id"], "failed", error=f"Backend failed on all {job['attempts']} attempts: {error}")
+            return
+        self._set_queued("id = ?", (job["id"],))
+        self._publish(job["id"])
+
+    def _set_queued(self, where: str, params: tuple = ()) -> int:
+        # Unpinned jobs forget their old server so the scheduler can pick a live one.
+        conn = get_db_connection()
+        count = conn.execute(
+            f"UPDATE jobs SET status = 'queued', backend = pinned_backend, started_at = NULL WHERE {where}", params
+        ).rowcount
+        conn.commit()
+        conn.close()
+        if count:
+            print(f"♻️ Re-queued {count} interrupted render job(s)")
+        return count
+
+    async def _dispatch_loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                claimed = self._claim_next()
+            except Exception as e:
+                # One bad iteration (a locked database, a bad row) mustn't stop every queued job.
+                print(f"⚠️ Job dispatcher error, retrying in {DISPATCH_RETRY_DELAY:g}s: {e!r}")
+                traceback.print_exc()
+                await asyncio.sleep(DISPATCH_RETRY_DELAY)
+                continue
+            if claimed is None:
+                await self._wake.wait()
+                continue
+            job, backend = claimed
+            if backend is None:
+                self._local_running += 1
+            else:
+                self.registry.acquire(backend)
+            task = asyncio.create_task(self._run(job, backend))
+            self._running[job["id"]] = (task, backend)
+
+    def _dispatcher_done(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        print(f"🔴 Job dispatcher stopped unexpectedly ({error!r}); queued jobs won't run until restart")
+        if error is not None:
+            traceback.print_exception(error)
+
+    def _claim_next(self):
+        conn = get_db_connection()
+        try:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id ASC LIMIT 100").fetchall()
+            for row in rows:
+                if row["kind"] in self._local_kinds:
+                    if self._local_running >= LOCAL_CONCURRENCY:
+                        continue
+                    backend = None
+                elif row["pinned_backend"]:
+                    backend = self.registry.get(row["pinned_backend"])
+                    if not backend.persistent and not backend.healthy:
+                        # Nothing else may run it, and a mistyped URL never comes up: don't leave it queued.
+                        self._finish(row["id"], "failed", error=f"ComfyUI server {backend.url} is unreachable ({backend.last_error})")
+                        self._discard_adhoc(backend)
+                        continue
+                    if not backend.has_capacity():
+                        continue
+                else:
+                    backend = self.registry.pick()
+                    if backend is None:
+                        continue
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = 'running', backend = ?, started_at = CURRENT_TIMESTAMP, attempts = attempts + 1 "
+                    "WHERE id = ? AND status = 'queued'",
+                    (backend.url if backend else None, row["id"]),
+                ).rowcount
+                conn.commit()
+                if claimed:
+                    job = _row_to_job(row)
+                    job["status"], job["backend"] = "running", backend.url if backend else None
+                    job["attempts"] += 1
+                    self._publish(job["id"])
+                    return job, backend
+            return None
+        finally:
+            conn.close()
+
+    async def _run(self, job: dict, backend):
+        job_id = job["id"]
+        request_id_var.set(job.get("request_id"))     # this task only: the submitting request, for ComfyClient
+        try:
+            result = await self._handlers[job["kind"]](job)
+            self._finish(job_id, "complete", result=result)
+        except asyncio.CancelledError:
+            if job_id not in self._requeue:
+                raise
+            self._retry(job, f"ComfyUI backend {backend.name} went down")
+        except Exception as e:
+            # A render that failed because the node itself is gone gets another chance elsewhere.
+            if backend is not None and not await self.registry.probe(backend):
+                self._retry(job, str(e))
+            else:
+                print(f"❌ Job {job_id} ({job['kind']}) failed: {e}")
+                self._finish(job_id, "failed", error=str(e))
+        finally:
+            self._requeue.discard(job_id)
+            self._running.pop(job_id, None)
+            self._progress.pop(job_id, None)
+            self._live.pop(job_id, None)
+            if backend is None:
+                self._local_running -= 1
+            else:
+                self.registry.release(backend)
+                self._discard_adhoc(backend)
+            self._wake.set()
+
+    def _discard_adhoc(self, backend):
+        """Forget a header-pinned server once no queued or running job points at it, so it stops being probed."""
+        if backend.persistent:
+            return
+        conn = get_db_connection()
+        pinned = conn.execute(
+            "SELECT 1 FROM jobs WHERE rtrim(pinned_backend, '/') = ? AND status IN ('queued', 'running') LIMIT 1", (backend.url,)
+        ).fetchone()
+        conn.close()
+        if pinned is None:
+            self.registry.discard(backend)
+
+    def _finish(self, job_id: int, status: str, result: dict | None = None, error: str | None = None):
+        conn = get_db_connection()
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP, "
+            "progress = CASE WHEN ? = 'complete' THEN 1.0 ELSE progress END WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, status, job_id),
+        )
+        conn.commit()
+        conn.close()
+        self._publish(job_id)
+
+    # --- 4. NOTIFICATIONS ---
+
+    def wake(self):
+        """Ask the dispatcher to look at the queue again (e.g. a backend was added)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _notify(self, job_id: int):
+        """Thread-safe: sync routes submit from Starlette's threadpool."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._wake.set)
+        self._loop.call_soon_threadsafe(self._publish, job_id)
+
+    def _publish(self, job_id: int):
+        listeners = self._subscribers.get(job_id)
+        if not listeners and not self._listeners:
+            return
+        job = self.get(job_id)
+        if job is None:
+            return
+        for updates in listeners or ():
+            updates.put_nowait(job)
+        for fn in self._listeners:
+            fn(job)
+
+
+def _job_counts() -> dict:
+    conn = get_db_connection()
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs WHERE status IN ('queued', 'running') GROUP BY status").fetchall()
+    conn.close()
+    return {("queued",): 0, ("running",): 0, **{(row["status"],): row["n"] for row in rows}}
+
+
+job_queue = JobQueue()
+registry.register(Gauge("studio_jobs", "Render jobs waiting or running.", ("status",), collect=_job_counts))
@@ -0,0 +1,97 @@
+from functools import lru_cache
+
+from db import get_db_connection
+
+# Keyset pagination and field projection for the list endpoints.
+#
+#     GET /projects/7/assets?limit=100&fields=id,name,thumbnail_url
+#     -> {"assets": [...], "next_cursor": 18233, "total": 20000}
+#     GET /projects/7/assets?limit=100&cursor=18233&fields=...
+#
+# Pages are newest first by id DESC; `cursor` is the last id of the previous
+# page, so page N costs the same as page 1 (no OFFSET scan) and rows inserted
+# meanwhile don't shift anything. Without `limit` the whole list comes back,
+# as before. `fields` picks columns (id is always included) so grids can skip
+# heavy text like prompts. `total` is read from the trigger-maintained
+# row_counts table (migrations/0011_row_counts.py), not counted per request.
+
+MAX_LIMIT = 500
+
+
+class ListError(ValueError):
+    """Bad limit/fields; the route answers 400."""
+
+
+@lru_cache(maxsize=None)
+def table_columns(table: str) -> tuple[str, ...]:
+    conn = get_db_connection()
+    columns = tuple(row["name"] for row in conn.execute(f"PRAGMA table_info({table})"))
+    conn.close()
+    return columns
+
+
+def row_count(name: str, owner_id: int = 0) -> int:
+    conn = get_db_connection()
+    row = conn.execute("SELECT n FROM row_counts WHERE name = ? AND owner_id = ?", (name, owner_id)).fetchone()
+    conn.close()
+    return row["n"] if row else 0
+
+
+def fetch_page(table: str, where: str | None = None, params: tuple = (), *, count: tuple[str, int],
+               limit: int | None = None, cursor: int | None = None, fields: str | None = None,
+               derived: dict | None = None) -> dict:
+    """
+    {"rows", "next_cursor", "total"} for one page of `table` (filtered by the
+    trusted SQL `where`). `derived` adds computed fields: {name: (source
+    column, fn(value))}, e.g. thumbnail_url from sha256. `count` is the
+    (row_counts name, owner id) holding the total.
+    """
+    derived = derived or {}
+    columns = table_columns(table)
+    if limit is not None and not 1 <= limit <= MAX_LIMIT:
+        raise ListError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    if fields:
+        wanted = list(dict.fromkeys(["id"] + [f.strip() for f in fields.split(",") if f.strip()]))
+        unknown = [f for f in wanted if f not in columns and f not in derived]
+        if unknown:
+            raise ListError(f"Unknown field(s) for {table}: {', '.join(unknown)}")
+    else:
+        wanted = list(columns) + list(derived)
+    extras = [name for name in derived if name in wanted]
+    select = list(dict.fromkeys([f for f in wanted if f in columns] + [derived[name][0] for name in extras]))
+
+    clauses, args = ([where] if where else []), list(params)
+    if cursor is not None:
+        clauses.append("id < ?")
+        args.append(cursor)
+    sql = f"SELECT {', '.join(select)} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        args.append(limit + 1)      # one extra row says whether there's a next page
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.row_factory = None          # plain tuples; zipped into dicts below
+    rows = cur.execute(sql, args).fetchall()
+    conn.close()
+
+    more = limit is not None and len(rows) > limit
+    rows = rows[:limit] if more else rows
+    results = []
+    for row in rows:
+        item = dict(zip(select, row))
+        for name in extras:
+            source, fn = derived[name]
+            item[name] = fn(item[source])
+        if fields:
+            item = {f: item[f] for f in wanted}
+        results.append(item)
+    return {
+        "rows": results,
+        "next_cursor": results[-1]["id"] if more else None,
+        "total": row_count(*count),
+    }
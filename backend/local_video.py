@@ -1,88 +1,99 @@
-import json
 import random
 import time
 import uuid
-import urllib.request
-import urllib.parse
 import os
+from pathlib import Path
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-}
-OUTPUT_DIR = "generated"
+from comfy_client import ComfyClient, ComfyError
+from metrics import stage_seconds, timed_stage
+from workflows import workflows, WorkflowError
+from render_cache import render_cache, graph_key, derive_seed
+from upload_cache import upload_cache
 
-def queue_prompt(prompt_workflow, base_url):
-    p = {"prompt": prompt_workflow, "client_id": str(uuid.uuid4())}
-    data = json.dumps(p).encode('utf-8')
-    req = urllib.request.Request(f"{base_url}/prompt", data=data, headers=HEADERS)
-    return json.loads(urllib.request.urlopen(req).read())
+OUTPUT_DIR = str(Path(__file__).resolve().parent / "generated")
+WORKFLOW_NAME = "wan_api.json"
+SEED_LIMIT = 10**14
 
-def get_history(prompt_id, base_url):
-    req = urllib.request.Request(f"{base_url}/history/{prompt_id}", headers=HEADERS)
-    try:
-        return json.loads(urllib.request.urlopen(req).read())
-    except:
-        return {}
+def prepare_video(prompt, local_image_path=None, seed=None, cache=False):
+    """(workflow, seed, cache_key); see runpod_client.prepare_image."""
+    workflow = workflows.get(WORKFLOW_NAME)
+    # Update Nodes (resolved by class_type / title)
+    workflow.set_prompt(prompt)
+    workflow.set_filename_prefix("studio_wan")
+    if local_image_path:
+        # Keyframes are content-addressed (<sha256>.png), so the name pins the input image in the key
+        workflow.set_image(os.path.basename(local_image_path))
+    if seed is None:
+        seed = derive_seed(workflow.graph, SEED_LIMIT) if cache else random.randint(1, SEED_LIMIT)
+    workflow.set_seed(seed)
+    return workflow, seed, graph_key(workflow.graph) if cache else None
 
-def get_file(filename, subfolder, folder_type, base_url):
-    params = urllib.parse.urlencode({"filename": filename, "subfolder": subfolder, "type": folder_type})
-    with urllib.request.urlopen(f"{base_url}/view?{params}") as r:
-        return r.read()
+def cached_video(prompt, local_image_path=None, seed=None):
+    """Earlier output of this exact render (same shape as a generate_wan_video result), or None."""
+    try:
+        _, seed, cache_key = prepare_video(prompt, local_image_path, seed, cache=True)
+    except (FileNotFoundError, WorkflowError):
+        return None
+    hit = render_cache.lookup(cache_key)
+    if not hit:
+        return None
+    print(f"♻️ Render cache hit for: {prompt[:50]}...")
+    return {"video_url": hit["url"], "path": hit["path"], "sha256": hit["sha256"],
+            "seed": seed, "cache_key": cache_key, "cached": True}
 
-def generate_wan_video(prompt, server_url="http://127.0.0.1:8188"):
+async def generate_wan_video(prompt, server_url="http://127.0.0.1:8188", local_image_path=None, seed=None, cache=False,
+                            on_event=None):
+    """
+    Returns {"video_url": "/generated/wan_xxx.mp4", "path", "sha256", "seed", "cache_key"}, or None
+    if the render failed. With cache=True an identical earlier render is returned ("cached": True).
+    on_event receives ComfyUI queue/step progress (see ComfyClient).
+    """
+    started = time.perf_counter()
+    if cache:
+        hit = cached_video(prompt, local_image_path, seed)
+        if hit:
+            return hit
     try:
-        with open("wan_api.json", "r") as f:
-            workflow = json.load(f)
+        with timed_stage("generate_wan_video", "build"):
+            workflow, seed, cache_key = prepare_video(prompt, local_image_path, seed, cache)
     except FileNotFoundError:
-        print("Error: wan_api.json not found")
+        print(f"Error: {WORKFLOW_NAME} not found")
+        return None
+    except WorkflowError as e:
+        print(f"Error: {e}")
         return None
 
-    # Update Nodes (Check IDs)
-    prompt_node = "6" 
-    seed_node = "3"
-
-    if prompt_node in workflow:
-        workflow[prompt_node]["inputs"]["text"] = prompt
-    if seed_node in workflow:
-        workflow[seed_node]["inputs"]["seed"] = random.randint(1, 10**14)
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
 
     try:
-        resp = queue_prompt(workflow, server_url)
-        prompt_id = resp['prompt_id']
+        async with ComfyClient(server_url, on_event=on_event, operation="generate_wan_video") as comfy:
+            # The keyframe lives on this machine; ComfyUI can only read its own input folder.
+            # It is sent once per server (upload_cache.py), not once per render.
+            if local_image_path:
+                workflow.set_image(await upload_cache.comfy_image(comfy, local_image_path))
+
+            # VHS_VideoCombine reports its mp4 under "gifs"
+            try:
+                output = await comfy.run(workflow.graph, output_key="gifs")
+            except ComfyError as e:
+                if not (local_image_path and "rejected prompt" in str(e)):
+                    raise
+                # Most likely the server lost the cached upload: send it again and retry once.
+                workflow.set_image(await upload_cache.comfy_image(comfy, local_image_path, refresh=True))
+                output = await comfy.run(workflow.graph, output_key="gifs")
+            video_data = output["gifs"][0]
+
+            # Save locally
+            save_name = f"wan_{uuid.uuid4().hex[:6]}.mp4"
+            save_path = os.path.join(OUTPUT_DIR, save_name)
+            sha256 = await comfy.download(video_data, save_path, checksum=True)
+    except ComfyError as e:
+        print(f"Render failed: {e}")
+        return None
     except Exception as e:
         print(f"Queue failed: {e}")
         return None
 
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-
-    while True:
-        history = get_history(prompt_id, server_url)
-        if prompt_id in history:
-            outputs = history[prompt_id].get("outputs", {})
-            # Scan for GIF/Video
-            video_data = None
-            for nid, data in outputs.items():
-                if "gifs" in data and data["gifs"]:
-                    video_data = data["gifs"][0]
-                    break
-                # Fallback if your workflow uses 'images' for video save
-                if "images" in data and data["images"]:
-                    # Check extensions if necessary, or assume last image node is video
-                    pass
-
-            if video_data:
-                fname = video_data["filename"]
-                data = get_file(fname, video_data["subfolder"], video_data["type"], server_url)
-                
-                # Save locally
-                save_name = f"wan_{uuid.uuid4().hex[:6]}.mp4"
-                save_path = os.path.join(OUTPUT_DIR, save_name)
-                with open(save_path, "wb") as f:
-                    f.write(data)
-                
-                return save_path
-            break
-        time.sleep(2)
-    
-    return None
\ No newline at end of file
+    stage_seconds.observe(time.perf_counter() - started, operation="generate_wan_video", stage="total")
+    return {"video_url": f"/generated/{save_name}", "path": save_path, "sha256": sha256, "seed": seed, "cache_key": cache_key}
@@ -1,22 +1,43 @@
 import os
+import asyncio
 import shutil
 from dotenv import load_dotenv
 load_dotenv()
-import sqlite3
-import cv2
 import uuid
+import json
+import orjson
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Header
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 # --- IMPORTS ---
-from runpod_client import generate_cinematic_image 
-from local_video import generate_wan_video 
-from director import get_director_prompt 
+from runpod_client import generate_cinematic_image, generate_cinematic_batch, cached_image
+from local_video import generate_wan_video, cached_video
+from director import get_director_prompt, director
+from director_cache import director_cache, model_health
+from prompt_compiler import continuation_prompt
+from listing import fetch_page, ListError
+from render_cache import render_cache
+from upload_cache import upload_cache
+from jobs import job_queue
+from events import event_hub
+from db import get_db_connection
+from migrate import check_schema, SchemaOutOfDate
+from backends import backend_registry
+from blobstore import blob_store, is_sha256
+from media import media_response, etag_matches
+from tree_cache import tree_cache
+import compression
+import metrics
+import schemas
+import thumbnails
+import frames
+import assembly
+from thumbnails import thumbnail_url
 
 # --- CONFIG (Absolute Paths Fix) ---
 # This ensures we always find the folders, regardless of where python is run from
@@ -24,7 +45,18 @@ BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = BASE_DIR / "generated"
 FACES_DIR = BASE_DIR / "assets" / "faces"
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_schema()
+    blob_store.collect()
+    director_cache.prune()
+    render_cache.evict()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    thumbnails.shutdown()
+
+app = FastAPI(lifespan=lifespan, default_response_class=schemas.JSONBytesResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,47 +66,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# br/gzip by Accept-Encoding for the big JSON bodies (storyboards, asset lists); see compression.py
+app.add_middleware(compression.CompressionMiddleware)
+# X-Request-ID on every request; jobs keep it and ComfyUI sees it in the client_id (see metrics.py)
+app.add_middleware(metrics.RequestIdMiddleware)
+
 # Ensure directories exist
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 FACES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Mount Static Files with Absolute Path
-app.mount("/generated", StaticFiles(directory=str(OUTPUT_DIR)), name="generated")
-
-def get_db_connection():
-    conn = sqlite3.connect('studio.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# --- DB INIT ---
-def init_db():
-    conn = get_db_connection()
-    # 1. Projects
-    conn.execute('''CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, description TEXT, aspect_ratio TEXT DEFAULT '16:9', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # 2. Assets
-    conn.execute('''CREATE TABLE IF NOT EXISTS assets (id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, type TEXT, name TEXT, prompt TEXT, image_path TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE)''')
-    
-    # 3. Scenes
-    conn.execute('''CREATE TABLE IF NOT EXISTS scenes (id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, name TEXT, description TEXT, order_index INTEGER, FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE)''')
-    
-    # 4. Shots
-    conn.execute('''CREATE TABLE IF NOT EXISTS shots (id INTEGER PRIMARY KEY AUTOINCREMENT, scene_id INTEGER, prompt TEXT, reference_asset_id INTEGER, status TEXT, keyframe_url TEXT, video_url TEXT, order_index INTEGER, FOREIGN KEY(scene_id) REFERENCES scenes(id) ON DELETE CASCADE)''')
-    
-    # 5. Takes
-    conn.execute('''CREATE TABLE IF NOT EXISTS takes (id INTEGER PRIMARY KEY AUTOINCREMENT, shot_id INTEGER, video_url TEXT, prompt TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY(shot_id) REFERENCES shots(id) ON DELETE CASCADE)''')
-    
-    # 6. Characters (NEW - The Identity Engine)
-    conn.execute('''CREATE TABLE IF NOT EXISTS characters (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, description TEXT, face_path TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-
-    try:
-        conn.execute("ALTER TABLE scenes ADD COLUMN description TEXT")
-    except sqlite3.OperationalError:
-        pass
-    conn.commit()
-    conn.close()
+# Serve renders with Range/206, ETag/304 and long caching for content-addressed blobs (see media.py)
+@app.api_route("/generated/{file_path:path}", methods=["GET", "HEAD"])
+def serve_generated(file_path: str, request: Request):
+    return media_response(request, OUTPUT_DIR, file_path)
 
-init_db()
+# Lazily rendered thumbnails / mp4 poster frames, e.g. /thumbs/<sha256>/md.webp (see thumbnails.py)
+@app.get("/thumbs/{sha256}/{name}")
+async def serve_thumbnail(sha256: str, name: str, request: Request):
+    if not is_sha256(sha256):
+        raise HTTPException(status_code=404, detail="No such thumbnail")
+    size, _, fmt = name.partition(".")
+    path = await thumbnails.get_thumbnail(sha256, size, fmt)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No such thumbnail")
+    return media_response(request, thumbnails.THUMB_DIR, thumbnails.cache_relpath(sha256, size, fmt), etag=f'"{sha256}-{size}"')
 
 # --- MODELS ---
 class Project(BaseModel):
@@ -96,19 +111,36 @@ class GenerateRequest(BaseModel):
     lens: str = "Anamorphic"
     focal_length: str = "35mm"
     chroma_key: bool = False
+    seed: Optional[int] = None   # fixed seed; reproduces an earlier render exactly
+    cache: bool = False          # reuse the output of an identical earlier render
+
+class KeyframeBatchRequest(BaseModel):
+    camera: str = "Arri Alexa 35"
+    lens: str = "Anamorphic"
+    focal_length: str = "35mm"
+    chroma_key: bool = False
 
 class DirectorRequest(BaseModel):
     prompt: str
     style: str = "Cinematic"
     camera_move: str = "Push In"
 
+class DirectorBatchRequest(BaseModel):
+    scene_id: int
+    style: str = "Cinematic"
+    camera_move: str = "Push In"
+
 class ShotAnimateRequest(BaseModel):
     prompt: str
     style: str = "Cinematic"
     camera_move: str = "Push In"
+    seed: Optional[int] = None
+    cache: bool = False
 
 class VideoRequest(BaseModel):
     prompt: str
+    seed: Optional[int] = None
+    cache: bool = False
 
 class AssetUpdate(BaseModel):
     name: str
@@ -128,6 +160,25 @@ class ShotUpdate(BaseModel):
     video_url: str | None = None
     status: str | None = None
 
+class ShotDraft(BaseModel):
+    prompt: str
+    cast_id: int | None = None
+    loc_id: int | None = None
+
+class ShotBatchCreate(BaseModel):
+    shots: list[ShotDraft]
+
+class ShotPatch(BaseModel):
+    id: int
+    prompt: str | None = None       # None leaves a field as it is
+    keyframe_url: str | None = None
+    video_url: str | None = None
+    status: str | None = None
+
+class ShotBatchUpdate(BaseModel):
+    shots: list[ShotPatch] = []
+    order: list[int] | None = None  # shot ids in their new order; shots left out follow in their current order
+
 class SelectTakeRequest(BaseModel):
     video_url: str
 
@@ -137,69 +188,80 @@ class StitchRequest(BaseModel):
 class ReorderRequest(BaseModel):
     shot_ids: list[int]
 
+class BackendRequest(BaseModel):
+    name: str
+    url: str
+    max_concurrency: int = 1
+
 # --- ROUTES ---
 
-@app.get("/")
+@app.get("/", response_model=schemas.Message)
 def read_root():
     return {"message": "Cinema Studio Backend v8.0 (Character Profile Engine Enabled)"}
 
 # --- CHARACTER ROUTES ---
-@app.get("/characters")
-def read_characters():
-    conn = get_db_connection()
-    chars = conn.execute('SELECT * FROM characters ORDER BY created_at DESC').fetchall()
-    conn.close()
-    return {"characters": chars}
+def list_page(key: str, table: str, where: str | None = None, params: tuple = (), owner_id: int = 0, **page) -> dict:
+    """A list endpoint's response: {key: rows, "next_cursor", "total"} (see listing.py)."""
+    try:
+        result = fetch_page(table, where, params, count=(key, owner_id), **page)
+    except ListError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {key: result["rows"], "next_cursor": result["next_cursor"], "total": result["total"]}
 
-@app.post("/characters")
+@app.get("/characters", response_model=schemas.CharacterList, response_model_exclude_unset=True)
+def read_characters(limit: Optional[int] = None, cursor: Optional[int] = None, fields: Optional[str] = None):
+    return list_page("characters", "characters", limit=limit, cursor=cursor, fields=fields,
+                     derived={"thumbnail_url": ("face_sha256", thumbnail_url)})
+
+@app.post("/characters", response_model=schemas.CharacterCreated, response_model_exclude_unset=True)
 def create_character(
     name: str = Form(...), 
     description: str = Form(...), 
     image: UploadFile = File(...)
 ):
     try:
-        # 1. Save Face Image using Absolute Path
+        # 1. Save Face Image into the blob store (re-uploading the same face reuses the file)
         file_extension = image.filename.split(".")[-1]
-        safe_filename = f"{name.replace(' ', '_').lower()}_{uuid.uuid4().hex[:6]}.{file_extension}"
-        file_path = FACES_DIR / safe_filename
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        blob = blob_store.ingest_stream(image.file, file_extension)
+        file_path = blob["path"]
 
-        # 2. Save to DB (Store relative path or filename if served via custom endpoint, here storing absolute for internal use, but careful with serving)
-        # Actually, let's keep consistent with how we serve it in get_face_image
-        # We store the absolute path for internal use, but we might want a URL for frontend. 
-        # For now, keeping your logic:
-        
+        # 2. Save to DB (absolute path, ReActor reads the file directly)
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("INSERT INTO characters (name, description, face_path) VALUES (?, ?, ?)", 
-                       (name, description, str(file_path)))
+        cursor.execute("INSERT INTO characters (name, description, face_path, face_sha256) VALUES (?, ?, ?, ?)", 
+                       (name, description, file_path, blob["sha256"]))
         new_id = cursor.lastrowid
         conn.commit()
         conn.close()
         
-        return {"success": True, "character": {"id": new_id, "name": name, "face_path": str(file_path)}}
+        return {"success": True, "character": {"id": new_id, "name": name, "face_path": file_path, "face_sha256": blob["sha256"],
+                                               "face_url": blob["url"]}}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 @app.get("/assets/faces/{filename}")
-def get_face_image(filename: str):
-    file_path = FACES_DIR / filename
-    if file_path.exists():
-        return FileResponse(file_path)
+def get_face_image(filename: str, request: Request):
+    # Faces live in the blob store: /assets/faces/<face_sha256>.<ext>. Bare names are pre-blob-store uploads.
+    sha256 = filename.partition(".")[0]
+    if is_sha256(sha256):
+        conn = get_db_connection()
+        face = conn.execute("SELECT 1 FROM characters WHERE face_sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        conn.close()
+        path = blob_store.local_path(sha256) if face else None
+        if path is None:
+            raise HTTPException(status_code=404, detail="Face not found")
+        return media_response(request, blob_store.root, path.relative_to(blob_store.root).as_posix())
+    if (FACES_DIR / filename).exists():
+        return media_response(request, FACES_DIR, filename)
     return {"error": "File not found"}
 
 # --- PROJECT ROUTES ---
 
-@app.get("/projects")
-def get_projects():
-    conn = get_db_connection()
-    projects = conn.execute('SELECT * FROM projects ORDER BY created_at DESC').fetchall()
-    conn.close()
-    return {"projects": projects}
+@app.get("/projects", response_model=schemas.ProjectList, response_model_exclude_unset=True)
+def get_projects(limit: Optional[int] = None, cursor: Optional[int] = None, fields: Optional[str] = None):
+    return list_page("projects", "projects", limit=limit, cursor=cursor, fields=fields)
 
-@app.get("/projects/{project_id}")
+@app.get("/projects/{project_id}", response_model=schemas.Project)
 def get_project(project_id: int):
     conn = get_db_connection()
     project = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
@@ -208,7 +270,7 @@ def get_project(project_id: int):
         raise HTTPException(status_code=404, detail="Project not found")
     return dict(project)
 
-@app.post("/projects")
+@app.post("/projects", response_model=schemas.ProjectCreated)
 def create_project(project: Project):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -218,16 +280,16 @@ def create_project(project: Project):
     conn.close()
     return {"project_id": new_id, "message": "Project created"}
 
-@app.delete("/projects/{project_id}")
+@app.delete("/projects/{project_id}", response_model=schemas.Message)
 def delete_project(project_id: int):
     conn = get_db_connection()
-    conn.execute("PRAGMA foreign_keys = ON")
     conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
     conn.commit()
     conn.close()
+    blob_store.collect()
     return {"message": "Project deleted"}
 
-@app.put("/projects/{project_id}")
+@app.put("/projects/{project_id}", response_model=schemas.Message)
 def update_project(project_id: int, project: ProjectUpdate):
     conn = get_db_connection()
     conn.execute("UPDATE projects SET name = ?, description = ?, aspect_ratio = ? WHERE id = ?", (project.name, project.description, project.aspect_ratio, project_id))
@@ -235,14 +297,12 @@ def update_project(project_id: int, project: ProjectUpdate):
     conn.close()
     return {"message": "Updated"}
 
-@app.get("/projects/{project_id}/assets")
-def get_project_assets(project_id: int):
-    conn = get_db_connection()
-    assets = conn.execute('SELECT * FROM assets WHERE project_id = ? ORDER BY id DESC', (project_id,)).fetchall()
-    conn.close()
-    return {"assets": assets}
+@app.get("/projects/{project_id}/assets", response_model=schemas.AssetList, response_model_exclude_unset=True)
+def get_project_assets(project_id: int, limit: Optional[int] = None, cursor: Optional[int] = None, fields: Optional[str] = None):
+    return list_page("assets", "assets", "project_id = ?", (project_id,), owner_id=project_id,
+                     limit=limit, cursor=cursor, fields=fields, derived={"thumbnail_url": ("sha256", thumbnail_url)})
 
-@app.put("/assets/{asset_id}")
+@app.put("/assets/{asset_id}", response_model=schemas.Message)
 def update_asset(asset_id: int, asset: AssetUpdate):
     conn = get_db_connection()
     conn.execute("UPDATE assets SET name = ? WHERE id = ?", (asset.name, asset_id))
@@ -250,52 +310,96 @@ def update_asset(asset_id: int, asset: AssetUpdate):
     conn.close()
     return {"message": "Asset updated"}
 
-@app.delete("/assets/{asset_id}")
+@app.delete("/assets/{asset_id}", response_model=schemas.Message)
 def delete_asset(asset_id: int):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    asset = cursor.execute("SELECT image_path FROM assets WHERE id = ?", (asset_id,)).fetchone()
-    if asset:
-        try:
-            # Handle both URL and File paths
-            path_str = asset['image_path']
-            if "http" in path_str:
-                filename = path_str.split("/")[-1]
-                file_path = OUTPUT_DIR / filename
-            else:
-                file_path = Path(path_str)
-                
-            if file_path.exists():
-                os.remove(file_path)
-        except: pass
-    cursor.execute("DELETE FROM assets WHERE id = ?", (asset_id,))
+    conn.execute("DELETE FROM assets WHERE id = ?", (asset_id,))
     conn.commit()
     conn.close()
+    # The image goes once nothing else (e.g. a shot keyframe) still points at it.
+    blob_store.collect()
     return {"message": "Asset deleted"}
 
-@app.get("/projects/{project_id}/scenes")
-def get_scenes(project_id: int):
+def shot_thumbnail_url(shot) -> str | None:
+    """Keyframe thumbnail, or the poster frame of the selected video when there's no keyframe."""
+    return thumbnail_url(shot['keyframe_sha256'] or shot['video_sha256'])
+
+def tree_response(request: Request, kind: str, key: int, version: int, build) -> Response:
+    """Cached storyboard JSON for this tree version (gzip/br as negotiated), or 304 if the client's ETag already names it (see tree_cache.py)."""
+    etag = tree_cache.etag(kind, key, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        tree_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    bodies = tree_cache.get(kind, key, version)
+    if bodies is None:
+        # Encoded as built: the rows come straight from our own tables, so no per-field validation on a rebuild.
+        bodies = {None: orjson.dumps(build())}
+        tree_cache.put(kind, key, version, bodies)
+    coding = None
+    if len(bodies[None]) >= compression.COMPRESS_MIN_BYTES:
+        coding = compression.pick_encoding(request.headers.get("accept-encoding", ""))
+        headers["Vary"] = "Accept-Encoding"
+    if coding:
+        if coding not in bodies:
+            bodies[coding] = compression.compress(bodies[None], coding)   # two racing requests just compress twice
+        headers["Content-Encoding"] = coding
+    body = bodies[coding]
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/projects/{project_id}/scenes", response_model=schemas.SceneTree)
+def get_scenes(project_id: int, request: Request):
+    # Version first: a write landing mid-build then only makes the next read rebuild.
+    version = tree_cache.project_version(project_id)
+    return tree_response(request, "project", project_id, version, lambda: project_scenes(project_id))
+
+def project_scenes(project_id: int) -> dict:
     conn = get_db_connection()
-    scenes = conn.execute('SELECT * FROM scenes WHERE project_id = ? ORDER BY order_index ASC', (project_id,)).fetchall()
-    results = []
-    for scene in scenes:
-        shots = conn.execute('SELECT * FROM shots WHERE scene_id = ? ORDER BY order_index ASC', (scene['id'],)).fetchall()
-        results.append({**dict(scene), "shots": shots})
+    # One round trip for the whole storyboard: every scene, LEFT JOINed to its shots.
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute('''
+        SELECT scenes.*, shots.* FROM scenes
+        LEFT JOIN shots ON shots.scene_id = scenes.id
+        WHERE scenes.project_id = ?
+        ORDER BY scenes.order_index ASC, scenes.id ASC, shots.order_index ASC
+    ''', (project_id,)).fetchall()
+    columns = [col[0] for col in cursor.description]
     conn.close()
+
+    # scenes.* and shots.* both start with "id"; the second one marks where the shot columns begin.
+    split = columns.index("id", 1)
+    scene_cols, shot_cols = columns[:split], columns[split:]
+
+    results = []
+    for row in rows:
+        if not results or results[-1]["id"] != row[0]:
+            results.append({**dict(zip(scene_cols, row[:split])), "shots": []})
+        if row[split] is not None:
+            shot = dict(zip(shot_cols, row[split:]))
+            shot["thumbnail_url"] = shot_thumbnail_url(shot)
+            results[-1]["shots"].append(shot)
     return {"scenes": results}
 
 # --- ADDED: GET SINGLE SCENE (Fixes Scene Detail Page) ---
-@app.get("/scenes/{scene_id}")
-def get_scene(scene_id: int):
+@app.get("/scenes/{scene_id}", response_model=schemas.SceneDetail)
+def get_scene(scene_id: int, request: Request):
+    version = tree_cache.scene_version(scene_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    return tree_response(request, "scene", scene_id, version, lambda: scene_detail(scene_id))
+
+def scene_detail(scene_id: int) -> dict | None:
     conn = get_db_connection()
     scene = conn.execute('SELECT * FROM scenes WHERE id = ?', (scene_id,)).fetchone()
     shots = conn.execute('SELECT * FROM shots WHERE scene_id = ? ORDER BY order_index ASC', (scene_id,)).fetchall()
     conn.close()
     if not scene:
-        raise HTTPException(status_code=404, detail="Scene not found")
-    return {"scene": dict(scene), "shots": [dict(s) for s in shots]}
+        return None
+    return {"scene": dict(scene), "shots": [{**dict(s), "thumbnail_url": shot_thumbnail_url(s)} for s in shots]}
 
-@app.post("/projects/{project_id}/scenes")
+@app.post("/projects/{project_id}/scenes", response_model=schemas.SceneWithShots, response_model_exclude_unset=True)
 def create_scene(project_id: int, scene: Scene):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -305,244 +409,655 @@ def create_scene(project_id: int, scene: Scene):
     conn.close()
     return {"id": new_id, "name": scene.name, "description": scene.description, "shots": []}
 
-@app.get("/scenes/{scene_id}/play")
+@app.get("/scenes/{scene_id}/play", response_model=schemas.Playlist)
 def play_scene_sequence(scene_id: int):
     conn = get_db_connection()
     shots = conn.execute('''
-        SELECT id, video_url, prompt FROM shots 
+        SELECT id, video_url, prompt, video_sha256 FROM shots 
         WHERE scene_id = ? AND video_url IS NOT NULL 
         ORDER BY order_index ASC
     ''', (scene_id,)).fetchall()
     conn.close()
-    return {"playlist": [dict(s) for s in shots]}
+    # The single-file render, if one exists for the current takes (POST /scenes/{id}/render builds it)
+    hashes = [s['video_sha256'] for s in shots if s['video_sha256']]
+    key = assembly.scene_key(hashes) if hashes else None
+    assembled_url = assembly.output_url(key) if key and assembly.output_path(key).exists() else None
+    return {
+        "playlist": [{"id": s['id'], "video_url": s['video_url'], "prompt": s['prompt']} for s in shots],
+        "assembled_url": assembled_url,
+    }
 
-@app.put("/scenes/{scene_id}/reorder")
-def reorder_scenes(scene_id: int, request: ReorderRequest):
+# --- SCENE RENDER (one mp4 for the whole scene, built as a local job) ---
+
+def scene_take_hashes(scene_id: int) -> list[str]:
     conn = get_db_connection()
-    cursor = conn.cursor()
-    for index, shot_id in enumerate(request.shot_ids):
+    rows = conn.execute(
+        "SELECT video_sha256 FROM shots WHERE scene_id = ? AND video_sha256 IS NOT NULL ORDER BY order_index ASC",
+        (scene_id,),
+    ).fetchall()
+    conn.close()
+    return [r['video_sha256'] for r in rows]
+
+@app.post("/scenes/{scene_id}/render", response_model=schemas.JobTicket, response_model_exclude_unset=True)
+def render_scene(scene_id: int):
+    conn = get_db_connection()
+    scene = conn.execute("SELECT project_id FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    conn.close()
+    if not scene:
+        raise HTTPException(status_code=404, detail="Scene not found")
+    hashes = scene_take_hashes(scene_id)
+    if not hashes:
+        raise HTTPException(status_code=400, detail="Scene has no rendered shots")
+
+    key = assembly.scene_key(hashes)
+    if assembly.output_path(key).exists():
+        return {"success": True, "status": "complete", "video_url": assembly.output_url(key), "key": key}
+
+    # Someone already asked for this exact cut
+    conn = get_db_connection()
+    pending = conn.execute(
+        "SELECT id FROM jobs WHERE kind = 'assemble' AND status IN ('queued', 'running') AND json_extract(payload, '$.key') = ?",
+        (key,),
+    ).fetchone()
+    conn.close()
+    if pending:
+        return {"success": True, "status": "queued", "job_id": pending['id'], "key": key}
+
+    job_id = job_queue.submit("assemble", {"scene_id": scene_id, "key": key, "hashes": hashes}, project_id=scene['project_id'])
+    return {"success": True, "status": "queued", "job_id": job_id, "key": key}
+
+@job_queue.handler("assemble", local=True)
+async def run_assemble_job(job: dict) -> dict:
+    scene_id = job["payload"]["scene_id"]
+    result = await asyncio.to_thread(
+        assembly.assemble, job["payload"]["hashes"], lambda fraction: job_queue.progress(job["id"], fraction)
+    )
+
+    conn = get_db_connection()
+    previous = conn.execute("SELECT render_key FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    conn.execute("UPDATE scenes SET render_key = ? WHERE id = ?", (result["key"], scene_id))
+    conn.commit()
+    old_key = previous['render_key'] if previous else None
+    still_used = old_key and conn.execute("SELECT 1 FROM scenes WHERE render_key = ?", (old_key,)).fetchone()
+    conn.close()
+    # The previous cut of this scene is superseded unless another scene has the same one
+    if old_key and old_key != result["key"] and not still_used:
+        assembly.discard(old_key)
+
+    print(f"🎬 Scene {scene_id} assembled ({result['method']}, {len(job['payload']['hashes'])} shots)")
+    return {"video_url": result["url"], "key": result["key"], "cached": result["method"] == "cached"}
+
+# --- SHOT EDITS (single and batched; a batch is one transaction) ---
+
+REORDER_CHUNK = 5000    # shots per CASE statement (2 bound values each, under SQLite's 32766 limit)
+
+# One statement for any mix of fields: NULL keeps the column. A new keyframe/video
+# moves the shot to ready_for_video/complete unless the patch names a status.
+SHOT_UPDATE_SQL = '''
+    UPDATE shots SET
+        prompt = COALESCE(?, prompt),
+        keyframe_url = COALESCE(?, keyframe_url),
+        keyframe_sha256 = CASE WHEN ? IS NULL THEN keyframe_sha256 ELSE ? END,
+        video_url = COALESCE(?, video_url),
+        video_sha256 = CASE WHEN ? IS NULL THEN video_sha256 ELSE ? END,
+        status = COALESCE(?, status)
+    WHERE id = ?
+'''
+
+def shot_update_params(patch: ShotPatch, hashes: dict) -> tuple:
+    status = patch.status or ("complete" if patch.video_url else "ready_for_video" if patch.keyframe_url else None)
+    return (
+        patch.prompt,
+        patch.keyframe_url, patch.keyframe_url, hashes.get(patch.keyframe_url),
+        patch.video_url, patch.video_url, hashes.get(patch.video_url),
+        status, patch.id,
+    )
+
+def reorder_shots(cursor, scene_id: int, shot_ids: list[int]):
+    """order_index = position in shot_ids, as one CASE update (per REORDER_CHUNK shots)."""
+    for start in range(0, len(shot_ids), REORDER_CHUNK):
+        chunk = shot_ids[start:start + REORDER_CHUNK]
+        cases = " ".join("WHEN ? THEN ?" for _ in chunk)
+        params = [value for index, shot_id in enumerate(chunk, start) for value in (shot_id, index)]
         cursor.execute(
-            "UPDATE shots SET order_index = ? WHERE id = ? AND scene_id = ?", 
-            (index, shot_id, scene_id)
+            f"UPDATE shots SET order_index = CASE id {cases} END WHERE scene_id = ? AND id IN ({','.join('?' * len(chunk))})",
+            params + [scene_id] + chunk,
         )
+
+@app.put("/scenes/{scene_id}/reorder", response_model=schemas.Success, response_model_exclude_unset=True)
+def reorder_scenes(scene_id: int, request: ReorderRequest):
+    conn = get_db_connection()
+    reorder_shots(conn.cursor(), scene_id, request.shot_ids)
     conn.commit()
     conn.close()
     return {"success": True}
 
-@app.post("/shots")
+@app.post("/shots", response_model=schemas.ShotCreated)
 def create_shot(shot: ShotRequest):
     conn = get_db_connection()
     cursor = conn.cursor()
-    last_shot = cursor.execute("SELECT MAX(order_index) as idx FROM shots WHERE scene_id = ?", (shot.scene_id,)).fetchone()
-    new_order = (last_shot['idx'] + 1) if last_shot['idx'] is not None else 0
-    cursor.execute('INSERT INTO shots (scene_id, prompt, reference_asset_id, status, order_index) VALUES (?, ?, ?, "pending", ?)', 
-                   (shot.scene_id, shot.prompt, shot.cast_id or shot.loc_id, new_order))
+    cursor.execute('''
+        INSERT INTO shots (scene_id, prompt, reference_asset_id, status, order_index)
+        SELECT ?, ?, ?, 'pending', COALESCE(MAX(order_index) + 1, 0) FROM shots WHERE scene_id = ?
+    ''', (shot.scene_id, shot.prompt, shot.cast_id or shot.loc_id, shot.scene_id))
     conn.commit()
     new_id = cursor.lastrowid
     conn.close()
     return {"id": new_id, "status": "pending"}
 
-@app.put("/shots/{shot_id}")
+@app.put("/shots/{shot_id}", response_model=schemas.Success, response_model_exclude_unset=True)
 def update_shot(shot_id: int, update: ShotUpdate):
+    # Resolve blob references before writing (the lookups share this thread's connection)
+    hashes = blob_store.resolve_urls([update.keyframe_url, update.video_url])
+    patch = ShotPatch(id=shot_id, keyframe_url=update.keyframe_url or None, video_url=update.video_url or None)
     conn = get_db_connection()
-    cursor = conn.cursor()
-    if update.keyframe_url:
-        cursor.execute("UPDATE shots SET keyframe_url = ?, status = 'ready_for_video' WHERE id = ?", (update.keyframe_url, shot_id))
-    if update.video_url:
-        cursor.execute("UPDATE shots SET video_url = ?, status = 'complete' WHERE id = ?", (update.video_url, shot_id))
+    conn.execute(SHOT_UPDATE_SQL, shot_update_params(patch, hashes))
     conn.commit()
     conn.close()
     return {"success": True}
 
-@app.delete("/shots/{shot_id}")
+@app.post("/scenes/{scene_id}/shots:batch", response_model=schemas.ShotBatchCreated)
+def create_shots_batch(scene_id: int, request: ShotBatchCreate):
+    """Append many shots in one transaction (a script import). Returns the scene, plus the new ids in order."""
+    conn = get_db_connection()
+    try:
+        if not conn.execute("SELECT 1 FROM scenes WHERE id = ?", (scene_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Scene not found")
+        start = conn.execute("SELECT COALESCE(MAX(order_index) + 1, 0) FROM shots WHERE scene_id = ?", (scene_id,)).fetchone()[0]
+        # One prepared INSERT per shot: lastrowid is the only id we can be sure is ours.
+        created = []
+        for i, s in enumerate(request.shots):
+            created.append(conn.execute(
+                "INSERT INTO shots (scene_id, prompt, reference_asset_id, status, order_index) VALUES (?, ?, ?, 'pending', ?)",
+                (scene_id, s.prompt, s.cast_id or s.loc_id, start + i),
+            ).lastrowid)
+        conn.commit()
+    finally:
+        conn.close()
+    return {**scene_detail(scene_id), "created": created}
+
+@app.patch("/scenes/{scene_id}/shots:batch", response_model=schemas.SceneDetail)
+def update_shots_batch(scene_id: int, request: ShotBatchUpdate):
+    """Edit many shots and/or reorder the scene in one transaction. Returns the updated scene."""
+    hashes = blob_store.resolve_urls(url for p in request.shots for url in (p.keyframe_url, p.video_url))
+    conn = get_db_connection()
+    try:
+        if not conn.execute("SELECT 1 FROM scenes WHERE id = ?", (scene_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Scene not found")
+        current = [row['id'] for row in conn.execute(
+            "SELECT id FROM shots WHERE scene_id = ? ORDER BY order_index ASC, id ASC", (scene_id,)
+        )]
+        known = set(current)
+        unknown = sorted(({p.id for p in request.shots} | set(request.order or ())) - known)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Shots not in scene {scene_id}: {unknown}")
+
+        conn.executemany(SHOT_UPDATE_SQL, [shot_update_params(p, hashes) for p in request.shots])
+        if request.order is not None:
+            listed = list(dict.fromkeys(request.order))
+            placed = set(listed)
+            reorder_shots(conn, scene_id, listed + [shot_id for shot_id in current if shot_id not in placed])
+        conn.commit()
+    finally:
+        conn.close()
+    return scene_detail(scene_id)
+
+@app.delete("/shots/{shot_id}", response_model=schemas.Success, response_model_exclude_unset=True)
 def delete_shot(shot_id: int):
     conn = get_db_connection()
-    conn.execute("PRAGMA foreign_keys = ON") 
-    cursor = conn.cursor()
-    
-    shot = cursor.execute("SELECT keyframe_url, video_url FROM shots WHERE id = ?", (shot_id,)).fetchone()
-    takes = cursor.execute("SELECT video_url FROM takes WHERE shot_id = ?", (shot_id,)).fetchall()
-    
-    files_to_delete = []
-    
-    if shot:
-        if shot['keyframe_url']: files_to_delete.append(shot['keyframe_url'])
-        if shot['video_url']: files_to_delete.append(shot['video_url'])
-        
-    for take in takes:
-        if take['video_url']: files_to_delete.append(take['video_url'])
-        
-    for url in files_to_delete:
-        try:
-            filename = url.split("/")[-1]
-            file_path = OUTPUT_DIR / filename
-            if file_path.exists():
-                os.remove(file_path)
-        except Exception as e:
-            print(f"⚠️ Error deleting file {url}: {e}")
-
-    cursor.execute("DELETE FROM shots WHERE id = ?", (shot_id,))
+    # Takes go with it (ON DELETE CASCADE); the blob triggers drop their references too.
+    conn.execute("DELETE FROM shots WHERE id = ?", (shot_id,))
     conn.commit()
     conn.close()
+    blob_store.collect()
     return {"success": True, "message": "Shot deleted"}
 
-# --- GENERATE ENDPOINT (Fixed with Absolute URL) ---
-@app.post("/generate")
+# --- GENERATE ENDPOINT (Queued - poll /jobs/{id} or stream /jobs/{id}/events) ---
+def comfy_progress(job: dict, steps_are_progress: bool = True):
+    """on_event callback for the generators: ComfyUI queue/step progress, live on the job and its project's /events."""
+    best = 0.0
+    def on_event(event: dict):
+        nonlocal best
+        fraction = None
+        if steps_are_progress and event.get("steps"):
+            # Multi-node workflows restart the step count per node; never go backwards.
+            fraction = best = max(best, event["step"] / event["steps"])
+        job_queue.progress(job["id"], fraction, live=event)
+    return on_event
+
+def keep_render(result: dict, url_field: str, kind: str) -> dict:
+    """Blob of a generator result: ingested (and remembered by the render cache if opted in) unless it is a cache hit."""
+    if result.get("cached"):
+        return {"url": result[url_field], "sha256": result["sha256"]}
+    blob = blob_store.ingest(result["path"], result["sha256"])
+    if result.get("cache_key"):
+        render_cache.store(result["cache_key"], blob["sha256"], kind, result["seed"])
+    return blob
+
+def image_render_args(request: GenerateRequest) -> dict:
+    conn = get_db_connection()
+    project = conn.execute('SELECT aspect_ratio FROM projects WHERE id = ?', (request.project_id,)).fetchone()
+    conn.close()
+    ratio = project['aspect_ratio'] if project else "16:9"
+
+    final_prompt = request.prompt
+    if request.chroma_key:
+        final_prompt += ", solid hex code #00FF00 green background, chroma key, flat studio lighting, no shadows on wall, separation from background"
+    return {"prompt": final_prompt, "aspect_ratio": ratio, "camera": request.camera, "lens": request.lens,
+            "focal_length": request.focal_length, "chroma": request.chroma_key, "seed": request.seed}
+
+def save_image_asset(request: GenerateRequest, result: dict) -> dict:
+    blob = keep_render(result, "image_url", "image")
+    with metrics.timed_stage("generate_cinematic_image", "db_write"):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        existing = None
+        if result.get("cached"):
+            # A cache hit in the same project is the asset it already produced
+            existing = cursor.execute(
+                "SELECT id FROM assets WHERE project_id = ? AND type = ? AND sha256 = ? ORDER BY id DESC LIMIT 1",
+                (request.project_id, request.type, blob["sha256"]),
+            ).fetchone()
+        if existing:
+            new_id = existing['id']
+        else:
+            cursor.execute(
+                'INSERT INTO assets (project_id, type, name, prompt, image_path, sha256, seed) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (request.project_id, request.type, request.name, request.prompt, blob["url"], blob["sha256"], result["seed"]),
+            )
+            new_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+    return {"image_url": blob["url"], "asset_id": new_id, "seed": result["seed"], "cached": bool(result.get("cached"))}
+
+@app.post("/generate", response_model=schemas.JobTicket, response_model_exclude_unset=True)
 def generate_asset(
     request: GenerateRequest,
-    x_comfy_url: Optional[str] = Header("http://127.0.0.1:8188")
+    x_comfy_url: Optional[str] = Header(None)
 ):
-    try:
-        conn = get_db_connection()
-        project = conn.execute('SELECT aspect_ratio FROM projects WHERE id = ?', (request.project_id,)).fetchone()
+    if request.cache:
+        # Identical earlier render: answer now instead of queueing behind the GPU
+        hit = cached_image(**image_render_args(request))
+        if hit:
+            return {"success": True, "job_id": None, "status": "complete", **save_image_asset(request, hit)}
+    job_id = job_queue.submit("image", request.model_dump(), backend=x_comfy_url, project_id=request.project_id)
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+@job_queue.handler("image")
+async def run_image_job(job: dict) -> dict:
+    request = GenerateRequest(**job["payload"])
+
+    # Call Generator
+    result = await generate_cinematic_image(**image_render_args(request), base_url=job["backend"], cache=request.cache,
+                                            on_event=comfy_progress(job))
+    
+    if "error" in result:
+        raise Exception(result["error"])
+    
+    # Move the download into the content-addressed store and save the asset
+    return save_image_asset(request, result)
+
+# --- SCENE KEYFRAMES (every pending shot in one pipelined job) ---
+@app.post("/scenes/{scene_id}/generate_keyframes", response_model=schemas.JobTicket, response_model_exclude_unset=True)
+def generate_scene_keyframes(
+    scene_id: int,
+    request: Optional[KeyframeBatchRequest] = None,
+    x_comfy_url: Optional[str] = Header(None)
+):
+    request = request or KeyframeBatchRequest()
+    conn = get_db_connection()
+    scene = conn.execute("SELECT project_id FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    if not scene:
         conn.close()
-        ratio = project['aspect_ratio'] if project else "16:9"
-        
-        final_prompt = request.prompt
-        if request.chroma_key:
-            final_prompt += ", solid hex code #00FF00 green background, chroma key, flat studio lighting, no shadows on wall, separation from background"
-
-        # Call Generator
-        result = generate_cinematic_image(
-            prompt=final_prompt, 
-            aspect_ratio=ratio, 
-            camera=request.camera, 
-            lens=request.lens, 
-            focal_length=request.focal_length,
-            chroma=request.chroma_key,
-            base_url=x_comfy_url
-        )
-        
-        if isinstance(result, dict) and "error" in result:
-             raise Exception(result["error"])
-        
-        # --- URL CONSTRUCTION ---
-        if isinstance(result, dict):
-            # result["image_url"] is "/generated/flux_xyz.png"
-            relative_path = result["image_url"]
-            full_image_url = f"http://127.0.0.1:8000{relative_path}"
-        else:
-            full_image_url = f"http://127.0.0.1:8000{result}"
-        
-        # Save to DB
+        raise HTTPException(status_code=404, detail="Scene not found")
+    # Pending shots that aren't already part of a queued/running batch
+    shots = conn.execute('''
+        SELECT id FROM shots
+        WHERE scene_id = ? AND status = 'pending' AND keyframe_url IS NULL
+          AND id NOT IN (
+              SELECT shot.value FROM jobs, json_each(jobs.payload, '$.shot_ids') AS shot
+              WHERE jobs.kind = 'keyframes' AND jobs.status IN ('queued', 'running')
+          )
+        ORDER BY order_index ASC
+    ''', (scene_id,)).fetchall()
+    conn.close()
+    if not shots:
+        return {"success": True, "job_id": None, "shot_ids": [], "message": "No pending shots"}
+
+    shot_ids = [s['id'] for s in shots]
+    job_id = job_queue.submit("keyframes", {"scene_id": scene_id, "shot_ids": shot_ids, **request.model_dump()},
+                              backend=x_comfy_url, project_id=scene['project_id'])
+    return {"success": True, "job_id": job_id, "status": "queued", "shot_ids": shot_ids}
+
+@job_queue.handler("keyframes")
+async def run_keyframes_job(job: dict) -> dict:
+    payload = job["payload"]
+    request = KeyframeBatchRequest(**payload)
+
+    conn = get_db_connection()
+    project = conn.execute('''
+        SELECT p.aspect_ratio FROM scenes sc JOIN projects p ON sc.project_id = p.id WHERE sc.id = ?
+    ''', (payload["scene_id"],)).fetchone()
+    placeholders = ",".join("?" * len(payload["shot_ids"]))
+    # Prompts are read now, not at submit time, so edits made while queued are honoured
+    shots = conn.execute(
+        f"SELECT id, prompt FROM shots WHERE id IN ({placeholders}) AND keyframe_url IS NULL ORDER BY order_index ASC",
+        payload["shot_ids"],
+    ).fetchall()
+    conn.close()
+    if not shots:
+        return {"keyframes": [], "failed": []}
+
+    done = 0
+    def landed(i, result):
+        nonlocal done
+        done += 1
+        job_queue.progress(job["id"], done / len(shots))
+
+    results = await generate_cinematic_batch(
+        [s['prompt'] for s in shots],
+        aspect_ratio=project['aspect_ratio'] if project else "16:9",
+        camera=request.camera,
+        lens=request.lens,
+        focal_length=request.focal_length,
+        chroma=request.chroma_key,
+        base_url=job["backend"],
+        on_result=landed,
+        on_event=comfy_progress(job, steps_are_progress=False),
+    )
+
+    # Ingest everything first, then write all shots in one transaction
+    # (fresh blobs are safe from collect() for GC_GRACE seconds).
+    rows, keyframes, failed = [], [], []
+    for shot, result in zip(shots, results):
+        if "error" in result:
+            failed.append({"shot_id": shot['id'], "error": result["error"]})
+            continue
+        blob = blob_store.ingest(result["path"], result["sha256"])
+        rows.append((blob["url"], blob["sha256"], shot['id']))
+        keyframes.append({"shot_id": shot['id'], "keyframe_url": blob["url"]})
+
+    with metrics.timed_stage("generate_cinematic_batch", "db_write"):
         conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO assets (project_id, type, name, prompt, image_path) VALUES (?, ?, ?, ?, ?)', (request.project_id, request.type, request.name, request.prompt, full_image_url))
+        conn.executemany(
+            "UPDATE shots SET keyframe_url = ?, keyframe_sha256 = ?, status = 'ready_for_video' WHERE id = ? AND keyframe_url IS NULL",
+            rows,
+        )
         conn.commit()
-        new_id = cursor.lastrowid
         conn.close()
-        
-        return {"success": True, "image_url": full_image_url, "asset_id": new_id}
 
-    except Exception as e:
-        print(f"❌ Gen Error: {e}")
-        return {"success": False, "error": str(e)}
+    if failed and not keyframes:
+        raise Exception(failed[0]["error"])
+    print(f"🖼️ Scene {payload['scene_id']}: {len(keyframes)} keyframe(s), {len(failed)} failed")
+    return {"keyframes": keyframes, "failed": failed}
 
 # --- VIDEO ENDPOINT ---
-@app.post("/generate/video")
+@app.post("/generate/video", response_model=schemas.JobTicket, response_model_exclude_unset=True)
 def generate_video(
     req: VideoRequest,
-    x_comfy_url: Optional[str] = Header("http://127.0.0.1:8188")
+    x_comfy_url: Optional[str] = Header(None)
 ):
-    print(f"🎥 Generating Video on {x_comfy_url}...")
-    
-    video_path = generate_wan_video(
-        prompt=req.prompt, 
-        server_url=x_comfy_url
+    if req.cache:
+        # Identical earlier render: answer now instead of queueing behind the GPU
+        hit = cached_video(req.prompt, seed=req.seed)
+        if hit:
+            return {"success": True, "job_id": None, "status": "complete",
+                    "video_url": hit["video_url"], "seed": hit["seed"], "cached": True}
+    job_id = job_queue.submit("video", req.model_dump(), backend=x_comfy_url)
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+@job_queue.handler("video")
+async def run_video_job(job: dict) -> dict:
+    req = VideoRequest(**job["payload"])
+    print(f"🎥 Generating Video on {job['backend']}...")
+
+    video = await generate_wan_video(
+        prompt=req.prompt,
+        server_url=job["backend"],
+        seed=req.seed,
+        cache=req.cache,
+        on_event=comfy_progress(job)
     )
-    
-    if not video_path:
-        raise HTTPException(status_code=500, detail="Video generation failed")
-        
-    filename = os.path.basename(video_path)
-    
-    return {"status": "success", "video_url": f"http://127.0.0.1:8000/generated/{filename}"}
+    if not video:
+        raise Exception("Video generation failed")
 
-@app.get("/shots/{shot_id}/takes")
-def get_shot_takes(shot_id: int):
-    conn = get_db_connection()
-    takes = conn.execute('SELECT * FROM takes WHERE shot_id = ? ORDER BY created_at DESC', (shot_id,)).fetchall()
-    conn.close()
-    return {"takes": takes}
+    blob = keep_render(video, "video_url", "video")
+    return {"video_url": blob["url"], "seed": video["seed"], "cached": bool(video.get("cached"))}
 
-@app.post("/shots/{shot_id}/select_take")
+@app.get("/shots/{shot_id}/takes", response_model=schemas.TakeList, response_model_exclude_unset=True)
+def get_shot_takes(shot_id: int, limit: Optional[int] = None, cursor: Optional[int] = None, fields: Optional[str] = None):
+    # thumbnail_url is the poster frame of each take's mp4
+    return list_page("takes", "takes", "shot_id = ?", (shot_id,), owner_id=shot_id,
+                     limit=limit, cursor=cursor, fields=fields, derived={"thumbnail_url": ("sha256", thumbnail_url)})
+
+@app.post("/shots/{shot_id}/select_take", response_model=schemas.Success, response_model_exclude_unset=True)
 def select_take(shot_id: int, req: SelectTakeRequest):
     conn = get_db_connection()
-    conn.execute("UPDATE shots SET video_url = ? WHERE id = ?", (req.video_url, shot_id))
+    take = conn.execute("SELECT sha256 FROM takes WHERE shot_id = ? AND video_url = ?", (shot_id, req.video_url)).fetchone()
+    video_sha256 = take['sha256'] if take else blob_store.resolve_url(req.video_url)
+    conn.execute("UPDATE shots SET video_url = ?, video_sha256 = ? WHERE id = ?", (req.video_url, video_sha256, shot_id))
     conn.commit()
     conn.close()
     return {"success": True}
 
-@app.delete("/takes/{take_id}")
+@app.delete("/takes/{take_id}", response_model=schemas.Success, response_model_exclude_unset=True)
 def delete_take(take_id: int):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    take = cursor.execute("SELECT video_url FROM takes WHERE id = ?", (take_id,)).fetchone()
-    if take and take['video_url']:
-        try: 
-            filename = take['video_url'].split("/")[-1]
-            file_path = OUTPUT_DIR / filename
-            if file_path.exists():
-                os.remove(file_path)
-        except: pass
-    cursor.execute("DELETE FROM takes WHERE id = ?", (take_id,))
+    conn.execute("DELETE FROM takes WHERE id = ?", (take_id,))
     conn.commit()
     conn.close()
+    # Kept on disk while the shot still plays this take.
+    blob_store.collect()
     return {"success": True}
 
-@app.post("/director/enhance")
-def enhance_prompt_endpoint(request: DirectorRequest):
+@app.post("/director/enhance", response_model=schemas.Enhanced, response_model_exclude_unset=True)
+async def enhance_prompt_endpoint(request: DirectorRequest):
     try:
-        enhanced_text = get_director_prompt(request.prompt, request.style, request.camera_move)
+        enhanced_text = await get_director_prompt(request.prompt, request.style, request.camera_move)
         return {"success": True, "enhanced_prompt": enhanced_text}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-@app.post("/shots/{shot_id}/animate")
+@app.post("/director/enhance_batch", response_model=schemas.EnhancedBatch, response_model_exclude_unset=True)
+async def enhance_batch_endpoint(request: DirectorBatchRequest):
+    """Enhance every shot prompt in a scene at once (concurrent, rate-limited, in shot order)."""
+    conn = get_db_connection()
+    shots = conn.execute(
+        "SELECT id, prompt FROM shots WHERE scene_id = ? AND prompt IS NOT NULL AND prompt != '' ORDER BY order_index ASC",
+        (request.scene_id,),
+    ).fetchall()
+    conn.close()
+    try:
+        enhanced = await director.enhance_many([(s['prompt'], request.style, request.camera_move) for s in shots])
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    return {
+        "success": True,
+        "shots": [{"shot_id": s['id'], "prompt": s['prompt'], "enhanced_prompt": text} for s, text in zip(shots, enhanced)],
+    }
+
+@app.get("/director/metrics", response_model=dict)
+def director_metrics():
+    return {"cache": director_cache.metrics(), "models": model_health.metrics(), "calls": director.metrics()}
+
+@app.get("/render_cache/metrics", response_model=dict)
+def render_cache_metrics():
+    return render_cache.metrics()
+
+@app.get("/tree_cache/metrics", response_model=dict)
+def tree_cache_metrics():
+    return tree_cache.metrics()
+
+@app.get("/uploads/metrics", response_model=dict)
+def upload_metrics():
+    return upload_cache.metrics()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus scrape target: render stage timings, ComfyUI errors/timeouts, renders in flight (see metrics.py)."""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+def set_shot_status(shot_id: int, status: str):
+    conn = get_db_connection()
+    conn.execute("UPDATE shots SET status = ? WHERE id = ?", (status, shot_id))
+    conn.commit()
+    conn.close()
+
+def get_keyframe_path(shot) -> Path | None:
+    if not shot or not shot['keyframe_url']:
+        return None
+    return blob_store.local_path(shot['keyframe_sha256'] or blob_store.resolve_url(shot['keyframe_url']))
+
+@app.post("/shots/{shot_id}/animate", response_model=schemas.JobTicket, response_model_exclude_unset=True)
 def animate_shot_endpoint(
     shot_id: int, 
     request: ShotAnimateRequest,
-    x_comfy_url: Optional[str] = Header("http://127.0.0.1:8188")
+    x_comfy_url: Optional[str] = Header(None)
 ):
     conn = get_db_connection()
-    cursor = conn.cursor()
-    shot = cursor.execute("SELECT * FROM shots WHERE id = ?", (shot_id,)).fetchone()
+    shot = conn.execute('''
+        SELECT shots.*, scenes.project_id FROM shots
+        LEFT JOIN scenes ON scenes.id = shots.scene_id
+        WHERE shots.id = ?
+    ''', (shot_id,)).fetchone()
+    conn.close()
+
     if not shot or not shot['keyframe_url']:
-        conn.close()
         return {"success": False, "error": "Shot has no keyframe"}
-    
-    filename = shot['keyframe_url'].split("/")[-1]
-    local_path = OUTPUT_DIR / filename
-    if not local_path.exists():
-        conn.close()
+    local_path = get_keyframe_path(shot)
+    if local_path is None or not local_path.exists():
         return {"success": False, "error": "Source file missing"}
     
+    if request.cache:
+        hit = cached_video(request.prompt, str(local_path), request.seed)
+        if hit:
+            return {"success": True, "job_id": None, "status": "complete", **save_take(shot_id, request, hit)}
+
+    set_shot_status(shot_id, "pending")
+    job_id = job_queue.submit("animate", request.model_dump(), backend=x_comfy_url, project_id=shot['project_id'], shot_id=shot_id)
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+def save_take(shot_id: int, request: ShotAnimateRequest, video: dict) -> dict:
+    blob = keep_render(video, "video_url", "video")
+    full_video_url = blob["url"]
+    with metrics.timed_stage("generate_wan_video", "db_write"):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE shots SET video_url = ?, video_sha256 = ?, status = 'complete' WHERE id = ?", (full_video_url, blob["sha256"], shot_id))
+        # A cache hit for a take this shot already has just selects it again
+        existing = cursor.execute("SELECT id FROM takes WHERE shot_id = ? AND sha256 = ?", (shot_id, blob["sha256"])).fetchone()
+        if not existing:
+            cursor.execute("INSERT INTO takes (shot_id, video_url, prompt, sha256, seed) VALUES (?, ?, ?, ?, ?)", (shot_id, full_video_url, request.prompt, blob["sha256"], video["seed"]))
+        conn.commit()
+        conn.close()
+    return {"video_url": full_video_url, "seed": video["seed"], "cached": bool(video.get("cached"))}
+
+@job_queue.handler("animate")
+async def run_animate_job(job: dict) -> dict:
+    shot_id = job["shot_id"]
+    request = ShotAnimateRequest(**job["payload"])
+
+    conn = get_db_connection()
+    shot = conn.execute("SELECT * FROM shots WHERE id = ?", (shot_id,)).fetchone()
+    conn.close()
+
+    local_path = get_keyframe_path(shot)
+    if local_path is None or not local_path.exists():
+        raise Exception("Shot keyframe is missing")
+
+    set_shot_status(shot_id, "rendering")
     try:
-        video_web_path = generate_wan_video(
+        video = await generate_wan_video(
             local_image_path=str(local_path), 
             prompt=request.prompt, 
-            style=request.style, 
-            camera=request.camera_move,
-            server_url=x_comfy_url
+            server_url=job["backend"],
+            seed=request.seed,
+            cache=request.cache,
+            on_event=comfy_progress(job)
         )
-        
-        full_video_url = f"http://127.0.0.1:8000{video_web_path}"
-        cursor.execute("UPDATE shots SET video_url = ?, status = 'complete' WHERE id = ?", (full_video_url, shot_id))
-        cursor.execute("INSERT INTO takes (shot_id, video_url, prompt) VALUES (?, ?, ?)", (shot_id, full_video_url, request.prompt))
-        conn.commit()
-        return {"success": True, "video_url": full_video_url}
-    except Exception as e:
-        print(f"Sequencer Error: {e}")
-        return {"success": False, "error": str(e)}
-    finally:
-        conn.close()
+        if not video:
+            raise Exception("Video generation failed")
+    except Exception:
+        # Back to where it was before the render was queued (the keyframe is still there).
+        set_shot_status(shot_id, "ready_for_video")
+        raise
+    
+    return save_take(shot_id, request, video)
+
+# --- BACKEND ROUTES (ComfyUI render pool) ---
+
+@app.get("/backends", response_model=schemas.BackendList)
+def list_backends():
+    return {"backends": [b.to_dict() for b in backend_registry.all()]}
+
+@app.post("/backends", response_model=schemas.Backend)
+async def add_backend(req: BackendRequest):
+    try:
+        backend = backend_registry.add(req.name, req.url, req.max_concurrency)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await backend_registry.probe(backend)
+    job_queue.wake()
+    return backend.to_dict()
+
+@app.delete("/backends/{name}", response_model=schemas.Success, response_model_exclude_unset=True)
+async def remove_backend(name: str):
+    try:
+        backend_registry.remove(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Backend not found")
+    return {"success": True}
+
+# --- JOB ROUTES ---
 
-@app.post("/shots/{shot_id}/stitch")
-def stitch_shot_endpoint(shot_id: int, request: StitchRequest):
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+def get_job(job_id: int):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: int):
+    """Server-Sent Events: one `data:` message per status change, closed once the job finishes."""
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        async for job in job_queue.subscribe(job_id):
+            yield f"data: {json.dumps(job)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/events")
+def stream_project_events(project_id: int):
+    """
+    Server-Sent Events for everything rendering in a project: `job` events
+    (status, progress, live ComfyUI step/queue detail, shot_ids) and `queue`
+    events (positions of its waiting jobs). Open once per page instead of
+    holding a request per render; see events.py.
+    """
+    async def event_stream():
+        async for message in event_hub.subscribe(project_id):
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            event, data = message
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/events/metrics", response_model=dict)
+def event_metrics():
+    return event_hub.metrics()
+
+def stitch_source(shot_id: int, source_video_url: Optional[str]) -> dict:
+    """Blocking: the clip to continue from (the shot's selected take unless one is given), its prompt and its shot's place."""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    video_url_to_use = request.source_video_url
+    video_url_to_use = source_video_url
     source_prompt = ""
     
     if not video_url_to_use:
@@ -558,57 +1073,49 @@ def stitch_shot_endpoint(shot_id: int, request: StitchRequest):
             shot_data = cursor.execute("SELECT prompt FROM shots WHERE id = ?", (shot_id,)).fetchone()
             if shot_data:
                 source_prompt = shot_data['prompt']
-    
-    if not video_url_to_use:
-        conn.close()
-        return {"success": False, "error": "No video selected to stitch from"}
-    
-    new_prompt = "Continuation..."
-    if source_prompt:
-        if "[CONTEXT:" in source_prompt and "]" in source_prompt:
-            try:
-                parts = source_prompt.split("]", 1)
-                context_block = parts[0] + "]" 
-                new_prompt = f"{context_block} (Continue action here...)"
-            except:
-                new_prompt = f"{source_prompt} (Continued)"
-        else:
-            new_prompt = f"{source_prompt} (Continued)"
 
+    shot_data = cursor.execute("SELECT scene_id, order_index FROM shots WHERE id = ?", (shot_id,)).fetchone()
+    conn.close()
+
+    video_sha256 = blob_store.resolve_url(video_url_to_use)
+    return {
+        "video_url": video_url_to_use,
+        "video_sha256": video_sha256 if blob_store.local_path(video_sha256) is not None else None,
+        "prompt": source_prompt,
+        "scene_id": shot_data['scene_id'] if shot_data else 1,
+        "order_index": shot_data['order_index'] if shot_data else 0,
+    }
+
+def save_stitched_shot(shot_id: int, source: dict, frame_path: Path) -> int:
+    """Blocking: store the frame as the keyframe of a new shot right after this one. Returns the new shot id."""
+    new_file_path = OUTPUT_DIR / f"stitch_from_{shot_id}_{uuid.uuid4().hex[:8]}.png"
+    shutil.copyfile(frame_path, new_file_path)
+    blob = blob_store.ingest(new_file_path)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO shots (scene_id, prompt, keyframe_url, keyframe_sha256, status, order_index)
+        VALUES (?, ?, ?, ?, 'ready_for_video', ?)
+    ''', (source["scene_id"], continuation_prompt(source["prompt"]), blob["url"], blob["sha256"], source["order_index"] + 1))
+    new_shot_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return new_shot_id
+
+@app.post("/shots/{shot_id}/stitch", response_model=schemas.Stitched, response_model_exclude_unset=True)
+async def stitch_shot_endpoint(shot_id: int, request: StitchRequest):
+    # SQLite and file work run in worker threads; the route itself only awaits.
     try:
-        video_filename = video_url_to_use.split("/")[-1]
-        local_video_path = OUTPUT_DIR / video_filename
-        
-        if not local_video_path.exists():
-             return {"success": False, "error": f"Video file not found: {video_filename}"}
-
-        cap = cv2.VideoCapture(str(local_video_path))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames - 1)
-        ret, frame = cap.read()
-        cap.release()
-        
-        if not ret:
-            return {"success": False, "error": "Could not extract last frame"}
-            
-        new_filename = f"stitch_from_{shot_id}_{total_frames}.jpg"
-        new_file_path = OUTPUT_DIR / new_filename
-        cv2.imwrite(str(new_file_path), frame)
-        new_keyframe_url = f"http://127.0.0.1:8000/generated/{new_filename}"
-        
-        shot_data = cursor.execute("SELECT scene_id, order_index FROM shots WHERE id = ?", (shot_id,)).fetchone()
-        scene_id = shot_data['scene_id'] if shot_data else 1
-        current_order = shot_data['order_index'] if shot_data else 0
-
-        cursor.execute('''
-            INSERT INTO shots (scene_id, prompt, keyframe_url, status, order_index)
-            VALUES (?, ?, ?, 'ready_for_video', ?)
-        ''', (scene_id, new_prompt, new_keyframe_url, current_order + 1))
-        
-        new_shot_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
+        source = await asyncio.to_thread(stitch_source, shot_id, request.source_video_url)
+        if not source["video_url"]:
+            return {"success": False, "error": "No video selected to stitch from"}
+        if source["video_sha256"] is None:
+            return {"success": False, "error": f"Video file not found: {source['video_url']}"}
+
+        # Exact last frame, decoded off the event loop and cached per clip (see frames.py)
+        frame_path = await frames.get_frame(source["video_sha256"], -1)
+        new_shot_id = await asyncio.to_thread(save_stitched_shot, shot_id, source, frame_path)
         return {"success": True, "new_shot_id": new_shot_id}
         
     except Exception as e:
@@ -626,14 +1133,21 @@ if __name__ == "__main__":
     else:
         print("   ⚠️ Director Engine (Gemini): OFF (Missing GEMINI_API_KEY in .env)")
 
-    # 2. Check Directories
+    # 2. Check Database Schema
+    try:
+        print(f"   ✅ Database Schema: v{check_schema()} (Ready)")
+    except SchemaOutOfDate as e:
+        print(f"   ❌ Database Schema: {e}")
+        raise SystemExit(1)
+
+    # 3. Check Directories
     if OUTPUT_DIR.exists():
         print(f"   ✅ Output Directory: {OUTPUT_DIR} (Ready)")
     else:
         print(f"   ⚠️ Output Directory: {OUTPUT_DIR} (Creating...)")
         OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
-    # 3. Check Faces Dir
+    # 4. Check Faces Dir
     if FACES_DIR.exists():
         print(f"   ✅ Faces Directory: {FACES_DIR} (Ready)")
     else:
@@ -0,0 +1,155 @@
+import re
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Media serving for /generated (renders, stitched frames) and face images.
+#
+# The browser's <video> element scrubs with Range requests, so every response
+# advertises Accept-Ranges and answers a single "bytes=" range with 206.
+# Content-addressed blobs (ab/cd/<sha256>.ext, see blobstore.py) can never
+# change: their ETag is the hash itself and they are cached for a year.
+# Legacy flat files get a weak mtime/size ETag and must be revalidated.
+#
+# The body goes out with the ASGI "http.response.zerocopysend" extension
+# (os.sendfile on the socket) when the server offers it, "pathsend" for full
+# responses, and 1 MiB threadpool reads otherwise.
+
+CHUNK = 1 << 20
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+_BLOB_PATH = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.\w+$")
+_SCENE_PATH = re.compile(r"^scenes/([0-9a-f]{2})/(\1[0-9a-f]{62})\.mp4$")   # assembly.py, keyed by take hashes
+_MEDIA_TYPES = {
+    "mp4": "video/mp4", "webm": "video/webm", "mov": "video/quicktime", "gif": "image/gif",
+    "png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "webp": "image/webp",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    (start, end) inclusive for a single "bytes=" range, or None to send the
+    whole file (no header, multiple ranges or a malformed one).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, sep, end = header[6:].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start == "":
+            length = int(end)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable()
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+class MediaResponse(Response):
+    """Sends `count` bytes of `path` from `offset`, zero-copy when the server allows it."""
+
+    def __init__(self, path: Path, offset: int, count: int, status_code: int, headers: dict, send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if not self.send_body or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": self.offset, "count": self.count})
+            return
+        if "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank under us; close the response rather than hang the client.
+            await send({"type": "http.response.body", "body": b""})
+
+
+def media_response(request: Request, root: Path, relpath: str, etag: str | None = None) -> Response:
+    """
+    Serve root/relpath. Pass `etag` (a strong, quoted tag) for files that are
+    immutable by construction, e.g. derivatives keyed by their source hash.
+    """
+    root = root.resolve()
+    path = (root / relpath).resolve()
+    if root not in path.parents or not path.is_file():
+        return Response(status_code=404)
+
+    stat = path.stat()
+    blob = _BLOB_PATH.match(relpath)
+    scene = _SCENE_PATH.match(relpath)
+    if etag:
+        cache_control = IMMUTABLE
+    elif blob:
+        etag, cache_control = f'"{blob.group(3)}"', IMMUTABLE
+    elif scene:
+        etag, cache_control = f'"{scene.group(2)}"', IMMUTABLE
+    else:
+        etag, cache_control = f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"', REVALIDATE
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Content-Type": _MEDIA_TYPES.get(path.suffix.lstrip(".").lower(), "application/octet-stream"),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={k: headers[k] for k in ("ETag", "Cache-Control")})
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # If-Range needs a strong match; a weak ETag means "send the whole thing".
+    if not if_range or (if_range == etag and not etag.startswith("W/")):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", **headers})
+
+    head = request.method == "HEAD"
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return MediaResponse(path, 0, size, 200, headers, send_body=not head)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return MediaResponse(path, start, end - start + 1, 206, headers, send_body=not head)
@@ -0,0 +1,219 @@
+import contextvars
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Render pipeline telemetry, served as Prometheus text at GET /metrics.
+#
+#   studio_stage_seconds{operation, stage}      histogram; where a render or
+#       Director call spends its time. operation is generate_cinematic_image,
+#       generate_cinematic_batch, generate_wan_video or get_director_prompt.
+#       Render stages: build (workflow graph), upload (reference image),
+#       submit (POST /prompt), queue_wait, execute, poll_lag (only when the
+#       websocket was unavailable), render (submit to output: the three
+#       before), download, db_write (saving the asset/take), total (the
+#       generator call; render cache hits aren't timed).
+#       Director stages: cache, wait (concurrency/rate limit), upstream
+#       (one Gemini call), total (as the caller waits, cache hits included).
+#   studio_comfy_errors_total{backend, kind}    counter; kind is rejected,
+#       execution, interrupted, history, download, upload or connection
+#   studio_comfy_timeouts_total{backend}        counter
+#   studio_renders_in_flight{backend}           gauge; prompts we've queued on
+#       a ComfyUI server and not yet got the output of
+#   studio_jobs{status}                         gauge; queued/running jobs
+#
+# Every HTTP request gets an id (X-Request-ID, echoed back or generated),
+# which jobs carry along and ComfyClient puts in its ComfyUI client_id, so a
+# slow prompt in ComfyUI's history leads back to the request that made it.
+#
+# The exposition is written here rather than with prometheus_client: three
+# metric types, labels, and a text format are all this needs.
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,64}")    # it ends up in a websocket URL
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id() -> str | None:
+    return request_id_var.get()
+
+
+class RequestIdMiddleware:
+    """Tags each request with the client's X-Request-ID (or a new id) for current_request_id(), and echoes it back."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers(scope=scope).get("x-request-id", "")
+        if not REQUEST_ID_PATTERN.fullmatch(request_id):
+            request_id = new_request_id()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}           # label values tuple -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """(suffix, label values, extra label, value) for render()."""
+        with self._lock:
+            return [("", key, "", value) for key, value in self._values.items()]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.label_names, key, extra)} {_number(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), collect=None):
+        super().__init__(name, help, labels)
+        self.collect = collect      # fn() -> {label values tuple: value}, read at scrape time instead of set()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.collect is None:
+            return super().samples()
+        return [("", tuple(str(v) for v in key), "", value) for key, value in self.collect().items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = STAGE_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(float(b) for b in sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]   # per-bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    out.append(("_bucket", key, f'le="{_number(bound)}"', cumulative))
+                out.append(("_sum", key, "", total))
+                out.append(("_count", key, "", count))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "studio_stage_seconds", "Time spent per stage of a render or Director call.", ("operation", "stage")))
+comfy_errors = registry.register(Counter(
+    "studio_comfy_errors_total", "ComfyUI failures by kind.", ("backend", "kind")))
+comfy_timeouts = registry.register(Counter(
+    "studio_comfy_timeouts_total", "Renders that outlived their timeout waiting for ComfyUI.", ("backend",)))
+renders_in_flight = registry.register(Gauge(
+    "studio_renders_in_flight", "Prompts queued on a ComfyUI server whose output hasn't arrived yet.", ("backend",)))
+
+
+@contextmanager
+def timed_stage(operation: str, stage: str):
+    """`with timed_stage("generate_wan_video", "download"):` observes the block's duration if it completes."""
+    start = time.perf_counter()
+    yield
+    stage_seconds.observe(time.perf_counter() - start, operation=operation, stage=stage)
@@ -0,0 +1,138 @@
+import argparse
+import importlib.util
+import re
+import sqlite3
+from pathlib import Path
+
+import db
+
+# Versioned schema migrations.
+#
+# Each file in migrations/ is one step, named NNNN_description.sql or
+# NNNN_description.py (a .py step defines `upgrade(conn, has_column)`).
+# Applied versions are recorded in the `schema_version` table. Pending steps
+# run once, in order, inside a single transaction: the database either ends
+# up on the latest version or is left untouched.
+#
+#     python migrate.py            # apply pending migrations
+#     python migrate.py --status   # show current vs latest version
+#
+# The app itself only compares version numbers at startup (check_schema).
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+_NAME = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def discover() -> list[tuple[int, str, Path]]:
+    found = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = _NAME.match(path.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), path))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration numbers in {MIGRATIONS_DIR}")
+    return found
+
+
+def latest_version() -> int:
+    migrations = discover()
+    return migrations[-1][0] if migrations else 0
+
+
+def current_version(conn) -> int:
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def _split_sql(script: str) -> list[str]:
+    """executescript() would COMMIT our transaction, so statements are run one by one."""
+    statements, buffer = [], ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    leftover = [line for line in buffer.splitlines() if line.strip() and not line.strip().startswith("--")]
+    if leftover:
+        raise ValueError(f"Unterminated SQL statement: {leftover[0][:80]}")
+    return statements
+
+
+def _run_step(conn, path: Path):
+    if path.suffix == ".sql":
+        for statement in _split_sql(path.read_text()):
+            conn.execute(statement)
+        return
+
+    spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def has_column(table: str, column: str) -> bool:
+        return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+    module.upgrade(conn, has_column)
+
+
+def apply_pending(db_path: str | None = None, verbose: bool = True) -> int:
+    """Apply every migration newer than the database's version. Returns how many ran."""
+    conn = sqlite3.connect(db_path or db.DB_PATH, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        current = current_version(conn)
+        pending = [m for m in discover() if m[0] > current]
+        for version, name, path in pending:
+            if verbose:
+                print(f"   ⏩ {version:04d}_{name}")
+            _run_step(conn, path)
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        conn.execute("COMMIT")
+        return len(pending)
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def check_schema():
+    """Startup check: cheap version comparison, never runs DDL."""
+    conn = db.get_db_connection()
+    current = current_version(conn)
+    conn.close()
+    latest = latest_version()
+    if current < latest:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {current}, this build needs {latest}. Run: python migrate.py"
+        )
+    return current
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending studio.db schema migrations")
+    parser.add_argument("--db", type=str, default=None, help=f"Database path (default {db.DB_PATH})")
+    parser.add_argument("--status", action="store_true", help="Only show the current and latest version")
+    args = parser.parse_args()
+
+    path = args.db or db.DB_PATH
+    if args.status:
+        conn = sqlite3.connect(path)
+        print(f"📂 {path}: schema version {current_version(conn)} (latest {latest_version()})")
+        conn.close()
+    else:
+        print(f"📂 Migrating {path}")
+        applied = apply_pending(path)
+        print(f"🎉 Applied {applied} migration(s)." if applied else "✅ Already up to date.")
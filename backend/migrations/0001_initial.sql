@@ -0,0 +1,58 @@
+-- Baseline schema (what init_db() used to create on every import).
+
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    description TEXT,
+    aspect_ratio TEXT DEFAULT '16:9',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER,
+    type TEXT,
+    name TEXT,
+    prompt TEXT,
+    image_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS scenes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id INTEGER,
+    name TEXT,
+    description TEXT,
+    order_index INTEGER,
+    FOREIGN KEY(project_id) REFERENCES projects(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scene_id INTEGER,
+    prompt TEXT,
+    reference_asset_id INTEGER,
+    status TEXT,
+    keyframe_url TEXT,
+    video_url TEXT,
+    order_index INTEGER,
+    FOREIGN KEY(scene_id) REFERENCES scenes(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS takes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shot_id INTEGER,
+    video_url TEXT,
+    prompt TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(shot_id) REFERENCES shots(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    face_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,10 @@
+# Columns that older databases may be missing:
+#  - scenes.description was added after the first release (init_db used to ALTER it in)
+#  - characters.voice_id only existed in setup_db.py's version of the table
+
+
+def upgrade(conn, has_column):
+    if not has_column("scenes", "description"):
+        conn.execute("ALTER TABLE scenes ADD COLUMN description TEXT")
+    if not has_column("characters", "voice_id"):
+        conn.execute("ALTER TABLE characters ADD COLUMN voice_id TEXT")
@@ -0,0 +1,25 @@
+# Background render queue (see jobs.py).
+
+
+def upgrade(conn, has_column):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            backend TEXT,
+            pinned_backend TEXT,
+            project_id INTEGER,
+            shot_id INTEGER,
+            payload TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    # Tables created by init_db before the backend pool existed lack the pin column.
+    if not has_column("jobs", "pinned_backend"):
+        conn.execute("ALTER TABLE jobs ADD COLUMN pinned_backend TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
@@ -0,0 +1,6 @@
+-- Indexes for the storyboard / library reads (each covers the filter + ORDER BY).
+
+CREATE INDEX IF NOT EXISTS idx_shots_scene_order ON shots (scene_id, order_index);
+CREATE INDEX IF NOT EXISTS idx_scenes_project_order ON scenes (project_id, order_index);
+CREATE INDEX IF NOT EXISTS idx_takes_shot_created ON takes (shot_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_assets_project ON assets (project_id);
@@ -0,0 +1,4 @@
+-- SHA-256 of downloaded render outputs, computed while streaming them from ComfyUI.
+
+ALTER TABLE assets ADD COLUMN sha256 TEXT;
+ALTER TABLE takes ADD COLUMN sha256 TEXT;
@@ -0,0 +1,125 @@
+# Content-addressed blob store (see blobstore.py).
+#
+# `blobs` holds one row per stored file; triggers on every sha256 column that
+# points at a blob keep blobs.refcount up to date, including rows removed by
+# ON DELETE CASCADE. Existing files are hard-linked (or copied) into the
+# sharded layout and their rows rewritten to the new URL/path; the old flat
+# files are left in place (`python blobstore.py --legacy` removes them).
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+STORE_DIR = BACKEND_DIR / "generated"
+PUBLIC_URL = "http://127.0.0.1:8000"
+
+# (table, hash column, column holding the file's URL or path, value is a filesystem path)
+REFERENCES = [
+    ("assets", "sha256", "image_path", False),
+    ("takes", "sha256", "video_url", False),
+    ("shots", "keyframe_sha256", "keyframe_url", False),
+    ("shots", "video_sha256", "video_url", False),
+    ("characters", "face_sha256", "face_path", True),
+]
+
+
+def _legacy_file(value: str, is_path: bool) -> Path | None:
+    if is_path:
+        return Path(value)
+    if "/generated/" in value:
+        return STORE_DIR / value.rsplit("/", 1)[-1]
+    return None
+
+
+def _hash(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def upgrade(conn, has_column):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            url TEXT UNIQUE,
+            size INTEGER,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            last_seen REAL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs (last_seen) WHERE refcount <= 0")
+
+    for table, column in [("shots", "keyframe_sha256"), ("shots", "video_sha256"), ("characters", "face_sha256")]:
+        if not has_column(table, column):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+    for table, column, _, _ in REFERENCES:
+        name = f"{table}_{column}"
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS blobref_{name}_insert AFTER INSERT ON {table}
+            WHEN NEW.{column} IS NOT NULL
+            BEGIN UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.{column}; END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS blobref_{name}_delete AFTER DELETE ON {table}
+            WHEN OLD.{column} IS NOT NULL
+            BEGIN UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.{column}; END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS blobref_{name}_update AFTER UPDATE OF {column} ON {table}
+            WHEN OLD.{column} IS NOT NEW.{column}
+            BEGIN
+                UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.{column};
+                UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.{column};
+            END
+        ''')
+
+    # Backfill: import every file an existing row points at.
+    imported = {}
+    for table, column, source, is_path in REFERENCES:
+        rows = conn.execute(
+            f"SELECT id, {source} FROM {table} WHERE {source} IS NOT NULL "
+            f"AND ({column} IS NULL OR {column} NOT IN (SELECT sha256 FROM blobs))"
+        ).fetchall()
+        for row_id, value in rows:
+            legacy = _legacy_file(value, is_path)
+            if legacy is None or not legacy.is_file():
+                continue
+            key = str(legacy.resolve())
+            if key not in imported:
+                sha256 = _hash(legacy)
+                ext = legacy.suffix.lstrip(".").lower() or "bin"
+                existing = conn.execute("SELECT path, url FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+                if existing:
+                    relpath, url = existing
+                else:
+                    relpath = f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+                    url = f"{PUBLIC_URL}/generated/{relpath}"
+                    target = STORE_DIR / relpath
+                    if not target.exists():
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        try:
+                            os.link(legacy, target)
+                        except OSError:
+                            shutil.copy2(legacy, target)
+                    conn.execute(
+                        "INSERT INTO blobs (sha256, path, url, size, last_seen) VALUES (?, ?, ?, ?, ?)",
+                        (sha256, relpath, url, target.stat().st_size, time.time()),
+                    )
+                imported[key] = (sha256, relpath, url)
+
+            sha256, relpath, url = imported[key]
+            new_value = str(STORE_DIR / relpath) if is_path else url
+            conn.execute(f"UPDATE {table} SET {column} = ?, {source} = ? WHERE id = ?", (sha256, new_value, row_id))
+
+    # Recount from scratch rather than trusting the triggers during backfill
+    # (rows that already carried a sha256 don't fire the UPDATE trigger).
+    counts = " + ".join(
+        f"(SELECT COUNT(*) FROM {table} WHERE {column} = blobs.sha256)" for table, column, _, _ in REFERENCES
+    )
+    conn.execute(f"UPDATE blobs SET refcount = {counts}")
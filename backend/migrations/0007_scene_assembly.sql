@@ -0,0 +1,5 @@
+-- Progress reporting for long-running jobs, and the cache key of each scene's
+-- assembled mp4 (see assembly.py) so a superseded render can be removed.
+
+ALTER TABLE jobs ADD COLUMN progress REAL;
+ALTER TABLE scenes ADD COLUMN render_key TEXT;
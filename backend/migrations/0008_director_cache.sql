@@ -0,0 +1,17 @@
+-- Persistent tier of the Director prompt cache (director_cache.py) and the
+-- health of each Gemini model, so a restart doesn't forget either.
+
+CREATE TABLE IF NOT EXISTS director_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    enhanced_prompt TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_director_cache_created ON director_cache (created_at);
+
+CREATE TABLE IF NOT EXISTS director_models (
+    model TEXT PRIMARY KEY,
+    last_ok REAL,
+    failed_at REAL,
+    error TEXT
+);
@@ -0,0 +1,19 @@
+-- Seeds of every render, so any asset or take can be reproduced exactly, and
+-- the opt-in render cache (render_cache.py): the hash of a fully injected
+-- workflow graph -> the blob it produced. Cache rows don't count as blob
+-- references; unreferenced cached outputs are evicted by total size.
+
+ALTER TABLE assets ADD COLUMN seed INTEGER;
+ALTER TABLE takes ADD COLUMN seed INTEGER;
+
+CREATE TABLE IF NOT EXISTS render_cache (
+    key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    seed INTEGER,
+    created_at REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_render_cache_sha256 ON render_cache (sha256);
+CREATE INDEX IF NOT EXISTS idx_render_cache_last_hit ON render_cache (last_hit);
@@ -0,0 +1,12 @@
+-- Reference images already pushed to a render backend (upload_cache.py):
+-- (ComfyUI base URL or 'fal', content hash) -> the name LoadImage should use,
+-- or the Fal file URL. Rows for a ComfyUI server are dropped whenever it goes
+-- down or comes back, since a restarted box may have lost its input folder.
+
+CREATE TABLE IF NOT EXISTS uploads (
+    backend TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    remote TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (backend, sha256)
+);
@@ -0,0 +1,67 @@
+# Row counts for the paginated list endpoints (see listing.py), kept by
+# triggers so a page can report its total without a COUNT(*) over the list.
+#
+# row_counts(name, owner_id, n): n rows of list `name` under owner_id (the
+# project for assets, the shot for takes, 0 for top-level lists). Deleting an
+# owner drops its counter; ON DELETE CASCADE deletes of the children only
+# ever decrement, so the order SQLite runs them in doesn't matter.
+
+# (list name, table, owner column or None, owner table)
+COUNTED = [
+    ("projects", "projects", None, None),
+    ("characters", "characters", None, None),
+    ("assets", "assets", "project_id", "projects"),
+    ("takes", "takes", "shot_id", "shots"),
+]
+
+
+def upgrade(conn, has_column):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS row_counts (
+            name TEXT NOT NULL,
+            owner_id INTEGER NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, owner_id)
+        )
+    ''')
+
+    for name, table, owner, owner_table in COUNTED:
+        new_owner = f"NEW.{owner}" if owner else "0"
+        old_owner = f"OLD.{owner}" if owner else "0"
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS rowcount_{name}_insert AFTER INSERT ON {table}
+            WHEN {new_owner} IS NOT NULL
+            BEGIN
+                INSERT INTO row_counts (name, owner_id, n) VALUES ('{name}', {new_owner}, 1)
+                ON CONFLICT (name, owner_id) DO UPDATE SET n = n + 1;
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS rowcount_{name}_delete AFTER DELETE ON {table}
+            BEGIN UPDATE row_counts SET n = n - 1 WHERE name = '{name}' AND owner_id = {old_owner}; END
+        ''')
+        if owner:
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS rowcount_{name}_move AFTER UPDATE OF {owner} ON {table}
+                WHEN OLD.{owner} IS NOT NEW.{owner}
+                BEGIN
+                    UPDATE row_counts SET n = n - 1 WHERE name = '{name}' AND owner_id = OLD.{owner};
+                    INSERT INTO row_counts (name, owner_id, n) SELECT '{name}', NEW.{owner}, 1 WHERE NEW.{owner} IS NOT NULL
+                    ON CONFLICT (name, owner_id) DO UPDATE SET n = n + 1;
+                END
+            ''')
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS rowcount_{name}_owner_delete AFTER DELETE ON {owner_table}
+                BEGIN DELETE FROM row_counts WHERE name = '{name}' AND owner_id = OLD.id; END
+            ''')
+
+        if owner:
+            conn.execute(f'''
+                INSERT OR REPLACE INTO row_counts (name, owner_id, n)
+                SELECT '{name}', {owner}, COUNT(*) FROM {table} WHERE {owner} IS NOT NULL GROUP BY {owner}
+            ''')
+        else:
+            conn.execute(f"INSERT OR REPLACE INTO row_counts (name, owner_id, n) SELECT '{name}', 0, COUNT(*) FROM {table}")
+
+    # Keyset pages of takes walk (shot_id, id)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_takes_shot_id ON takes (shot_id, id)")
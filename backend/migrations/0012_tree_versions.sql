@@ -0,0 +1,51 @@
+-- Per-project version of the scene/shot tree, bumped by triggers on every
+-- write to scenes or shots (routes and background jobs alike). tree_cache.py
+-- keys cached storyboard reads and their ETags on it.
+
+CREATE TABLE IF NOT EXISTS tree_versions (
+    project_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS treever_scenes_insert AFTER INSERT ON scenes
+WHEN NEW.project_id IS NOT NULL
+BEGIN
+    INSERT INTO tree_versions (project_id, version) VALUES (NEW.project_id, 1)
+    ON CONFLICT (project_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS treever_scenes_update AFTER UPDATE ON scenes
+BEGIN
+    UPDATE tree_versions SET version = version + 1 WHERE project_id IN (OLD.project_id, NEW.project_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS treever_scenes_delete AFTER DELETE ON scenes
+BEGIN
+    UPDATE tree_versions SET version = version + 1 WHERE project_id = OLD.project_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS treever_shots_insert AFTER INSERT ON shots
+BEGIN
+    INSERT INTO tree_versions (project_id, version)
+    SELECT project_id, 1 FROM scenes WHERE id = NEW.scene_id AND project_id IS NOT NULL
+    ON CONFLICT (project_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS treever_shots_update AFTER UPDATE ON shots
+BEGIN
+    UPDATE tree_versions SET version = version + 1
+    WHERE project_id IN (SELECT project_id FROM scenes WHERE id IN (OLD.scene_id, NEW.scene_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS treever_shots_delete AFTER DELETE ON shots
+BEGIN
+    UPDATE tree_versions SET version = version + 1
+    WHERE project_id = (SELECT project_id FROM scenes WHERE id = OLD.scene_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS treever_projects_delete AFTER DELETE ON projects
+BEGIN
+    DELETE FROM tree_versions WHERE project_id = OLD.id;
+END;
+
+INSERT OR IGNORE INTO tree_versions (project_id, version) SELECT id, 1 FROM projects;
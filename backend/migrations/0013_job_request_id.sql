@@ -0,0 +1,4 @@
+-- Id of the HTTP request that submitted each job (X-Request-ID, see metrics.py),
+-- so its ComfyUI client_id and logs can be traced back to it.
+
+ALTER TABLE jobs ADD COLUMN request_id TEXT;
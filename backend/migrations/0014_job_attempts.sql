@@ -0,0 +1,4 @@
+-- How many times each job has been handed to a worker, so a render whose
+-- backends keep dying is failed after JOB_MAX_ATTEMPTS instead of requeued forever.
+
+ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0;
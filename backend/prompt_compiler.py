@@ -0,0 +1,180 @@
+import re
+from functools import lru_cache
+
+# Prompt assembly for every generator: Flux keyframes (runpod_client), the
+# Director's Wan instructions (director.py) and stitched continuations.
+#
+# The vocabularies below are built once at import. Shot prompts may start
+# with a "[CONTEXT: ...]" block (the scene description the frontend
+# prepends); parse_context() is the one parser for it, bracket-aware, so a
+# context like "[CONTEXT: bar [1987]] ..." no longer splits in the middle.
+# Assembled prompts are memoized: a scene re-renders the same handful of
+# (prompt, gear) combinations over and over.
+
+MEMO_SIZE = 4096
+
+# --- 1. VOCABULARIES ---
+
+CAMERAS = {
+    "Arri Alexa 65": "shot on Arri Alexa 65, large format sensor, 65mm depth of field, high dynamic range, soft highlight roll-off, Arri color science, extremely detailed 8k",
+    "Arri Alexa 35": "shot on Arri Alexa 35, Super 35 format, organic film-like texture, cinematic skin tones, wide dynamic range, Reveal Color Science",
+    "RED V-Raptor XL": "shot on RED V-Raptor XL, 8k VistaVision, crisp digital sharpness, high contrast, vibrant saturated colors, modern commercial look",
+    "Sony Venice 2": "shot on Sony Venice 2, full frame, dual base ISO, clean low light, natural skin tones, smooth highlight rolloff, modern cinematic aesthetic",
+    "Panavision DXL2": "shot on Panavision DXL2, large format, warm cinematic feel, Light Iron color science, rich textures",
+    "IMAX 70mm Film": "shot on IMAX 15/70mm film, massive resolution, shallow depth of field, organic film grain, incredible detail, epic scale",
+    "Kodak Vision3 500T": "shot on Kodak Vision3 500T 5219, tungsten balanced film stock, noticeable grain structure, halation around highlights, rich blacks, nostalgic film look",
+    "Kodak Portra 400": "shot on Kodak Portra 400 film, fine grain, warm skin tones, vibrant natural colors, daylight balanced, soft contrast",
+    "16mm Bolex": "shot on 16mm Bolex camera, heavy film grain, vintage texture, soft focus edges, retro aesthetic, low fidelity charm",
+}
+
+LENSES = {
+    "Panavision C-Series": "Panavision C-Series Anamorphic lens, distinct blue horizontal flares, oval bokeh, barrel distortion, vintage anamorphic character",
+    "Cooke Anamorphic /i": "Cooke Anamorphic /i lens, 'The Cooke Look', warm color rendering, smooth focus falloff, painterly bokeh, pleasing skin tones",
+    "Atlas Orion": "Atlas Orion Anamorphic lens, silver/blue flares, modern anamorphic look, sharp center, character-rich edges",
+    "Cooke S4/i Prime": "Cooke S4/i Prime lens, gentle sharpness, warm contrast, smooth background blur, three-dimensional subject separation",
+    "Arri/Zeiss Master Prime": "Arri/Zeiss Master Prime lens, clinically sharp, high contrast, zero distortion, perfect optical performance, clean modern look",
+    "Angenieux Optimo": "Angenieux Optimo Zoom lens, cinematic warmth, organic sharpness, creamy bokeh, versatile modern cinema look",
+    "Canon K35 Vintage": "Canon K35 Vintage lens (1970s), low contrast, glowing highlights, soft flares, expressive vintage character, slightly warm",
+    "Leica Summilux-C": "Leica Summilux-C lens, natural color reproduction, creamy out-of-focus areas, sharp but gentle, humanistic look",
+    "Petzval 85 Art": "Lomo Petzval 85 Art lens, extreme swirly bokeh, center sharpness, vignetting, dreamlike quality, distinct 19th-century portrait look",
+    "16mm Vintage Look": "vintage 16mm lens, soft corners, chromatic aberration, low contrast, nostalgic feel",
+}
+
+GEAR_PROMPTS = {**CAMERAS, **LENSES}
+
+CAMERA_MOVES = {
+    "Push In": "Slow dolly in. Forward tracking shot. The camera moves physically closer with a steady, cinematic pace.",
+    "Pull Out": "Slow dolly out. Backward tracking shot. The camera retreats smoothly, revealing the environment.",
+    "Static": "Tripod shot. The camera is completely locked off and stable.",
+    "Handheld": "Handheld documentary style. Subtle organic camera shake and breathing motion.",
+    "Pan Right": "Camera truck right. A lateral tracking shot moving parallel to the subject. Smooth, sliding motion.",
+    "Pan Left": "Camera truck left. A lateral tracking shot sliding to the left. The background passes by smoothly.",
+    "Orbit": "Slow arc shot. The camera gently circles around the subject. A subtle orbital movement showcasing depth.",
+    "Tilt Up": "Camera tilts up. A slow vertical scan starting low and revealing the subject upwards.",
+    "Tilt Down": "Camera tilts down. A slow vertical scan starting high and lowering the gaze.",
+    "Crane Up": "Boom up. The camera physically rises straight up, establishing a higher vantage point.",
+    "Crane Down": "Boom down. The camera physically lowers, settling into the scene.",
+    "Zoom In": "Smooth optical zoom in. The camera body stays still while the lens magnifies the subject. Background compression increases.",
+    "Dutch Angle": "Dutch angle. The camera is tilted on its roll axis, creating a diagonal composition. Uneasy tension.",
+    "Low Angle": "Low angle shot. The camera looks up at the subject from a low vantage point, making them appear powerful.",
+    "Drone Overhead": "Top-down God's Eye view. The camera looks straight down. Geometric composition.",
+    "Drone Orbit": "Large-scale drone orbit. The camera circles the subject from a high angle, capturing the vast environment.",
+    "Drone Fly Through": "FPV Drone flight. The camera flies aggressively through the space with high speed and fluidity.",
+}
+
+# --- 2. CONTEXT / ACTION ---
+
+_CONTEXT_OPEN = re.compile(r"\[\s*CONTEXT\s*:", re.IGNORECASE)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def parse_context(prompt: str) -> tuple[str, str]:
+    """
+    Split a shot prompt into (scene context, shot action). Prompts without a
+    context block return ("", prompt). Nested brackets inside the context are
+    kept; an unterminated block is treated as plain action text.
+
+    >>> parse_context("[CONTEXT: dark alley] Man walks")
+    ('dark alley', 'Man walks')
+    >>> parse_context("[context: bar [1987], neon]  She turns")
+    ('bar [1987], neon', 'She turns')
+    >>> parse_context("Man walks")
+    ('', 'Man walks')
+    >>> parse_context("[CONTEXT: never closed Man walks")
+    ('', '[CONTEXT: never closed Man walks')
+    """
+    match = _CONTEXT_OPEN.search(prompt or "")
+    if not match:
+        return "", (prompt or "").strip()
+    depth = 1
+    for i in range(match.end(), len(prompt)):
+        if prompt[i] == "[":
+            depth += 1
+        elif prompt[i] == "]":
+            depth -= 1
+            if depth == 0:
+                context = prompt[match.end():i].strip()
+                action = f"{prompt[:match.start()].strip()} {prompt[i + 1:].strip()}".strip()
+                return context, action
+    return "", prompt.strip()
+
+
+def format_context(context: str, action: str = "") -> str:
+    return f"[CONTEXT: {context}] {action}".rstrip() if context else action
+
+
+def continuation_prompt(source_prompt: str) -> str:
+    """Starting prompt for a shot stitched onto the end of `source_prompt`'s clip."""
+    if not source_prompt:
+        return "Continuation..."
+    context, _ = parse_context(source_prompt)
+    if context:
+        return format_context(context, "(Continue action here...)")
+    return f"{source_prompt} (Continued)"
+
+
+# --- 3. ASSEMBLY ---
+
+@lru_cache(maxsize=MEMO_SIZE)
+def gear_text(camera: str, lens: str) -> str:
+    return ", ".join(text for text in (GEAR_PROMPTS.get(camera, ""), GEAR_PROMPTS.get(lens, "")) if text)
+
+
+def motion_text(camera_move: str) -> str:
+    return CAMERA_MOVES.get(camera_move, camera_move)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def image_prompt(prompt: str, camera: str, lens: str, focal_length: str, chroma: bool) -> str:
+    """Full Flux prompt for a keyframe / asset render."""
+    full_prompt = f"{prompt}, {gear_text(camera, lens)}, {focal_length} focal length"
+    if chroma:
+        full_prompt += ", green screen background, chroma key, flat lighting, evenly lit"
+    else:
+        full_prompt += ", cinematic lighting, photorealistic, 8k, detailed texture"
+    return full_prompt
+
+
+def image_prompts(prompts: list[str], camera: str, lens: str, focal_length: str, chroma: bool) -> list[str]:
+    """image_prompt() for a whole scene; repeated shot prompts are assembled once."""
+    return [image_prompt(prompt, camera, lens, focal_length, chroma) for prompt in prompts]
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def video_instruction(user_prompt: str, style: str = "Cinematic", camera_move: str = "Push In") -> tuple[str, str]:
+    """
+    Translates commands into Wan 2.2 prompts, separating Context (World) from Action (Movement).
+    Returns (instruction for Gemini, fallback prompt used when Gemini is unavailable).
+    """
+    scene_context, shot_action = parse_context(user_prompt)
+    motion_desc = motion_text(camera_move)
+
+    # We feed the AI two separate pieces of data.
+    context_instruction = ""
+    if scene_context:
+        context_instruction = (
+            f"SCENE CONTEXT (THE WORLD - DO NOT CHANGE): {scene_context}\n"
+            f"Constraint: You MUST maintain the lighting, weather, and atmosphere described in the CONTEXT.\n"
+        )
+
+    system_instruction = (
+        f"You are a Prompt Engineer for Wan 2.2 Video AI. \n"
+        f"{context_instruction}"
+        f"SHOT ACTION (THE SUBJECT/MOVEMENT): {shot_action}\n"
+        f"Style: {style}\n"
+        f"Required Camera Motion: {motion_desc}\n\n"
+        f"TASK: Write a single, vivid paragraph (40-60 words). \n"
+        f"CRITICAL RULES:\n"
+        f"1. CONTINUITY: If a Context is provided, keep it strictly consistent. Only animate the Action.\n"
+        f"2. MOVEMENT: You MUST include the camera description '{motion_desc}' verbatim.\n"
+        f"3. SPEED: Describe movement as 'slow', 'measured', or 'cinematic'. Avoid 'rushing'.\n"
+        f"4. NO PREAMBLE. Return ONLY the final prompt."
+    )
+
+    fallback = f"Continuous single shot. {motion_desc} {user_prompt} in {style} style."
+    return system_instruction, fallback
+
+
+def video_instructions(requests: list[tuple[str, str, str]]) -> list[tuple[str, str]]:
+    """video_instruction() for every (prompt, style, camera_move) of a batch."""
+    return [video_instruction(*request) for request in requests]
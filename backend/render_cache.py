@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import time
+
+from blobstore import blob_store
+from db import get_db_connection
+
+# Opt-in render cache: skip the GPU when the exact same graph was rendered before.
+#
+# The key is the SHA-256 of the fully injected ComfyUI graph (prompt, size,
+# seed, input image name...), serialized canonically. Renders only hit when
+# the seed matches too, so callers opting in without a seed get one derived
+# from the graph itself: same request, same seed, same key.
+#
+# Cache rows point at blobs but don't count as references. Outputs no asset
+# or take uses any more stay cached until the unreferenced total passes
+# RENDER_CACHE_MAX_BYTES; evict() then drops the least recently hit ones and
+# lets blob_store.collect() delete the files.
+
+MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+
+def graph_key(graph: dict) -> str:
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def derive_seed(graph: dict, limit: int) -> int:
+    """Deterministic seed in [1, limit] for a graph (computed before the seed is injected)."""
+    return int(graph_key(graph)[:16], 16) % limit + 1
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+    def lookup(self, key: str) -> dict | None:
+        """{"sha256", "url", "path", "seed"} of a still-present cached output, else None."""
+        conn = get_db_connection()
+        row = conn.execute('''
+            SELECT rc.sha256, rc.seed, b.url, b.path FROM render_cache rc
+            JOIN blobs b ON b.sha256 = rc.sha256
+            WHERE rc.key = ?
+        ''', (key,)).fetchone()
+        path = blob_store.root / row["path"] if row else None
+        if row is None or not path.exists():
+            conn.execute("DELETE FROM render_cache WHERE key = ?", (key,))
+            conn.commit()
+            conn.close()
+            self.stats["misses"] += 1
+            return None
+        now = time.time()
+        conn.execute("UPDATE render_cache SET last_hit = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        # Keep the blob out of collect()'s grace window while the caller re-references it
+        conn.execute("UPDATE blobs SET last_seen = ? WHERE sha256 = ?", (now, row["sha256"]))
+        conn.commit()
+        conn.close()
+        self.stats["hits"] += 1
+        return {"sha256": row["sha256"], "url": row["url"], "path": str(path), "seed": row["seed"]}
+
+    def store(self, key: str, sha256: str, kind: str, seed: int | None):
+        now = time.time()
+        conn = get_db_connection()
+        conn.execute(
+            "INSERT INTO render_cache (key, sha256, kind, seed, created_at, last_hit) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET sha256 = excluded.sha256, seed = excluded.seed, last_hit = excluded.last_hit",
+            (key, sha256, kind, seed, now, now),
+        )
+        conn.commit()
+        conn.close()
+        self.stats["stores"] += 1
+        self.evict()
+
+    def unreferenced_bytes(self) -> int:
+        conn = get_db_connection()
+        total = conn.execute('''
+            SELECT COALESCE(SUM(size), 0) FROM blobs
+            WHERE refcount <= 0 AND sha256 IN (SELECT sha256 FROM render_cache)
+        ''').fetchone()[0]
+        conn.close()
+        return total
+
+    def evict(self, max_bytes: int | None = None) -> dict:
+        """Drop least recently hit unreferenced outputs until they fit in max_bytes."""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        conn = get_db_connection()
+        rows = conn.execute('''
+            SELECT b.sha256, b.size, MAX(rc.last_hit) AS last_hit FROM render_cache rc
+            JOIN blobs b ON b.sha256 = rc.sha256
+            WHERE b.refcount <= 0
+            GROUP BY b.sha256
+            ORDER BY last_hit DESC
+        ''').fetchall()
+        kept, doomed = 0, []
+        for row in rows:
+            if kept + (row["size"] or 0) <= budget:
+                kept += row["size"] or 0
+            else:
+                doomed.append(row["sha256"])
+        if doomed:
+            conn.executemany("DELETE FROM render_cache WHERE sha256 = ?", [(sha,) for sha in doomed])
+            conn.commit()
+        conn.close()
+        if not doomed:
+            return {"evicted": 0, "bytes": 0}
+        self.stats["evicted"] += len(doomed)
+        print(f"🗃️ Render cache over {budget / 1e6:.0f} MB, evicting {len(doomed)} unreferenced output(s)")
+        return blob_store.collect()
+
+    def metrics(self) -> dict:
+        conn = get_db_connection()
+        entries = conn.execute("SELECT COUNT(*) FROM render_cache").fetchone()[0]
+        conn.close()
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": entries,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "unreferenced_bytes": self.unreferenced_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+
+render_cache = RenderCache()
@@ -1,172 +1,201 @@
+import asyncio
 import json
 import random
-import time
 import uuid
-import urllib.request
-import urllib.parse
 import os
+import time
 import argparse
+from pathlib import Path
+
+from comfy_client import ComfyClient, ComfyError
+from metrics import stage_seconds, timed_stage
+from workflows import workflows, WorkflowError
+from prompt_compiler import image_prompt, image_prompts
+from render_cache import render_cache, graph_key, derive_seed
 
 # CONFIG
-OUTPUT_DIR = "generated"
-
-# HEADERS
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-}
-
-# --- 1. THE GEAR TRANSLATOR ---
-GEAR_PROMPTS = {
-    "Arri Alexa 65": "shot on Arri Alexa 65, large format sensor, 65mm depth of field, high dynamic range, soft highlight roll-off, Arri color science, extremely detailed 8k",
-    "Arri Alexa 35": "shot on Arri Alexa 35, Super 35 format, organic film-like texture, cinematic skin tones, wide dynamic range, Reveal Color Science",
-    "RED V-Raptor XL": "shot on RED V-Raptor XL, 8k VistaVision, crisp digital sharpness, high contrast, vibrant saturated colors, modern commercial look",
-    "Sony Venice 2": "shot on Sony Venice 2, full frame, dual base ISO, clean low light, natural skin tones, smooth highlight rolloff, modern cinematic aesthetic",
-    "Panavision DXL2": "shot on Panavision DXL2, large format, warm cinematic feel, Light Iron color science, rich textures",
-    "IMAX 70mm Film": "shot on IMAX 15/70mm film, massive resolution, shallow depth of field, organic film grain, incredible detail, epic scale",
-    "Kodak Vision3 500T": "shot on Kodak Vision3 500T 5219, tungsten balanced film stock, noticeable grain structure, halation around highlights, rich blacks, nostalgic film look",
-    "Kodak Portra 400": "shot on Kodak Portra 400 film, fine grain, warm skin tones, vibrant natural colors, daylight balanced, soft contrast",
-    "16mm Bolex": "shot on 16mm Bolex camera, heavy film grain, vintage texture, soft focus edges, retro aesthetic, low fidelity charm",
-    
-    # --- LENSES ---
-    "Panavision C-Series": "Panavision C-Series Anamorphic lens, distinct blue horizontal flares, oval bokeh, barrel distortion, vintage anamorphic character",
-    "Cooke Anamorphic /i": "Cooke Anamorphic /i lens, 'The Cooke Look', warm color rendering, smooth focus falloff, painterly bokeh, pleasing skin tones",
-    "Atlas Orion": "Atlas Orion Anamorphic lens, silver/blue flares, modern anamorphic look, sharp center, character-rich edges",
-    "Cooke S4/i Prime": "Cooke S4/i Prime lens, gentle sharpness, warm contrast, smooth background blur, three-dimensional subject separation",
-    "Arri/Zeiss Master Prime": "Arri/Zeiss Master Prime lens, clinically sharp, high contrast, zero distortion, perfect optical performance, clean modern look",
-    "Angenieux Optimo": "Angenieux Optimo Zoom lens, cinematic warmth, organic sharpness, creamy bokeh, versatile modern cinema look",
-    "Canon K35 Vintage": "Canon K35 Vintage lens (1970s), low contrast, glowing highlights, soft flares, expressive vintage character, slightly warm",
-    "Leica Summilux-C": "Leica Summilux-C lens, natural color reproduction, creamy out-of-focus areas, sharp but gentle, humanistic look",
-    "Petzval 85 Art": "Lomo Petzval 85 Art lens, extreme swirly bokeh, center sharpness, vignetting, dreamlike quality, distinct 19th-century portrait look",
-    "16mm Vintage Look": "vintage 16mm lens, soft corners, chromatic aberration, low contrast, nostalgic feel"
-}
-
-def get_gear_prompt(camera_name, lens_name):
-    cam_text = GEAR_PROMPTS.get(camera_name, "")
-    lens_text = GEAR_PROMPTS.get(lens_name, "")
-    combined = []
-    if cam_text: combined.append(cam_text)
-    if lens_text: combined.append(lens_text)
-    return ", ".join(combined)
-
-# --- 2. API FUNCTIONS (Dynamic URL) ---
-
-def queue_prompt(prompt_workflow, base_url):
-    p = {"prompt": prompt_workflow, "client_id": str(uuid.uuid4())}
-    data = json.dumps(p).encode('utf-8')
-    req = urllib.request.Request(f"{base_url}/prompt", data=data, headers=HEADERS)
-    return json.loads(urllib.request.urlopen(req).read())
-
-def get_history(prompt_id, base_url):
-    req = urllib.request.Request(f"{base_url}/history/{prompt_id}", headers=HEADERS)
-    try:
-        return json.loads(urllib.request.urlopen(req).read())
-    except:
-        return {}
+OUTPUT_DIR = str(Path(__file__).resolve().parent / "generated")
+WORKFLOW_NAME = "flux_dev_t5fp16.json"
+MAX_BATCH = 4    # images per latent batch when several shots share a prompt
+SEED_LIMIT = 1000000000000
 
-def download_file(url, output_path):
-    """Helper to download the image from ComfyUI to local disk"""
-    try:
-        req = urllib.request.Request(url, headers=HEADERS)
-        with urllib.request.urlopen(req) as response:
-            data = response.read()
-            with open(output_path, "wb") as f:
-                f.write(data)
-        return True
-    except Exception as e:
-        print(f"Error downloading file: {e}")
-        return False
+# Gear / lens vocabularies and prompt assembly live in prompt_compiler.py
 
-# --- 3. MAIN EXECUTION ---
+# --- MAIN EXECUTION ---
 
-def generate_cinematic_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, base_url="http://127.0.0.1:8188"):
+def frame_size(aspect_ratio):
+    if aspect_ratio == "16:9":
+        return 1344, 768
+    elif aspect_ratio == "2.39:1":
+        return 1536, 640
+    elif aspect_ratio == "4:3":
+        return 1152, 896
+    return 1024, 1024
+
+def build_workflow(full_prompt, aspect_ratio, batch_size=1, seed=None):
+    """Fresh Flux graph for one prompt, random seed unless given (raises FileNotFoundError / WorkflowError)."""
+    workflow = workflows.get(WORKFLOW_NAME)
+    width, height = frame_size(aspect_ratio)
+    # Nodes found by class_type, not hard-coded ids
+    workflow.set_prompt(full_prompt)
+    workflow.set_seed(random.randint(1, SEED_LIMIT) if seed is None else seed)
+    workflow.set_size(width, height)
+    workflow.set_filename_prefix("studio_render")
+    if batch_size > 1:
+        workflow.set_batch_size(batch_size)
+    return workflow
+
+def prepare_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, seed=None, cache=False):
+    """
+    (workflow, full_prompt, seed, cache_key) for one render. Without a seed it is
+    random, or derived from the rest of the graph when opting into the cache,
+    so an identical request maps to an identical graph.
+    """
+    full_prompt = image_prompt(prompt, camera, lens, focal_length, chroma)
+    if seed is None and not cache:
+        seed = random.randint(1, SEED_LIMIT)
+    workflow = build_workflow(full_prompt, aspect_ratio, seed=0 if seed is None else seed)
+    if seed is None:
+        seed = derive_seed(workflow.graph, SEED_LIMIT)
+        workflow.set_seed(seed)
+    return workflow, full_prompt, seed, graph_key(workflow.graph) if cache else None
+
+def cached_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, seed=None):
+    """Earlier output of this exact render (same shape as a generate_cinematic_image result), or None."""
+    try:
+        _, full_prompt, seed, cache_key = prepare_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, seed, cache=True)
+    except (FileNotFoundError, WorkflowError):
+        return None
+    hit = render_cache.lookup(cache_key)
+    if not hit:
+        return None
+    print(f"♻️ Render cache hit for: {full_prompt[:50]}...")
+    return {"status": "success", "cached": True, "image_url": hit["url"], "path": hit["path"],
+            "sha256": hit["sha256"], "seed": seed, "cache_key": cache_key}
+
+async def generate_cinematic_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, base_url="http://127.0.0.1:8188",
+                                   seed=None, cache=False, on_event=None):
+    """
+    Render one image. With cache=True an identical earlier render is returned without touching the GPU.
+    on_event receives ComfyUI queue/step progress (see ComfyClient).
+    """
+    started = time.perf_counter()
     # Ensure output directory exists
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-    # 1. Load Workflow
+    # 1. Build the workflow (cached template, fresh copy per render)
+    if cache:
+        hit = cached_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, seed)
+        if hit:
+            return hit
     try:
-        with open("flux_dev_t5fp16.json", "r") as f:
-            workflow = json.load(f)
+        with timed_stage("generate_cinematic_image", "build"):
+            workflow, full_prompt, seed, cache_key = prepare_image(prompt, aspect_ratio, camera, lens, focal_length, chroma, seed, cache)
     except FileNotFoundError:
-        print("Error: flux_dev_t5fp16.json not found.")
+        print(f"Error: {WORKFLOW_NAME} not found.")
         return {"error": "Workflow file not found"}
-
-    # 2. Key Nodes (MATCHING YOUR JSON IDs)
-    clip_text_node_id = "43"   # CLIP Text Encode
-    seed_node_id = "45"        # RandomNoise
-    image_size_node_id = "44"  # EmptySD3LatentImage
-    save_node_id = "39"        # Save Image
-
-    # 3. Construct Prompt
-    tech_specs = get_gear_prompt(camera, lens)
-    full_prompt = f"{prompt}, {tech_specs}, {focal_length} focal length"
-    if chroma:
-        full_prompt += ", green screen background, chroma key, flat lighting, evenly lit"
-    else:
-        full_prompt += ", cinematic lighting, photorealistic, 8k, detailed texture"
-
-    # 4. Inject
-    workflow[clip_text_node_id]["inputs"]["text"] = full_prompt
-
-    if seed_node_id in workflow:
-        seed = random.randint(1, 1000000000000)
-        workflow[seed_node_id]["inputs"]["noise_seed"] = seed
-
-    # Aspect Ratio
-    width, height = 1024, 1024
-    if aspect_ratio == "16:9":
-        width, height = 1344, 768
-    elif aspect_ratio == "2.39:1":
-        width, height = 1536, 640 
-    elif aspect_ratio == "4:3":
-        width, height = 1152, 896
-
-    workflow[image_size_node_id]["inputs"]["width"] = width
-    workflow[image_size_node_id]["inputs"]["height"] = height
-
-    if save_node_id in workflow:
-        workflow[save_node_id]["inputs"]["filename_prefix"] = "studio_render"
+    except WorkflowError as e:
+        return {"error": str(e)}
 
     print(f"🚀 Sending Prompt to {base_url}: {full_prompt[:50]}...")
     
-    # 5. Queue
+    # 2. Queue + wait (websocket completion, polling fallback)
     try:
-        response = queue_prompt(workflow, base_url)
+        async with ComfyClient(base_url, on_event=on_event, operation="generate_cinematic_image") as comfy:
+            output = await comfy.run(workflow.graph, output_key="images")
+            image_info = output["images"][0]
+
+            # Generate Local Filename
+            local_filename = f"flux_{uuid.uuid4().hex[:8]}.png"
+            local_path = os.path.join(OUTPUT_DIR, local_filename)
+
+            print(f"⬇️ Downloading to {local_path}...")
+            sha256 = await comfy.download(image_info, local_path, checksum=True)
+    except ComfyError as e:
+        return {"error": str(e)}
     except Exception as e:
         return {"error": f"Connection failed: {e}"}
 
-    prompt_id = response['prompt_id']
-    
-    # 6. Poll
-    while True:
-        history = get_history(prompt_id, base_url)
-        if prompt_id in history:
-            outputs = history[prompt_id]['outputs']
-            for node_id in outputs:
-                node_output = outputs[node_id]
-                if 'images' in node_output:
-                    image_info = node_output['images'][0]
-                    
-                    # Construct Remote URL
-                    remote_url = f"{base_url}/view?filename={image_info['filename']}&subfolder={image_info['subfolder']}&type={image_info['type']}"
-                    
-                    # Generate Local Filename
-                    local_filename = f"flux_{uuid.uuid4().hex[:8]}.png"
-                    local_path = os.path.join(OUTPUT_DIR, local_filename)
-                    
-                    print(f"⬇️ Downloading to {local_path}...")
-                    
-                    # Download and Save
-                    if download_file(remote_url, local_path):
-                        # Return the LOCAL web path
-                        return {"status": "success", "image_url": f"/generated/{local_filename}", "asset_id": prompt_id}
-                    else:
-                        return {"error": "Failed to save image locally"}
-                        
-            break
-        time.sleep(1)
-        
-    return {"error": "Timeout"}
+    # Return the LOCAL web path
+    stage_seconds.observe(time.perf_counter() - started, operation="generate_cinematic_image", stage="total")
+    return {"status": "success", "image_url": f"/generated/{local_filename}", "path": local_path, "sha256": sha256,
+            "seed": seed, "cache_key": cache_key}
+
+async def generate_cinematic_batch(prompts, aspect_ratio, camera, lens, focal_length, chroma,
+                                   base_url="http://127.0.0.1:8188", on_result=None, max_batch=MAX_BATCH, on_event=None):
+    """
+    One image per prompt, pipelined: every graph is queued before the first
+    finishes so the GPU never waits on us, and shots with identical prompts
+    share a latent batch (up to max_batch) when the workflow has one.
+    Outputs are downloaded while later prompts render. Returns a list aligned
+    with `prompts` of {"path", "sha256"} or {"error"}; on_result(i, result)
+    fires as each one lands; on_event gets ComfyUI's queue/step progress.
+    """
+    started = time.perf_counter()
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    results = [None] * len(prompts)
+
+    # Identical prompts -> one prompt with batch_size n
+    by_prompt = {}
+    for i, full_prompt in enumerate(image_prompts(prompts, camera, lens, focal_length, chroma)):
+        by_prompt.setdefault(full_prompt, []).append(i)
+    try:
+        build_started = time.perf_counter()
+        batchable = max_batch > 1 and workflows.get(WORKFLOW_NAME).supports_batch()
+        groups, graphs = [], []
+        for full_prompt, indices in by_prompt.items():
+            step = max_batch if batchable else 1
+            for start in range(0, len(indices), step):
+                chunk = indices[start:start + step]
+                groups.append(chunk)
+                graphs.append(build_workflow(full_prompt, aspect_ratio, len(chunk)).graph)
+        stage_seconds.observe(time.perf_counter() - build_started, operation="generate_cinematic_batch", stage="build")
+    except FileNotFoundError:
+        return [{"error": "Workflow file not found"}] * len(prompts)
+    except WorkflowError as e:
+        return [{"error": str(e)}] * len(prompts)
+
+    def finish(i, result):
+        results[i] = result
+        if on_result is not None:
+            on_result(i, result)
+
+    async def fetch(comfy, i, image_info):
+        local_path = os.path.join(OUTPUT_DIR, f"flux_{uuid.uuid4().hex[:8]}.png")
+        try:
+            sha256 = await comfy.download(image_info, local_path, checksum=True)
+            finish(i, {"path": local_path, "sha256": sha256})
+        except ComfyError as e:
+            finish(i, {"error": str(e)})
+        except Exception as e:
+            finish(i, {"error": f"Download failed: {e}"})
+
+    print(f"🚀 Sending {len(graphs)} prompt(s) for {len(prompts)} image(s) to {base_url}")
+    downloads = []
+    try:
+        async with ComfyClient(base_url, on_event=on_event, operation="generate_cinematic_batch") as comfy:
+            try:
+                async for g, output, error in comfy.run_many(graphs, output_key="images"):
+                    images = (output or {}).get("images") or []
+                    for n, i in enumerate(groups[g]):
+                        if n < len(images):
+                            downloads.append(asyncio.create_task(fetch(comfy, i, images[n])))
+                        else:
+                            finish(i, {"error": error or "ComfyUI returned fewer images than requested"})
+            finally:
+                await asyncio.gather(*downloads)
+    except ComfyError as e:
+        error = str(e)
+    except Exception as e:
+        error = f"Connection failed: {e}"
+    else:
+        error = "No result"
+    for i, result in enumerate(results):
+        if result is None:
+            finish(i, {"error": error})
+    stage_seconds.observe(time.perf_counter() - started, operation="generate_cinematic_batch", stage="total")
+    return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -178,5 +207,5 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     
-    result = generate_cinematic_image(args.prompt, args.ratio, args.camera, args.lens, "50mm", False, args.url)
+    result = asyncio.run(generate_cinematic_image(args.prompt, args.ratio, args.camera, args.lens, "50mm", False, args.url))
     print(json.dumps(result))
\ No newline at end of file
@@ -0,0 +1,247 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Response models for the API.
+#
+# Every JSON route declares one of these as its response_model. FastAPI then
+# checks the returned dicts (built straight from SQLite rows) against the model
+# in pydantic-core and hands plain JSON types to JSONBytesResponse, instead of
+# walking the result with jsonable_encoder; orjson writes the bytes. Untyped
+# routes still take the slow generic path, so new routes should declare one.
+# It also gives /docs a real schema for the frontend types in api.ts.
+#
+# Row models mirror their tables. Columns other than id default to None: the
+# list routes accept ?fields= and are declared with response_model_exclude_unset,
+# so a projected row comes back with just the fields asked for.
+
+
+# --- 1. ROWS ---
+
+class Project(BaseModel):
+    id: int
+    name: str | None = None
+    description: str | None = None
+    aspect_ratio: str | None = None
+    created_at: str | None = None
+
+
+class Character(BaseModel):
+    id: int
+    name: str | None = None
+    description: str | None = None
+    face_path: str | None = None
+    created_at: str | None = None
+    voice_id: str | None = None
+    face_sha256: str | None = None
+    face_url: str | None = None             # create response only; also served at /assets/faces/<face_sha256>.<ext>
+    thumbnail_url: str | None = None
+
+
+class Asset(BaseModel):
+    id: int
+    project_id: int | None = None
+    type: str | None = None
+    name: str | None = None
+    prompt: str | None = None
+    image_path: str | None = None
+    created_at: str | None = None
+    sha256: str | None = None
+    seed: int | None = None
+    thumbnail_url: str | None = None
+
+
+class Take(BaseModel):
+    id: int
+    shot_id: int | None = None
+    video_url: str | None = None
+    prompt: str | None = None
+    created_at: str | None = None
+    sha256: str | None = None
+    seed: int | None = None
+    thumbnail_url: str | None = None
+
+
+class Shot(BaseModel):
+    id: int
+    scene_id: int | None = None
+    prompt: str | None = None
+    reference_asset_id: int | None = None
+    status: str | None = None
+    keyframe_url: str | None = None
+    video_url: str | None = None
+    order_index: int | None = None
+    keyframe_sha256: str | None = None
+    video_sha256: str | None = None
+    thumbnail_url: str | None = None
+
+
+class Scene(BaseModel):
+    id: int
+    project_id: int | None = None
+    name: str | None = None
+    description: str | None = None
+    order_index: int | None = None
+    render_key: str | None = None
+
+
+class SceneWithShots(Scene):
+    shots: list[Shot] = []
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    backend: str | None = None
+    pinned_backend: str | None = None
+    project_id: int | None = None
+    shot_id: int | None = None
+    payload: dict[str, Any] = {}
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    created_at: str | None = None
+    started_at: str | None = None
+    finished_at: str | None = None
+    progress: float | None = None
+    attempts: int = 0                       # times handed to a worker (see jobs.MAX_ATTEMPTS)
+    request_id: str | None = None           # X-Request-ID of the submitting request
+    live: dict[str, Any] | None = None      # ComfyUI stage/step/queue position while running
+
+
+class Backend(BaseModel):
+    name: str
+    url: str
+    max_concurrency: int
+    persistent: bool
+    healthy: bool
+    queue_depth: int
+    in_flight: int
+    failures: int
+    last_checked: float | None = None
+    last_error: str | None = None
+    load: int
+
+
+# --- 2. LISTS AND TREES ---
+
+class ProjectList(BaseModel):
+    projects: list[Project]
+    next_cursor: int | None = None      # pass back as ?cursor= for the next page; None on the last one
+    total: int
+
+
+class CharacterList(BaseModel):
+    characters: list[Character]
+    next_cursor: int | None = None
+    total: int
+
+
+class AssetList(BaseModel):
+    assets: list[Asset]
+    next_cursor: int | None = None
+    total: int
+
+
+class TakeList(BaseModel):
+    takes: list[Take]
+    next_cursor: int | None = None
+    total: int
+
+
+class SceneTree(BaseModel):
+    scenes: list[SceneWithShots]
+
+
+class SceneDetail(BaseModel):
+    scene: Scene
+    shots: list[Shot]
+
+
+class ShotBatchCreated(SceneDetail):
+    created: list[int]
+
+
+class BackendList(BaseModel):
+    backends: list[Backend]
+
+
+class PlaylistItem(BaseModel):
+    id: int
+    video_url: str | None = None
+    prompt: str | None = None
+
+
+class Playlist(BaseModel):
+    playlist: list[PlaylistItem]
+    assembled_url: str | None = None
+
+
+class EnhancedShot(BaseModel):
+    shot_id: int
+    prompt: str | None = None
+    enhanced_prompt: str
+
+
+# --- 3. ACTION RESULTS ---
+# Routes answering {"success": False, "error": ...} on failure use
+# response_model_exclude_unset, so each reply keeps only the keys it set.
+
+class Message(BaseModel):
+    message: str
+
+
+class Success(BaseModel):
+    success: bool = True
+    message: str | None = None
+    error: str | None = None
+
+
+class ProjectCreated(BaseModel):
+    project_id: int
+    message: str
+
+
+class ShotCreated(BaseModel):
+    id: int
+    status: str
+
+
+class CharacterCreated(Success):
+    character: Character | None = None
+
+
+class JobTicket(Success):
+    """A queued render (poll /jobs/{job_id}), or its result right away when job_id is None."""
+    job_id: int | None = None
+    status: str | None = None
+    shot_ids: list[int] | None = None
+    key: str | None = None
+    video_url: str | None = None
+    image_url: str | None = None
+    asset_id: int | None = None
+    seed: int | None = None
+    cached: bool | None = None
+
+
+class Enhanced(Success):
+    enhanced_prompt: str | None = None
+
+
+class EnhancedBatch(Success):
+    shots: list[EnhancedShot] | None = None
+
+
+class Stitched(Success):
+    new_shot_id: int | None = None
+
+
+# --- 4. RESPONSE CLASS ---
+
+class JSONBytesResponse(JSONResponse):
+    """The app's default response class: orjson instead of json.dumps."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,17 @@
+"""Shared test setup: the backend modules on sys.path and a throwaway, fully migrated studio.db."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Before any backend module is imported: db.DB_PATH is read at import time.
+os.environ["STUDIO_DB"] = os.path.join(tempfile.mkdtemp(prefix="studio_test_"), "studio.db")
+
+import db  # noqa: E402
+import migrate  # noqa: E402
+
+db.DB_PATH = os.environ["STUDIO_DB"]
+migrate.apply_pending(db.DB_PATH, verbose=False)
@@ -0,0 +1,57 @@
+"""Scene assembly of clips whose streams don't match (different resolution and frame rate)."""
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+import assembly
+from blobstore import blob_store
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not on PATH")
+
+
+def write_clip(path, width: int, height: int, frames: int, fps: int):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        writer.write(np.full((height, width, 3), (i * 10) % 255, np.uint8))
+    writer.release()
+    return path
+
+
+def video_info(path) -> tuple:
+    cap = cv2.VideoCapture(str(path))
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+@pytest.fixture(autouse=True)
+def temp_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "root", tmp_path / "generated")
+    monkeypatch.setattr(assembly, "SCENE_DIR", tmp_path / "generated" / "scenes")
+
+
+def test_assemble_clips_with_different_resolutions(tmp_path):
+    wide = write_clip(tmp_path / "wide.mp4", 320, 240, 16, 16)
+    tall = write_clip(tmp_path / "tall.mp4", 200, 300, 16, 16)
+    hashes = [blob_store.ingest(wide)["sha256"], blob_store.ingest(tall)["sha256"]]
+
+    result = assembly.assemble(hashes)
+    assert result["method"] in ("reencode", "cv2")
+    assert video_info(result["path"]) == (320, 240, 32)       # first clip's size, every frame of both
+    assert assembly.assemble(hashes)["method"] == "cached"
+
+
+@needs_ffmpeg
+def test_reencode_normalizes_each_clip_before_concat(tmp_path):
+    wide = write_clip(tmp_path / "wide.mp4", 320, 240, 16, 16)
+    tall = write_clip(tmp_path / "tall.mp4", 200, 300, 24, 24)     # 1s at 24fps
+    target = tmp_path / "scene.mp4"
+    first = {"width": 320, "height": 240, "r_frame_rate": "16/1"}
+
+    args = assembly._reencode_args([wide, tall], first)
+    assert args.count("-i") == 2
+    assembly._run_ffmpeg([*args, "-c:v", "libx264", "-preset", "veryfast", str(target)], 2.0, lambda fraction: None)
+    assert video_info(target) == (320, 240, 32)                 # 1s + 1s at the first clip's 16fps
@@ -0,0 +1,185 @@
+"""Backend pool and job dispatch against two fake ComfyUI servers (benchmarks/fake_comfy.py)."""
+import asyncio
+import json
+import socket
+import sys
+
+import pytest
+
+import backends
+import jobs
+from backends import BackendRegistry
+from comfy_client import ComfyClient
+from db import get_db_connection
+from jobs import JobQueue
+
+sys.path.insert(0, str(backends.BASE_DIR / "benchmarks"))
+from fake_comfy import serve  # noqa: E402
+
+WORKFLOW = {"9": {"class_type": "SaveImage", "inputs": {}}}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(autouse=True)
+def fast_probes(monkeypatch):
+    monkeypatch.setattr(backends, "HEALTH_INTERVAL", 0.1)
+    monkeypatch.setattr(backends, "PROBE_TIMEOUT", 0.5)
+    monkeypatch.setattr(jobs, "DISPATCH_RETRY_DELAY", 0.1)
+    yield
+    conn = get_db_connection()
+    conn.execute("DELETE FROM jobs")
+    conn.commit()
+    conn.close()
+
+
+async def start_pool(tmp_path, delays: dict):
+    """One fake server per name in `delays` (seconds per prompt) and a registry of them."""
+    servers, entries = {}, []
+    for name, delay in delays.items():
+        port = free_port()
+        servers[name] = await serve(port, delay=delay, output_bytes=1024)
+        entries.append({"name": name, "url": f"http://127.0.0.1:{port}"})
+    config = tmp_path / "backends.json"
+    config.write_text(json.dumps({"backends": entries}))
+    return servers, BackendRegistry(config)
+
+
+async def stop_pool(servers):
+    for _, runner in servers.values():
+        await runner.cleanup()
+
+
+def render_queue(registry) -> JobQueue:
+    queue = JobQueue(registry)
+
+    @queue.handler("render")
+    async def render(job):
+        async with ComfyClient(job["backend"]) as comfy:
+            await comfy.run(WORKFLOW, timeout=30)
+        return {"backend": job["backend"]}
+
+    return queue
+
+
+async def wait_for(queue: JobQueue, job_id: int, timeout: float = 15) -> dict:
+    async def settle():
+        async for job in queue.subscribe(job_id):
+            if job["status"] in jobs.TERMINAL_STATUSES:
+                return job
+    return await asyncio.wait_for(settle(), timeout)
+
+
+def test_dispatch_goes_to_least_loaded_backend(tmp_path):
+    async def scenario():
+        servers, registry = await start_pool(tmp_path, {"a": 5, "b": 0.05})
+        busy, _ = servers["a"]
+        busy.pending += [(f"other-{i}", None, WORKFLOW) for i in range(2)]   # another client's work
+        queue = render_queue(registry)
+        try:
+            await queue.start()
+            assert [b.queue_depth for b in registry.all()] == [2, 0]
+            job = await wait_for(queue, queue.submit("render", {}))
+            return job, registry
+        finally:
+            await queue.stop()
+            await stop_pool(servers)
+
+    job, registry = asyncio.run(scenario())
+    least_loaded = next(b for b in registry.all() if b.name == "b")
+    assert job["status"] == "complete"
+    assert job["result"]["backend"] == least_loaded.url
+
+
+def test_dead_backend_is_marked_down_and_its_jobs_finish_elsewhere(tmp_path):
+    async def scenario():
+        servers, registry = await start_pool(tmp_path, {"a": 10, "b": 0.05})
+        a, b = registry.all()
+        downed = []
+        registry.on_down(downed.append)
+        queue = render_queue(registry)
+        try:
+            await queue.start()
+            job_id = queue.submit("render", {})
+            while queue.get(job_id)["backend"] != a.url:       # ties go to "a"
+                await asyncio.sleep(0.02)
+            await servers["a"][1].cleanup()                      # "a" stops answering /queue mid-render
+            job = await wait_for(queue, job_id)
+            return job, a, b, downed
+        finally:
+            await queue.stop()
+            await servers["b"][1].cleanup()
+
+    job, a, b, downed = asyncio.run(scenario())
+    assert not a.healthy
+    assert downed == [a]
+    assert job["status"] == "complete"
+    assert job["result"]["backend"] == b.url
+    assert job["attempts"] >= 2
+
+
+def test_requeue_backend_moves_running_jobs(tmp_path):
+    async def scenario():
+        servers, registry = await start_pool(tmp_path, {"a": 10, "b": 0.05})
+        a, b = registry.all()
+        queue = render_queue(registry)
+        try:
+            await queue.start()
+            job_id = queue.submit("render", {})
+            while queue.get(job_id)["backend"] != a.url:
+                await asyncio.sleep(0.02)
+            a.healthy = False                # as a failed probe would leave it
+            queue.requeue_backend(a)
+            return await wait_for(queue, job_id), b
+        finally:
+            await queue.stop()
+            await stop_pool(servers)
+
+    job, b = asyncio.run(scenario())
+    assert job["status"] == "complete"
+    assert job["result"]["backend"] == b.url
+    assert job["attempts"] == 2
+
+
+def test_job_pinned_to_unreachable_server_fails(tmp_path):
+    async def scenario():
+        servers, registry = await start_pool(tmp_path, {"a": 0.05})
+        queue = render_queue(registry)
+        dead_url = f"http://127.0.0.1:{free_port()}"
+        try:
+            await queue.start()
+            return await wait_for(queue, queue.submit("render", {}, backend=dead_url)), dead_url, registry
+        finally:
+            await queue.stop()
+            await stop_pool(servers)
+
+    job, dead_url, registry = asyncio.run(scenario())
+    assert job["status"] == "failed"
+    assert dead_url.split("://")[1] in job["error"]
+    assert job["attempts"] <= jobs.MAX_ATTEMPTS
+    assert [b.name for b in registry.all()] == ["a"]     # no longer probed
+
+
+def test_pinned_server_is_forgotten_after_its_last_job(tmp_path):
+    async def scenario():
+        servers, registry = await start_pool(tmp_path, {"a": 0.05})
+        port = free_port()
+        servers["pinned"] = await serve(port, delay=0.05, output_bytes=1024)
+        pinned_url = f"http://127.0.0.1:{port}/"
+        queue = render_queue(registry)
+        try:
+            await queue.start()
+            job_ids = [queue.submit("render", {}, backend=pinned_url) for _ in range(2)]
+            return [await wait_for(queue, job_id) for job_id in job_ids], registry
+        finally:
+            await queue.stop()
+            await stop_pool(servers)
+
+    finished, registry = asyncio.run(scenario())
+    assert [job["status"] for job in finished] == ["complete", "complete"]
+    assert all(job["result"]["backend"] == job["pinned_backend"].rstrip("/") for job in finished)
+    assert [b.name for b in registry.all()] == ["a"]
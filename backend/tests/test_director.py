@@ -0,0 +1,117 @@
+"""Director against a stubbed local Gemini client (client.aio.models.generate_content); no network, no key."""
+import asyncio
+import time
+import types
+
+import pytest
+from google.genai import errors as genai_errors
+
+from director import Director, MODELS
+from director_cache import director_cache, model_health
+from prompt_compiler import video_instruction
+
+
+class StubModels:
+    """Answers after `latency`; models in `hang` never answer, models in `fail` raise fail[model]."""
+
+    def __init__(self, latency: float = 0.01, hang=(), fail=None):
+        self.latency = latency
+        self.hang = set(hang)
+        self.fail = fail or {}
+        self.calls = []            # (model, started at)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content(self, model, contents):
+        self.calls.append((model, time.monotonic()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if model in self.fail:
+                raise self.fail[model]
+            if model in self.hang:
+                await asyncio.sleep(3600)
+            await asyncio.sleep(self.latency)
+            return types.SimpleNamespace(text=f"{model}: slow dolly in")
+        finally:
+            self.in_flight -= 1
+
+
+def stub_client(**kwargs):
+    models = StubModels(**kwargs)
+    return types.SimpleNamespace(aio=types.SimpleNamespace(models=models)), models
+
+
+def client_error(code: int, status: str) -> genai_errors.ClientError:
+    return genai_errors.ClientError(code, {"error": {"code": code, "message": status.lower(), "status": status}})
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(director_cache, "ttl", 0)       # every call goes upstream
+    monkeypatch.setattr(model_health, "_state", {})
+
+
+def test_identical_concurrent_requests_share_one_upstream_call():
+    client, models = stub_client(latency=0.05)
+    director = Director(client, concurrency=4, rate=0)
+
+    async def run():
+        return await asyncio.gather(*(director.enhance("a detective in the rain", "Noir", "Orbit") for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(models.calls) == 1
+    assert len(set(results)) == 1
+    assert director.stats["coalesced"] == 9
+    assert director.metrics()["in_flight"] == 0
+
+
+def test_call_deadline_falls_through_to_next_model():
+    client, models = stub_client(hang=[MODELS[0]])
+    director = Director(client, timeout=0.2, concurrency=4, rate=0)
+
+    start = time.monotonic()
+    result = asyncio.run(director.enhance("a hanging model", "Noir", "Static"))
+    assert time.monotonic() - start < 1
+    assert result == f"{MODELS[1]}: slow dolly in"
+    assert [model for model, _ in models.calls] == MODELS[:2]
+    assert director.stats["timeouts"] == 1
+    assert MODELS[0] in model_health.order(MODELS)     # a timeout doesn't bench the model
+
+
+def test_enhance_many_stays_within_concurrency_and_rate():
+    client, models = stub_client(latency=0.05)
+    director = Director(client, concurrency=2, rate=20)
+    requests = [(f"beat {i}", "Noir", "Push In") for i in range(8)]
+
+    results = asyncio.run(director.enhance_many(requests))
+    assert len(results) == 8
+    assert results == [f"{MODELS[0]}: slow dolly in"] * 8
+    assert len(models.calls) == 8
+    assert models.max_in_flight <= 2
+    starts = sorted(started for _, started in models.calls)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) >= 1 / 20 - 0.01
+
+
+def test_fallback_when_every_model_fails():
+    fail = {model: RuntimeError("connection reset") for model in MODELS}
+    client, models = stub_client(fail=fail)
+    director = Director(client, concurrency=4, rate=0)
+
+    result = asyncio.run(director.enhance("a quiet street", "Noir", "Static"))
+    assert result == video_instruction("a quiet street", "Noir", "Static")[1]
+    assert len(models.calls) == len(MODELS)
+    assert director.stats["fallbacks"] == 1
+
+
+def test_only_unavailable_models_are_benched():
+    fail = {MODELS[0]: client_error(429, "RESOURCE_EXHAUSTED"), MODELS[1]: client_error(404, "NOT_FOUND")}
+    client, models = stub_client(fail=fail)
+    director = Director(client, concurrency=4, rate=0)
+
+    result = asyncio.run(director.enhance("a rooftop chase", "Noir", "Orbit"))
+    assert result == f"{MODELS[2]}: slow dolly in"
+    order = model_health.order(MODELS)
+    assert MODELS[0] in order                           # rate limited: tried again next time
+    assert MODELS[1] not in order                       # retired: skipped until MODEL_RETRY_AFTER
@@ -0,0 +1,54 @@
+"""parse_context: the bracket-aware [CONTEXT: ...] splitter, and what stitching builds from it."""
+import doctest
+
+import pytest
+
+import prompt_compiler
+from prompt_compiler import continuation_prompt, format_context, parse_context
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("[CONTEXT: dark alley] Man walks", ("dark alley", "Man walks")),
+    ("[context: bar [1987], neon]  She turns", ("bar [1987], neon", "She turns")),
+    ("[CONTEXT: a [b [c]] d] act", ("a [b [c]] d", "act")),
+    ("  [ Context :  rooftop ]  runs ", ("rooftop", "runs")),
+    ("Wide shot. [CONTEXT: alley] walks", ("alley", "Wide shot. walks")),
+])
+def test_nested_brackets(prompt, expected):
+    assert parse_context(prompt) == expected
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("[CONTEXT: never closed Man walks", ("", "[CONTEXT: never closed Man walks")),
+    ("[CONTEXT: a [b] walk", ("", "[CONTEXT: a [b] walk")),               # inner ] closes the inner [ only
+    ("[CONTEXT: rain] walks ] away", ("rain", "walks ] away")),          # stray ] in the action is text
+    ("]] [CONTEXT: x] y", ("x", "]] y")),
+])
+def test_unbalanced_input(prompt, expected):
+    assert parse_context(prompt) == expected
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("[CONTEXT: ] walk", ("", "walk")),
+    ("[CONTEXT:]", ("", "")),
+    ("Man walks", ("", "Man walks")),
+    ("", ("", "")),
+    (None, ("", "")),
+])
+def test_empty_context(prompt, expected):
+    assert parse_context(prompt) == expected
+
+
+def test_format_context_round_trips():
+    for prompt in ("[CONTEXT: bar [1987], neon] She turns", "[CONTEXT: alley]", "Man walks"):
+        assert parse_context(format_context(*parse_context(prompt))) == parse_context(prompt)
+
+
+def test_continuation_keeps_context():
+    assert continuation_prompt("[CONTEXT: bar [1987]] She turns") == "[CONTEXT: bar [1987]] (Continue action here...)"
+    assert continuation_prompt("[CONTEXT: ] She turns") == "[CONTEXT: ] She turns (Continued)"
+    assert continuation_prompt("") == "Continuation..."
+
+
+def test_docstring_examples():
+    assert doctest.testmod(prompt_compiler).failed == 0
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from blobstore import blob_store, is_sha256, PUBLIC_URL
+
+# Derivative images (thumbnails, mp4 poster frames) for the grids.
+#
+# Lazily rendered on first request to /thumbs/{sha256}/{size}.{fmt} and
+# cached at generated/thumbs/<h[0:2]>/<sha256>_<size>.<fmt>. Source and size
+# fully determine the output, so a cached derivative never goes stale and
+# is served as immutable. Decoding/resizing runs in a small process pool so
+# a page of 200 fresh thumbnails doesn't stall the event loop.
+
+THUMB_DIR = blob_store.root / "thumbs"
+SIZES = {"sm": 160, "md": 384, "lg": 768}     # max width in px
+FORMATS = {"webp": [cv2.IMWRITE_WEBP_QUALITY, 80], "jpg": [cv2.IMWRITE_JPEG_QUALITY, 82]}
+VIDEO_EXTS = (".mp4", ".webm", ".mov", ".gif")
+POSTER_POSITION = 0.1                          # poster frame at 10% into the clip
+WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+_pool = None
+_pending = {}
+
+
+def thumbnail_url(sha256: str | None, size: str = "md", fmt: str = "webp") -> str | None:
+    return f"{PUBLIC_URL}/thumbs/{sha256}/{size}.{fmt}" if sha256 else None
+
+
+def cache_relpath(sha256: str, size: str, fmt: str) -> str:
+    return f"{sha256[:2]}/{sha256}_{size}.{fmt}"
+
+
+def render(source: str, target: str, width: int, fmt: str) -> bool:
+    """Runs in a worker process. Writes the derivative atomically; False if the source can't be decoded."""
+    if source.lower().endswith(VIDEO_EXTS):
+        cap = cv2.VideoCapture(source)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total > 1:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(total * POSTER_POSITION))
+        ok, image = cap.read()
+        cap.release()
+        if not ok:
+            return False
+    else:
+        image = cv2.imread(source, cv2.IMREAD_COLOR)
+        if image is None:
+            return False
+
+    height, src_width = image.shape[:2]
+    if src_width > width:
+        image = cv2.resize(image, (width, max(1, round(height * width / src_width))), interpolation=cv2.INTER_AREA)
+
+    tmp = f"{target}.{uuid.uuid4().hex[:8]}.part.{fmt}"
+    if not cv2.imwrite(tmp, image, FORMATS[fmt]):
+        return False
+    os.replace(tmp, target)
+    return True
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKERS)
+    return _pool
+
+
+async def get_thumbnail(sha256: str, size: str, fmt: str) -> Path | None:
+    """Path of the cached derivative, rendering it first if needed. None if unknown/undecodable."""
+    if size not in SIZES or fmt not in FORMATS or not is_sha256(sha256):
+        return None
+    target = THUMB_DIR / cache_relpath(sha256, size, fmt)
+    if target.exists():
+        return target
+
+    # Concurrent requests for the same derivative share one render.
+    key = (sha256, size, fmt)
+    task = _pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_render(sha256, target, size, fmt))
+        _pending[key] = task
+        task.add_done_callback(lambda _: _pending.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _render(sha256: str, target: Path, size: str, fmt: str) -> Path | None:
+    source = await asyncio.to_thread(blob_store.local_path, sha256)
+    if source is None or not source.exists():
+        return None
+    target.parent.mkdir(parents=True, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    ok = await loop.run_in_executor(_executor(), render, str(source), str(target), SIZES[size], fmt)
+    return target if ok else None
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
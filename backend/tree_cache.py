@@ -0,0 +1,81 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from db import get_db_connection
+
+# Read cache for the storyboard trees (GET /projects/{id}/scenes and
+# GET /scenes/{id}).
+#
+# Every write to scenes or shots bumps the project's row in tree_versions
+# (triggers, migrations/0012_tree_versions.sql), whichever route or job made
+# it. A read looks the version up (one primary-key read), answers 304 when
+# the client's ETag already names it, and otherwise serves the JSON encoded
+# the last time that version was built. Stale entries are never consulted, so
+# there is nothing to invalidate by hand; they just age out of the LRU.
+#
+# An entry holds the body per content coding ({None: json, "gzip": ...}), each
+# compressed on first request, so a cached 10k-shot storyboard isn't gzipped
+# again for every client (see compression.py).
+#
+# ETags carry a per-process epoch: a restart (or a swapped database) can't
+# make an old client copy look current.
+
+CAPACITY = int(os.environ.get("TREE_CACHE_SIZE", "256"))
+EPOCH = uuid.uuid4().hex[:8]
+
+
+class TreeCache:
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self._entries = OrderedDict()      # (kind, id) -> (version, {coding: body bytes})
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def project_version(self, project_id: int) -> int:
+        conn = get_db_connection()
+        row = conn.execute("SELECT version FROM tree_versions WHERE project_id = ?", (project_id,)).fetchone()
+        conn.close()
+        return row["version"] if row else 0
+
+    def scene_version(self, scene_id: int) -> int | None:
+        """Version of the project a scene belongs to; None if there's no such scene."""
+        conn = get_db_connection()
+        row = conn.execute('''
+            SELECT COALESCE(v.version, 0) AS version FROM scenes s
+            LEFT JOIN tree_versions v ON v.project_id = s.project_id
+            WHERE s.id = ?
+        ''', (scene_id,)).fetchone()
+        conn.close()
+        return row["version"] if row else None
+
+    def etag(self, kind: str, key: int, version: int) -> str:
+        return f'W/"{kind}-{key}-v{version}-{EPOCH}"'
+
+    def get(self, kind: str, key: int, version: int) -> dict | None:
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None or entry[0] != version:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, kind: str, key: int, version: int, bodies: dict):
+        with self._lock:
+            current = self._entries.get((kind, key))
+            if current is not None and current[0] > version:
+                return      # a newer build got here first
+            self._entries[(kind, key)] = (version, bodies)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "capacity": self.capacity}
+
+
+tree_cache = TreeCache()
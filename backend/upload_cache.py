@@ -0,0 +1,130 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+from backends import backend_registry
+from blobstore import sha256_file
+from db import get_db_connection
+
+# Reference images (keyframes for Wan, character faces) only need to reach a
+# render backend once. Uploads are remembered under (backend, content hash):
+# for a ComfyUI server the name /upload/image returned, for Fal the file URL
+# fal_client.upload_file returned. A character reused across 200 shots is one
+# upload per backend, not 200.
+#
+# Entries live in the uploads table so they survive our own restarts. A
+# ComfyUI server that goes down or comes back may have been wiped, so the
+# registry's on_down/on_up hooks drop everything cached for it. Fal URLs
+# expire on Fal's side; they're re-uploaded after FAL_URL_TTL seconds.
+
+FAL = "fal"
+FAL_URL_TTL = float(os.environ.get("FAL_URL_TTL", str(24 * 3600)))
+
+
+class UploadCache:
+    def __init__(self, registry=backend_registry, fal_ttl: float = FAL_URL_TTL):
+        self.fal_ttl = fal_ttl
+        self._pending = {}              # (backend, sha256) -> Task, so concurrent renders share one upload
+        self._fal_locks = weakref.WeakValueDictionary()    # sha256 -> threading.Lock held during its Fal upload
+        self._fal_locks_guard = threading.Lock()
+        self.stats = {"hits": 0, "uploads": 0, "coalesced": 0, "invalidated": 0}
+        registry.on_down(lambda backend: self.invalidate(backend.url))
+        registry.on_up(lambda backend: self.invalidate(backend.url))
+
+    def _get(self, backend: str, sha256: str, max_age: float | None = None) -> str | None:
+        conn = get_db_connection()
+        row = conn.execute("SELECT remote, uploaded_at FROM uploads WHERE backend = ? AND sha256 = ?", (backend, sha256)).fetchone()
+        conn.close()
+        if row is None or (max_age is not None and time.time() - row["uploaded_at"] > max_age):
+            return None
+        return row["remote"]
+
+    def _put(self, backend: str, sha256: str, remote: str):
+        conn = get_db_connection()
+        conn.execute(
+            "INSERT INTO uploads (backend, sha256, remote, uploaded_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(backend, sha256) DO UPDATE SET remote = excluded.remote, uploaded_at = excluded.uploaded_at",
+            (backend, sha256, remote, time.time()),
+        )
+        conn.commit()
+        conn.close()
+
+    # --- 1. COMFYUI ---
+
+    async def comfy_image(self, comfy, local_path: str, sha256: str | None = None, refresh: bool = False) -> str:
+        """
+        Name of `local_path` in the ComfyUI server's input folder, uploading it
+        only if that server hasn't got it. refresh=True uploads regardless (the
+        server rejected a cached name, e.g. it restarted between health probes).
+        """
+        sha256 = sha256 or await asyncio.to_thread(sha256_file, local_path)
+        key = (comfy.base_url, sha256)
+        remote = None if refresh else self._get(*key)
+        if remote is not None:
+            self.stats["hits"] += 1
+            return remote
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._upload(comfy, local_path, key))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def _upload(self, comfy, local_path: str, key: tuple) -> str:
+        remote = await comfy.upload_image(local_path)
+        self.stats["uploads"] += 1
+        self._put(*key, remote)
+        return remote
+
+    # --- 2. FAL ---
+
+    def fal_url(self, local_path: str, upload) -> str:
+        """
+        Fal file URL for `local_path`; upload(local_path) (fal_client.upload_file)
+        runs only on a miss or once the URL is stale. Callers wanting the same
+        image wait for one upload; different images upload in parallel.
+        """
+        sha256 = sha256_file(local_path)
+        with self._fal_lock(sha256):
+            url = self._get(FAL, sha256, max_age=self.fal_ttl)
+            if url is not None:
+                self.stats["hits"] += 1
+                return url
+            url = upload(local_path)
+            self.stats["uploads"] += 1
+            self._put(FAL, sha256, url)
+            return url
+
+    def _fal_lock(self, sha256: str) -> threading.Lock:
+        # Weak values: a lock lives as long as a caller holds it, so the dict doesn't grow per image.
+        with self._fal_locks_guard:
+            lock = self._fal_locks.get(sha256)
+            if lock is None:
+                lock = self._fal_locks[sha256] = threading.Lock()
+            return lock
+
+    # --- 3. INVALIDATION ---
+
+    def invalidate(self, backend: str) -> int:
+        conn = get_db_connection()
+        removed = conn.execute("DELETE FROM uploads WHERE backend = ?", (backend.rstrip("/"),)).rowcount
+        conn.commit()
+        conn.close()
+        if removed:
+            self.stats["invalidated"] += removed
+            print(f"🧹 Forgot {removed} upload(s) on {backend}; they'll be sent again on next use")
+        return removed
+
+    def metrics(self) -> dict:
+        conn = get_db_connection()
+        rows = conn.execute("SELECT backend, COUNT(*) AS n FROM uploads GROUP BY backend").fetchall()
+        conn.close()
+        return {**self.stats, "entries": {row["backend"]: row["n"] for row in rows}}
+
+
+upload_cache = UploadCache()
@@ -3,16 +3,17 @@ import fal_client
 import uuid
 import requests
 
+from upload_cache import upload_cache
+
 # 🔑 SETUP: Ensure your key is set
 os.environ["FAL_KEY"] = "1d56b569-fafc-4ee9-9b29-ed52f7c21ad2:17d5da3120464da1a870de2ee77b0571"
 
 def generate_video_from_image(local_image_path, prompt):
     print(f"🚀 Starting Video Generation for: {local_image_path}")
 
-    # 1. UPLOAD (The Toss)
-    print("☁️ Uploading image to cloud...")
-    url = fal_client.upload_file(local_image_path)
-    print(f"✅ Uploaded: {url}")
+    # 1. UPLOAD (The Toss) - once per image, reused while the Fal URL is fresh
+    url = upload_cache.fal_url(local_image_path, fal_client.upload_file)
+    print(f"✅ Image on cloud: {url}")
 
     # 2. GENERATE (The Spin)
     print(f"🎬 Sending prompt to Wan 2.1: {prompt}")
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+# ComfyUI workflow template registry.
+#
+# Each API-format graph (flux_dev_t5fp16.json, wan_api.json, ...) is parsed
+# once and re-read only when its mtime changes. A render asks for a Workflow:
+# a copy-on-write view of the template, so injecting the prompt, seed, size or
+# filename prefix only copies the handful of nodes it touches.
+#
+# Nodes are located by class_type (and _meta.title when a class appears more
+# than once) instead of hard-coded ids like "43" or "45", so re-exporting a
+# graph from ComfyUI doesn't silently break injection.
+
+WORKFLOW_DIR = Path(__file__).resolve().parent
+
+# Which input carries the seed on each sampler/noise node we know about
+SEED_INPUTS = {"RandomNoise": "noise_seed", "KSampler": "seed", "KSamplerAdvanced": "noise_seed"}
+# Nodes whose width/height must follow the requested frame size
+SIZE_NODES = ("EmptySD3LatentImage", "EmptyLatentImage", "ModelSamplingFlux")
+# Empty-latent nodes; their batch_size renders several images in one prompt
+LATENT_NODES = ("EmptySD3LatentImage", "EmptyLatentImage")
+# Output nodes that accept a filename_prefix
+SAVE_NODES = ("SaveImage", "VHS_VideoCombine")
+PROMPT_NODES = ("CLIPTextEncode",)
+IMAGE_NODES = ("LoadImage",)
+
+
+class WorkflowError(Exception):
+    pass
+
+
+class WorkflowTemplate:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._graph = None
+        self._mtime = None
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r") as f:
+                graph = json.load(f)
+            if not isinstance(graph, dict) or not all(isinstance(n, dict) and "class_type" in n for n in graph.values()):
+                raise WorkflowError(f"{self.path.name} is not an API-format ComfyUI workflow")
+            self._graph, self._resolved, self._mtime = graph, {}, mtime
+            print(f"📄 Loaded workflow template {self.path.name} ({len(graph)} nodes)")
+
+    def nodes(self, class_types, title: str | None = None) -> list[str]:
+        """Ids of nodes whose class_type is in `class_types`, narrowed by title when several match."""
+        key = (tuple(class_types), title)
+        if key not in self._resolved:
+            matches = [nid for nid, node in self._graph.items() if node["class_type"] in class_types]
+            if title is not None and len(matches) > 1:
+                wanted = title.lower()
+                titled = [nid for nid in matches if wanted in self._graph[nid].get("_meta", {}).get("title", "").lower()]
+                matches = titled or matches
+            self._resolved[key] = matches
+        return self._resolved[key]
+
+    def node(self, class_types, title: str | None = None) -> str:
+        matches = self.nodes(class_types, title)
+        if len(matches) != 1:
+            label = f"{'/'.join(class_types)}" + (f" titled '{title}'" if title else "")
+            raise WorkflowError(f"{self.path.name}: expected one {label} node, found {len(matches)}")
+        return matches[0]
+
+    def instantiate(self) -> "Workflow":
+        self._refresh()
+        return Workflow(self)
+
+
+class Workflow:
+    """Per-render view of a template. Only nodes that are written to get copied."""
+
+    def __init__(self, template: WorkflowTemplate):
+        self.template = template
+        self.graph = dict(template._graph)
+        self._copied = set()
+
+    def set_input(self, node_id: str, name: str, value):
+        if node_id not in self._copied:
+            node = dict(self.graph[node_id])
+            node["inputs"] = dict(node["inputs"])
+            self.graph[node_id] = node
+            self._copied.add(node_id)
+        self.graph[node_id]["inputs"][name] = value
+
+    def set_prompt(self, text: str, title: str = "Positive"):
+        self.set_input(self.template.node(PROMPT_NODES, title), "text", text)
+
+    def set_seed(self, seed: int):
+        for node_id in self.template.nodes(tuple(SEED_INPUTS)):
+            self.set_input(node_id, SEED_INPUTS[self.graph[node_id]["class_type"]], seed)
+
+    def set_size(self, width: int, height: int):
+        node_ids = self.template.nodes(SIZE_NODES)
+        if not node_ids:
+            raise WorkflowError(f"{self.template.path.name}: no latent/size node to resize")
+        for node_id in node_ids:
+            self.set_input(node_id, "width", width)
+            self.set_input(node_id, "height", height)
+
+    def supports_batch(self) -> bool:
+        return any("batch_size" in self.graph[nid]["inputs"] for nid in self.template.nodes(LATENT_NODES))
+
+    def set_batch_size(self, size: int):
+        node_ids = [nid for nid in self.template.nodes(LATENT_NODES) if "batch_size" in self.graph[nid]["inputs"]]
+        if not node_ids:
+            raise WorkflowError(f"{self.template.path.name}: no latent node with a batch_size")
+        for node_id in node_ids:
+            self.set_input(node_id, "batch_size", size)
+
+    def set_filename_prefix(self, prefix: str):
+        for node_id in self.template.nodes(SAVE_NODES):
+            self.set_input(node_id, "filename_prefix", prefix)
+
+    def set_image(self, remote_name: str):
+        self.set_input(self.template.node(IMAGE_NODES), "image", remote_name)
+
+
+class WorkflowRegistry:
+    def __init__(self, directory: Path = WORKFLOW_DIR):
+        self.directory = Path(directory)
+        self._templates = {}
+
+    def get(self, name: str) -> Workflow:
+        """Fresh Workflow for `name` (raises FileNotFoundError if the template is missing)."""
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates.setdefault(name, WorkflowTemplate(self.directory / name))
+        return template.instantiate()
+
+
+workflows = WorkflowRegistry()
@@ -153,7 +153,7 @@ export default function ProjectDashboard({
   const AssetCard = ({ asset }: { asset: Asset }) => (
     <div className="aspect-square rounded-md overflow-hidden border border-zinc-800 hover:border-[#D2FF44] group relative transition-all bg-zinc-900">
       <img
-        src={asset.image_path}
+        src={asset.thumbnail_url ?? asset.image_path}
         alt={asset.name}
         className="w-full h-full object-cover opacity-70 group-hover:opacity-100 transition-opacity"
       />
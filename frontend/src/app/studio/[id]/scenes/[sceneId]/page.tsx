@@ -40,6 +40,7 @@ interface Asset {
   type: string;
   name: string;
   image_path: string;
+  thumbnail_url?: string | null;
 }
 
 interface Shot {
@@ -532,7 +533,7 @@ export default function SceneBuilderPage({
                         className="aspect-square bg-zinc-900 rounded border border-zinc-800 overflow-hidden relative group hover:border-[#D2FF44] transition-colors cursor-grab active:cursor-grabbing"
                       >
                         <img
-                          src={a.image_path}
+                          src={a.thumbnail_url ?? a.image_path}
                           className="w-full h-full object-cover opacity-70 group-hover:opacity-100 transition-opacity"
                         />
                         <div className="absolute bottom-0 left-0 right-0 bg-black/80 p-1 text-[9px] truncate text-center text-zinc-300 group-hover:text-white pointer-events-none">
@@ -558,7 +559,7 @@ export default function SceneBuilderPage({
                         className="aspect-square bg-zinc-900 rounded border border-zinc-800 overflow-hidden relative group hover:border-[#D2FF44] transition-colors cursor-grab active:cursor-grabbing"
                       >
                         <img
-                          src={a.image_path}
+                          src={a.thumbnail_url ?? a.image_path}
                           className="w-full h-full object-cover opacity-70 group-hover:opacity-100 transition-opacity"
                         />
                         <div className="absolute bottom-0 left-0 right-0 bg-black/80 p-1 text-[9px] truncate text-center text-zinc-300 group-hover:text-white pointer-events-none">
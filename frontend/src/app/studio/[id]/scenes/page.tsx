@@ -177,7 +177,7 @@ export default function ScenesPage({
                   <div className="flex-1 bg-black relative overflow-hidden">
                     {coverShot ? (
                       <img
-                        src={coverShot.keyframe_url!}
+                        src={coverShot.thumbnail_url ?? coverShot.keyframe_url!}
                         className="w-full h-full object-cover opacity-60 group-hover:opacity-100 group-hover:scale-105 transition-all duration-700"
                       />
                     ) : (
@@ -42,6 +42,7 @@ import {
   DialogDescription,
   DialogFooter,
 } from "@/components/ui/dialog";
+import { animateShot } from "@/lib/api";
 
 // --- TYPES ---
 interface Take {
@@ -57,7 +58,7 @@ interface Shot {
   prompt: string;
   keyframe_url: string | null;
   video_url: string | null;
-  status: "pending" | "ready" | "animating" | "complete";
+  status: "pending" | "rendering" | "ready_for_video" | "complete";
 }
 
 export default function DirectorsLabPage({
@@ -199,21 +200,17 @@ export default function DirectorsLabPage({
     setIsRendering(true);
     const finalCamera = camera === "Custom" ? customMove : camera;
     try {
-      const res = await fetch(`http://127.0.0.1:8000/shots/${shotId}/animate`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          prompt: prompt,
-          style: style,
-          camera_move: finalCamera,
-        }),
-      });
-      if (res.ok) {
-        const data = await res.json();
+      const data = await animateShot(
+        Number(shotId),
+        prompt,
+        style,
+        finalCamera,
+      );
+      if (data.success) {
         setActiveVideo(data.video_url);
         fetchData();
       } else {
-        alert("Render failed");
+        alert("Render failed: " + data.error);
       }
     } catch (error) {
       console.error("Render error", error);
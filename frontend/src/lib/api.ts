@@ -38,6 +38,7 @@ export interface Asset {
   name: string;
   image_path: string;
   prompt: string;
+  thumbnail_url?: string | null;
 }
 
 export interface Scene {
@@ -52,10 +53,11 @@ export interface Shot {
   id: number;
   scene_id: number;
   prompt: string;
-  status: "pending" | "ready_for_video" | "complete";
+  status: "pending" | "rendering" | "ready_for_video" | "complete";
   keyframe_url: string | null;
   video_url: string | null;
   order_index: number;
+  thumbnail_url?: string | null;
 }
 
 export interface Take {
@@ -64,6 +66,32 @@ export interface Take {
   video_url: string;
   prompt: string;
   created_at: string;
+  thumbnail_url?: string | null;
+}
+
+export interface Job {
+  id: number;
+  kind: string;
+  status: "queued" | "running" | "complete" | "failed";
+  progress?: number | null;
+  result: Record<string, any> | null;
+  error: string | null;
+  // Times it has been handed to a render server (requeued after a server died)
+  attempts?: number;
+  // X-Request-ID of the request that queued it (also in its ComfyUI client_id)
+  request_id?: string | null;
+  // Latest ComfyUI report while running
+  live?: {
+    stage: "queued" | "running";
+    step?: number;
+    steps?: number | null;
+    queue_position?: number;
+  } | null;
+}
+
+export interface JobEvent extends Job {
+  project_id: number | null;
+  shot_ids: number[];
 }
 
 export interface Character {
@@ -71,6 +99,10 @@ export interface Character {
   name: string;
   description: string;
   face_path: string;
+  face_sha256?: string | null;
+  // Only on the create response; any face is also at /assets/faces/<face_sha256>.<ext>
+  face_url?: string | null;
+  thumbnail_url?: string | null;
 }
 
 // --- 3. PROJECT API (The Missing Piece) ---
@@ -112,6 +144,18 @@ export async function getProjectAssets(projectId: string): Promise<Asset[]> {
   return data.assets || [];
 }
 
+// Keyset pages for big libraries: pass the previous page's next_cursor to continue.
+export async function getProjectAssetsPage(
+  projectId: string,
+  options: { limit?: number; cursor?: number | null; fields?: string[] } = {},
+): Promise<{ assets: Partial<Asset>[]; next_cursor: number | null; total: number }> {
+  const params = new URLSearchParams({ limit: String(options.limit ?? 100) });
+  if (options.cursor != null) params.set("cursor", String(options.cursor));
+  if (options.fields) params.set("fields", options.fields.join(","));
+  const res = await fetch(`${API_BASE}/projects/${projectId}/assets?${params}`);
+  return res.json();
+}
+
 export async function deleteAsset(assetId: number) {
   await fetch(`${API_BASE}/assets/${assetId}`, { method: "DELETE" });
 }
@@ -175,6 +219,37 @@ export async function updateShot(
   });
 }
 
+// Many shots in one request / one transaction (script imports, bulk edits)
+export async function createShotsBatch(
+  sceneId: number,
+  shots: { prompt: string; cast_id?: number; loc_id?: number }[],
+): Promise<{ scene: Scene; shots: Shot[]; created: number[] }> {
+  const res = await fetch(`${API_BASE}/scenes/${sceneId}/shots:batch`, {
+    method: "POST",
+    headers: getJsonHeaders(),
+    body: JSON.stringify({ shots }),
+  });
+  return res.json();
+}
+
+export async function updateShotsBatch(
+  sceneId: number,
+  changes: {
+    shots?: ({ id: number } & Partial<Pick<Shot, "prompt" | "status">> & {
+      keyframe_url?: string;
+      video_url?: string;
+    })[];
+    order?: number[];
+  },
+): Promise<{ scene: Scene; shots: Shot[] }> {
+  const res = await fetch(`${API_BASE}/scenes/${sceneId}/shots:batch`, {
+    method: "PATCH",
+    headers: getJsonHeaders(),
+    body: JSON.stringify(changes),
+  });
+  return res.json();
+}
+
 export async function deleteShot(shotId: number) {
   await fetch(`${API_BASE}/shots/${shotId}`, { method: "DELETE" });
 }
@@ -199,6 +274,50 @@ export async function deleteTake(takeId: number) {
 
 // --- 7. GENERATOR API (Flux + Wan + Dynamic URL) ---
 
+// Renders run as background jobs; this follows one over SSE until it finishes.
+export function waitForJob(jobId: number): Promise<Job> {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${API_BASE}/jobs/${jobId}/events`);
+    source.onmessage = (event) => {
+      const job: Job = JSON.parse(event.data);
+      if (job.status === "complete" || job.status === "failed") {
+        source.close();
+        resolve(job);
+      }
+    };
+    source.onerror = () => {
+      source.close();
+      reject(new Error(`Lost connection to job ${jobId}`));
+    };
+  });
+}
+
+// One stream per page for everything rendering in a project. Returns a function that closes it.
+export function subscribeProject(
+  projectId: number,
+  handlers: {
+    onJob?: (job: JobEvent) => void;
+    onQueue?: (positions: Record<string, number>) => void;
+  },
+) {
+  const source = new EventSource(`${API_BASE}/events?project_id=${projectId}`);
+  source.addEventListener("job", (event) => {
+    handlers.onJob?.(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener("queue", (event) => {
+    handlers.onQueue?.(JSON.parse((event as MessageEvent).data).positions);
+  });
+  return () => source.close();
+}
+
+async function runJob(res: Response) {
+  const data = await res.json();
+  if (!data.success || data.job_id == null) return data; // cache hits come back finished
+  const job = await waitForJob(data.job_id);
+  if (job.status === "failed") return { success: false, error: job.error };
+  return { success: true, job_id: job.id, ...job.result };
+}
+
 export async function generateAsset(payload: {
   project_id: number;
   type: string;
@@ -208,6 +327,8 @@ export async function generateAsset(payload: {
   lens?: string;
   focal_length?: string;
   chroma?: boolean;
+  seed?: number;
+  cache?: boolean;
 }) {
   const res = await fetch(`${API_BASE}/generate`, {
     method: "POST",
@@ -220,7 +341,7 @@ export async function generateAsset(payload: {
       chroma_key: payload.chroma || false,
     }),
   });
-  return res.json();
+  return runJob(res);
 }
 
 export async function generateVideo(prompt: string) {
@@ -229,7 +350,7 @@ export async function generateVideo(prompt: string) {
     headers: getJsonHeaders(),
     body: JSON.stringify({ prompt }),
   });
-  return res.json();
+  return runJob(res);
 }
 
 export async function animateShot(
@@ -243,7 +364,7 @@ export async function animateShot(
     headers: getJsonHeaders(),
     body: JSON.stringify({ prompt, style, camera_move: cameraMove }),
   });
-  return res.json();
+  return runJob(res);
 }
 
 export async function stitchShot(shotId: number, sourceVideoUrl?: string) {
@@ -268,6 +389,23 @@ export async function enhancePrompt(
   return res.json();
 }
 
+export async function enhanceScenePrompts(
+  sceneId: number,
+  style: string,
+  cameraMove: string,
+): Promise<{
+  success: boolean;
+  shots?: { shot_id: number; prompt: string; enhanced_prompt: string }[];
+  error?: string;
+}> {
+  const res = await fetch(`${API_BASE}/director/enhance_batch`, {
+    method: "POST",
+    headers: getJsonHeaders(),
+    body: JSON.stringify({ scene_id: sceneId, style, camera_move: cameraMove }),
+  });
+  return res.json();
+}
+
 // --- 8. CHARACTER API ---
 
 export async function createCharacter(formData: FormData) {